@@ -1,6 +1,19 @@
 import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+from megadash import config, diagnostics
+from megadash.boot import get_boot
+from megadash.scheduler import ensure_started
+from megadash.snapshots import get_snapshots
 
 st.set_page_config(layout='wide')
+scheduler = ensure_started()
+
+if 'diagnostics' in st.query_params:
+    diagnostics.render()
+    st.stop()
+
 st.title('NEAR Mega Dashboard')
 
 
@@ -29,3 +42,36 @@ Please navigate to the different pages to view the information listed above.
 st.markdown(intro_text)
 
 
+def format_time(ts):
+    return None if ts is None else datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+with st.expander('Data refresh status'):
+    if config.READ_SNAPSHOTS:
+        manifest = get_snapshots().manifest()
+        st.write('No snapshot has been published yet.' if manifest is None else
+                 f'Serving snapshot {manifest["version"]}, published {format_time(manifest["created"])}.')
+    refresh_stats = pd.DataFrame([
+        {'Dataset':name,
+         'Last Success':format_time(s['last_success']),
+         'Last Duration (s)':s['last_duration'],
+         'Next Refresh':format_time(s['next_run']),
+         'Runs':s['runs'],
+         'Failures':s['failures'],
+         'Last Error':s['last_error']}
+        for name, s in scheduler.stats().items()
+    ])
+    st.dataframe(refresh_stats, use_container_width=True, hide_index=True)
+
+    boot = get_boot()
+    if boot.started is not None:
+        st.write('Warming up: some datasets are still loading.' if boot.elapsed is None else
+                 f'Warm-up finished {boot.elapsed:.1f}s after start-up.')
+        boot_stats = pd.DataFrame([
+            {'Dataset':name,
+             'State':s['state'],
+             'Done After (s)':s['seconds'],
+             'Error':s['error']}
+            for name, s in boot.stats().items()
+        ])
+        st.dataframe(boot_stats, use_container_width=True, hide_index=True)
@@ -0,0 +1,131 @@
+"""Per-rerun cost of the DeFi page aggregations.
+
+Builds the DeFi frames from synthetic DefiLlama fixtures (see
+benchmarks.defillama_fixtures) and times, for each chart:
+
+    page      the pandas pipeline the DeFi page ran on every rerun
+    compute   the megadash.aggregations function, run once per data refresh
+    rerun     megadash.cache.memoized on an unchanged version
+
+Outputs of the page pipeline and the aggregation are checked to match first.
+Run from the repository root:
+
+    python -m benchmarks.bench_aggregations --protocols 40 --days 365
+"""
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import defillama_fixtures
+from megadash import aggregations
+from megadash.cache import memoized
+from megadash.defillama import DefiLlamaSync
+from megadash.tsstore import TimeSeriesStore
+
+
+def page_by_category(tvl_data):
+    chart_data = tvl_data.copy()
+    chart_data['rank'] = chart_data.index+1
+    chart_data = chart_data.groupby(['date','category'], as_index=False).agg({'tvl_usd':'sum'})
+    chart_data = chart_data.pivot_table(index='date', columns='category', values='tvl_usd', aggfunc='mean')
+    chart_data = chart_data.reset_index()
+    return chart_data.rename(columns={'date':'Date'})
+
+
+def page_by_protocol(tvl_data):
+    chart_data = tvl_data.copy()
+    chart_data = chart_data.pivot_table(index='date', columns='protocol', values='tvl_usd', aggfunc='mean')
+    chart_data = chart_data.reset_index()
+    return chart_data.rename(columns={'date':'Date'})
+
+
+def page_top_protocols(tvl_data):
+    chart_data = tvl_data.copy()
+    chart_data = chart_data.sort_values(by=['protocol','date'])
+    chart_data = chart_data.groupby('protocol').tail(1)
+    chart_data = chart_data.sort_values(by='tvl_usd', ascending=False)
+    chart_data = chart_data.reset_index().drop('index', axis=1)
+    chart_data['rank'] = chart_data.index+1
+    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(3, ' ') + '. ' + chart_data['protocol'] + ' (' + chart_data['category'] + ')'
+    chart_data['tvl_usd'] = chart_data['tvl_usd'].round(2)
+    return chart_data.rename(columns={'tvl_usd':'TVL ($)', 'xlabel':'Protocol'})
+
+
+def page_top_tokens(token_tvl_data):
+    chart_data = token_tvl_data.copy()
+    ref_finance_tokens = token_tvl_data.query("protocol=='Ref Finance'").symbol.unique()
+    chart_data = chart_data.loc[chart_data['symbol'].isin(ref_finance_tokens)]
+    chart_data = chart_data.dropna()
+    chart_data['date'] = chart_data['date'].dt.date
+    chart_data = chart_data.sort_values(by=['symbol','date','tvl_usd'], ascending=[False,False,False])
+    chart_data = chart_data.groupby(['date','symbol','protocol'], as_index=False).head(1)
+    chart_data = chart_data.groupby(['date','symbol'], as_index=False).agg({'tvl_usd':'sum'})
+    chart_data = chart_data.sort_values(by=['symbol','date'], ascending=[False,False])
+    chart_data = chart_data.groupby(['symbol'], as_index=False).head(1)
+    chart_data = chart_data.sort_values(by='tvl_usd', ascending=False)
+    chart_data = chart_data.reset_index().drop('index', axis=1)
+    chart_data['tvl_usd'] = chart_data['tvl_usd'].round(2)
+    chart_data['rank'] = chart_data.index+1
+    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(3,' ') + '. ' + chart_data['symbol']
+    return chart_data.rename(columns={'xlabel':'Token', 'tvl_usd':'TVL ($)'})
+
+
+CHARTS = [
+    ('by_category', page_by_category, aggregations.tvl_by_category, 'tvl', None),
+    ('by_protocol', page_by_protocol, aggregations.tvl_by_protocol, 'tvl', None),
+    ('top_protocols', page_top_protocols, aggregations.top_protocols, 'tvl', ['Protocol', 'TVL ($)']),
+    ('top_tokens', page_top_tokens, aggregations.top_tokens, ('tokens', 'token_matrices'), ['Token', 'TVL ($)']),
+]
+
+
+def load_frames(protocols, days, tokens):
+    with tempfile.TemporaryDirectory() as fixture_dir, tempfile.TemporaryDirectory() as store_dir:
+        defillama_fixtures.generate(fixture_dir, protocols, days, tokens)
+        listing, responses = defillama_fixtures.load(fixture_dir)
+        listing[0]['name'] = aggregations.REFERENCE_DEX
+        sync = DefiLlamaSync(TimeSeriesStore(store_dir))
+        sync.sync(listing, responses)
+        tvl, token_matrices = sync.window(listing)
+    token_frame = pd.concat([matrix.to_frame().assign(protocol=name) for name, matrix in token_matrices.items()],
+                            ignore_index=True)
+    return {'tvl':tvl, 'tokens':token_frame, 'token_matrices':token_matrices}
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--protocols', type=int, default=40)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--tokens', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.protocols, args.days, args.tokens)
+    print(f'tvl rows: {len(frames["tvl"])}, token rows: {len(frames["tokens"])}, '
+          f'token matrices: {sum(m.nbytes for m in frames["token_matrices"].values()) / 2**20:.1f} MB')
+    print(f'{"chart":>14} {"page ms":>9} {"compute ms":>11} {"rerun ms":>9}')
+    for name, page, aggregation, source, columns in CHARTS:
+        page_source, source = source if isinstance(source, tuple) else (source, source)
+        expected, got = page(frames[page_source]), aggregation(frames[source])
+        if columns is not None:
+            expected, got = expected[columns], got[columns]
+        pd.testing.assert_frame_equal(got, expected, check_names=False)
+
+        page_ms = timed(lambda: page(frames[page_source]), args.repeat)
+        compute_ms = timed(lambda: aggregation(frames[source]), args.repeat)
+        rerun_ms = timed(lambda: memoized(name, 1, lambda: aggregation(frames[source])), args.repeat)
+        print(f'{name:>14} {page_ms:>9.2f} {compute_ms:>11.2f} {rerun_ms:>9.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Time to first data after a process restart, with and without the disk tier.
+
+A restart is simulated by dropping the in-process cache. With a populated
+disk tier the first read no longer depends on upstream latency. Run from the
+repository root:
+
+    python -m benchmarks.bench_cache_restart
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.mock_server import MockServer
+from megadash import cache
+from megadash.client import HttpClient
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latencies', type=float, nargs='+', default=[0.05, 0.2, 0.5])
+    args = parser.parse_args()
+
+    print(f'{"latency (s)":>12} {"cold (s)":>10} {"restart (s)":>12}')
+    for latency in args.latencies:
+        with MockServer(protocols=1, latency=latency, days=365) as server, tempfile.TemporaryDirectory() as tmp:
+            client = HttpClient()
+
+            @cache.cached('bench.flipside', source='flipside')
+            def load():
+                return client.get_json(f'{server.url}/api/v2/queries/bench/data/latest')
+
+            cache._cache = cache.TieredCache(path=f'{tmp}/cache.sqlite3')
+            start = time.perf_counter()
+            load()
+            cold = time.perf_counter() - start
+
+            cache._cache = cache.TieredCache(path=f'{tmp}/cache.sqlite3')
+            start = time.perf_counter()
+            load()
+            restart = time.perf_counter() - start
+            client.close()
+
+        print(f'{latency:>12.2f} {cold:>10.3f} {restart:>12.4f}')
+
+
+if __name__ == '__main__':
+    main()
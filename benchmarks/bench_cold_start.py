@@ -0,0 +1,107 @@
+"""Cold boot to every page warm, with and without the boot warm-up.
+
+Serves generated upstream responses (benchmarks.dashboard_fixtures at
+`--scale`) from MockServer with `--latency` seconds per request. Each mode
+runs in its own interpreter with an empty cache:
+
+    serial  loads every dataset alone, one after another: the slowest single
+            load and the sum of all of them
+    off     MEGADASH_BOOT_PREFETCH=0: a visitor opens the four pages in turn
+            (Streamlit AppTest) and each page loads its own datasets
+    on      the same visitor, with the warm-up started at boot
+
+and reports when the first and the last page finished, counted from boot.
+With the warm-up the last page should finish close to the slowest single
+load rather than the sum. Run from the repository root:
+
+    python -m benchmarks.bench_cold_start --latency 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import dashboard_fixtures
+from benchmarks.bench_pages import PAGES, ROOT, preload
+from benchmarks.mock_server import MockServer
+
+
+def measure(mode):
+    """Child: time one mode and print the result as JSON."""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from streamlit.testing.v1 import AppTest
+    preload(ROOT)
+    AppTest.from_string('import streamlit as st\nst.write("warm-up")').run()
+
+    if mode == 'serial':
+        from megadash.datasets import DATASETS, TRANSFORMS
+        loads = {}
+        for dataset in DATASETS + TRANSFORMS:
+            start = time.perf_counter()
+            if dataset in TRANSFORMS:
+                dataset.build()
+            else:
+                dataset.loader.refresh()
+            loads[dataset.name] = time.perf_counter() - start
+        print(json.dumps({'loads':loads}))
+        return
+
+    from megadash.boot import get_boot
+    from megadash.scheduler import ensure_started
+    start = time.perf_counter()
+    ensure_started()
+    finished, exceptions = {}, []
+    for page in PAGES[1:]:
+        app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120).run()
+        finished[page] = time.perf_counter() - start
+        exceptions += [e.message for e in app.exception] + [e.value for e in app.error]
+    print(json.dumps({'finished':finished, 'boot':get_boot().elapsed, 'exceptions':exceptions[:1]}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=list(dashboard_fixtures.SCALES), default='medium')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every upstream request')
+    parser.add_argument('--measure', choices=['serial', 'off', 'on'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as fixtures:
+        dashboard_fixtures.generate(fixtures, args.scale)
+        with MockServer.from_fixtures(fixtures, latency=args.latency) as mock:
+            env = dict(os.environ, MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                       MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                       MEGADASH_SCHEDULER='0', MEGADASH_READ_SNAPSHOTS='0')
+            for mode in ['serial', 'off', 'on']:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_cold_start', '--measure', mode],
+                                            env=dict(env, MEGADASH_CACHE_DIR=cache_dir,
+                                                     MEGADASH_BOOT_PREFETCH='1' if mode == 'on' else '0'),
+                                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+                results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    loads = results['serial']['loads']
+    slowest = max(loads, key=loads.get)
+    print(f'{"load":<24} {"s":>6}')
+    for name, seconds in loads.items():
+        print(f'{name:<24} {seconds:>6.2f}')
+    print(f'slowest single load {loads[slowest]:.2f}s ({slowest}), sum of all loads {sum(loads.values()):.2f}s')
+    print(f'\n{"boot warm-up":<13} {"first page s":>13} {"all pages s":>12} {"warm-up s":>10}')
+    for mode in ['off', 'on']:
+        result = results[mode]
+        finished = list(result['finished'].values())
+        boot = '-' if result['boot'] is None else f'{result["boot"]:.2f}'
+        errors = f'  {result["exceptions"][0][:60]}' if result['exceptions'] else ''
+        print(f'{mode:<13} {finished[0]:>13.2f} {finished[-1]:>12.2f} {boot:>10}{errors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Cold-load time of the DefiLlama protocol fan-out, sequential vs concurrent.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_defi_fetch
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.mock_server import MockServer
+from megadash.fetcher import fetch_all
+
+
+def sequential(urls):
+    results = {}
+    for key, url in urls.items():
+        results[key] = requests.get(url).json()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 25, 50, 100])
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f'{"protocols":>10} {"sequential (s)":>15} {"concurrent (s)":>15} {"speedup":>8}')
+    for count in args.counts:
+        with MockServer(protocols=count, latency=args.latency, days=365, tokens=5) as server:
+            urls = {p['slug']:f'{server.url}/protocol/{p["slug"]}' for p in server.protocols}
+
+            start = time.perf_counter()
+            sequential(urls)
+            seq = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fetched = fetch_all(urls, max_workers=args.workers)
+            con = time.perf_counter() - start
+            assert not fetched.failures, fetched.failures
+
+        print(f'{count:>10} {seq:>15.3f} {con:>15.3f} {seq/con:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Peak memory of DeFi ingestion, full decode vs streaming.
+
+Serves synthetic /protocol responses shaped like DefiLlama's large ones (a
+long daily history, TVL, token and token-USD series for several chains plus
+the all-chain totals) from the local mock server, then runs get_defi_data in
+a fresh interpreter per mode:
+
+    full      fetch_all decodes every response, DefiLlamaSync.sync
+    stream    iter_fetch + DefiLlamaSync.sync_stream (MEGADASH_DEFILLAMA_STREAMING)
+
+and reports peak RSS, the growth over the interpreter's RSS before the
+refresh, and the wall time, for each `--workers` fetch concurrency.
+Streaming parses each body chunk by chunk as it downloads, so no response
+text is held whole and its peak does not follow the response sizes. Part of
+the growth in both modes is the modules the refresh imports. Every run must
+produce the same DeFi frames. Run from the repository root:
+
+    python -m benchmarks.bench_defi_memory --protocols 12 --days 1500 --tokens 60
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DAY = 86400
+END = 1700000000 - 1700000000 % DAY
+
+
+def make_large_protocol(slug, category, days, tokens, chains, end=END):
+    rng = random.Random(slug)
+    dates = [end - DAY * (days - 1 - i) for i in range(days)]
+    symbols = [f'TKN{j}' for j in range(tokens)]
+
+    def series(scale):
+        level = rng.uniform(1e5, 1e8) * scale
+        tvl, amounts, usd = [], [], []
+        for i, date in enumerate(dates):
+            level *= rng.uniform(0.97, 1.03)
+            listed = symbols[:max(1, tokens * (i + 1) // days)]
+            tvl.append({'date':date, 'totalLiquidityUSD':round(level, 2)})
+            usd.append({'date':date, 'tokens':{s:round(level / len(listed) * rng.uniform(0.5, 1.5), 2) for s in listed}})
+            amounts.append({'date':date, 'tokens':{s:round(rng.uniform(1, 1e6), 4) for s in listed}})
+        return {'tvl':tvl, 'tokens':amounts, 'tokensInUsd':usd}
+
+    chain_tvls = {'Near':series(1.0)}
+    for i in range(chains):
+        chain_tvls[f'Chain{i}'] = series(0.5)
+    total = series(2.0)
+    return {'id':slug, 'name':slug, 'category':category, 'chains':list(chain_tvls),
+            'currentChainTvls':{chain:data['tvl'][-1]['totalLiquidityUSD'] for chain, data in chain_tvls.items()},
+            'chainTvls':chain_tvls, 'tvl':total['tvl'], 'tokens':total['tokens'], 'tokensInUsd':total['tokensInUsd']}
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def digest(tvl, tokens):
+    from megadash import aggregations
+
+    frames = [tvl.sort_values(['protocol', 'date']).reset_index(drop=True), aggregations.top_tokens(tokens)]
+    frames += [tokens[name].to_frame().sort_values(['date', 'symbol']).reset_index(drop=True) for name in sorted(tokens)]
+    return hashlib.sha256(b''.join(frame.to_csv(index=False).encode() for frame in frames)).hexdigest()[:16]
+
+
+def measure():
+    """Child: one refresh with the mode from the environment; prints JSON."""
+    from megadash.sources.defi import get_defi_data
+
+    before = rss_kb()
+    start = time.perf_counter()
+    tvl, tokens, failed = get_defi_data.__wrapped__()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'before_mb':before / 1024, 'peak_mb':peak / 1024, 'growth_mb':(peak - before) / 1024,
+                      'seconds':elapsed, 'rows':len(tvl), 'failed':len(failed), 'digest':digest(tvl, tokens)}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--protocols', type=int, default=12)
+    parser.add_argument('--days', type=int, default=1500)
+    parser.add_argument('--tokens', type=int, default=60)
+    parser.add_argument('--chains', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[8, 2], help='DefiLlama fetch concurrency')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure()
+        return
+
+    from benchmarks.mock_server import MockServer
+    from megadash.aggregations import REFERENCE_DEX
+
+    mock = MockServer(protocols=0, latency=0.0, days=1)
+    mock.protocols = [{'name':REFERENCE_DEX if i == 0 else f'Protocol {i}', 'slug':f'protocol-{i}', 'chains':['Near'],
+                       'category':'Dexes' if i % 3 == 0 else 'Lending'} for i in range(args.protocols)]
+    mock.payloads = {p['slug']:json.dumps(make_large_protocol(p['slug'], p['category'], args.days, args.tokens,
+                                                              args.chains)).encode()
+                     for p in mock.protocols}
+    sizes = [len(payload) for payload in mock.payloads.values()]
+    print(f'{len(sizes)} responses, {sum(sizes) / 2**20:.0f} MB total, largest {max(sizes) / 2**20:.1f} MB')
+
+    results = {}
+    with mock:
+        for workers in args.workers:
+            for mode, flag in [('full', '0'), ('stream', '1')]:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    env = dict(os.environ, MEGADASH_DEFILLAMA_URL=mock.url, MEGADASH_CACHE_DIR=cache_dir,
+                               MEGADASH_DEFILLAMA_STREAMING=flag, MEGADASH_DEFILLAMA_MAX_WORKERS=str(workers),
+                               MEGADASH_SCHEDULER='0')
+                    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_defi_memory', '--measure'],
+                                            env=env, check=True, capture_output=True, text=True).stdout
+                results[mode, workers] = json.loads(output.strip().splitlines()[-1])
+
+    print(f'{"mode":>8} {"workers":>8} {"peak MB":>8} {"growth MB":>10} {"seconds":>8} {"rows":>7} {"failed":>7}  digest')
+    for (mode, workers), r in results.items():
+        print(f'{mode:>8} {workers:>8} {r["peak_mb"]:>8.0f} {r["growth_mb"]:>10.0f} {r["seconds"]:>8.2f} '
+              f'{r["rows"]:>7} {r["failed"]:>7}  {r["digest"]}')
+    if len({r['digest'] for r in results.values()}) > 1:
+        raise SystemExit('streaming ingestion produced different DeFi frames')
+
+
+if __name__ == '__main__':
+    main()
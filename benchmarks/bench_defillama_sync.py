@@ -0,0 +1,117 @@
+"""Refresh cost of the incremental DefiLlama sync vs rebuilding the DeFi frames.
+
+Replays DefiLlama fixtures (see benchmarks.defillama_fixtures) through two
+refreshes: a warm-up on the fixture responses and a refresh on the same
+responses one day later. The columns show:
+
+    rebuild      the original get_defi_data processing of every response
+    incremental  DefiLlamaSync.sync + window on the later responses
+
+Before timing, the incremental window is checked against a cold sync of the
+later responses, so the replayed refresh must give the same frames as
+starting from scratch. Run from the repository root:
+
+    python -m benchmarks.bench_defillama_sync
+    python -m benchmarks.bench_defillama_sync --fixtures fixtures/defillama
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks import defillama_fixtures
+from megadash.defillama import DefiLlamaSync
+from megadash.tsstore import TimeSeriesStore
+
+
+def rebuild(protocols, responses):
+    protocol_tvls = []
+    token_tvls = []
+    for p in protocols:
+        data = responses[p['slug']]
+        tvl_df = pd.DataFrame(data['chainTvls']['Near']['tvl'])
+        tvl_df['protocol'] = p['name']
+        tvl_df['category'] = p['category']
+        tvl_df['tvl_usd'] = tvl_df['totalLiquidityUSD']
+        tvl_df['date'] = tvl_df['date'].apply(lambda x: datetime.utcfromtimestamp(x))
+        tvl_df = tvl_df[['protocol','category','date','tvl_usd']]
+        protocol_tvls.append(tvl_df)
+        if p['category']=='Dexes':
+            tokens_df = pd.concat([pd.DataFrame([{'date':x['date']} for x in data['tokensInUsd']]),
+                                   pd.DataFrame([x['tokens'] for x in data['tokensInUsd']])], axis=1)
+            tokens_df['date'] = tokens_df['date'].apply(lambda x: datetime.utcfromtimestamp(x))
+            tokens_df = tokens_df.melt(id_vars='date', var_name='symbol', value_name='tvl_usd')
+            tokens_df['protocol'] = p['name']
+            token_tvls.append(tokens_df)
+    tvl = pd.concat(protocol_tvls, axis=0)
+    tokens = pd.concat(token_tvls, axis=0)
+    start_date = tvl['date'].max() - timedelta(days=365)
+    return tvl.loc[tvl['date'] >= start_date], tokens.loc[tokens['date'] >= start_date]
+
+
+def sync_all(sync, protocols, responses):
+    sync.sync(protocols, responses)
+    return sync.window(protocols)
+
+
+def check(protocols, before, after):
+    with tempfile.TemporaryDirectory() as warm_root, tempfile.TemporaryDirectory() as cold_root:
+        warm = DefiLlamaSync(TimeSeriesStore(warm_root))
+        sync_all(warm, protocols, before)
+        incremental = sync_all(warm, protocols, after)
+        cold = sync_all(DefiLlamaSync(TimeSeriesStore(cold_root)), protocols, after)
+    pd.testing.assert_frame_equal(incremental[0], cold[0])
+    assert incremental[1].keys() == cold[1].keys()
+    for name, matrix in incremental[1].items():
+        pd.testing.assert_frame_equal(matrix.to_frame().sort_values(['date', 'symbol']).reset_index(drop=True),
+                                      cold[1][name].to_frame().sort_values(['date', 'symbol']).reset_index(drop=True))
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fixtures', help='directory written by benchmarks.defillama_fixtures')
+    parser.add_argument('--protocols', type=int, default=40)
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 1095])
+    parser.add_argument('--tokens', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"days":>6} {"protocols":>9} {"rebuild ms":>11} {"incremental ms":>15}')
+    for days in ([None] if args.fixtures else args.days):
+        with tempfile.TemporaryDirectory() as fixture_dir:
+            if args.fixtures:
+                fixture_dir = args.fixtures
+            else:
+                defillama_fixtures.generate(fixture_dir, args.protocols, days, args.tokens)
+            protocols, before = defillama_fixtures.load(fixture_dir)
+        protocols = [p for p in protocols if p['slug'] in before]
+        after = {slug:defillama_fixtures.advance(data) for slug, data in before.items()}
+        check(protocols, before, after)
+
+        rebuild_ms = timed(lambda: rebuild(protocols, after), args.repeat)
+
+        def refresh():
+            with tempfile.TemporaryDirectory() as root:
+                sync = DefiLlamaSync(TimeSeriesStore(root))
+                sync_all(sync, protocols, before)
+                start = time.perf_counter()
+                sync_all(sync, protocols, after)
+                return time.perf_counter() - start
+
+        incremental_ms = min(refresh() for _ in range(args.repeat)) * 1000
+        print(f'{days or "-":>6} {len(protocols):>9} {rebuild_ms:>11.1f} {incremental_ms:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Chart payload size and downsampling time for long histories.
+
+Builds a daily series with noise and isolated spikes and a wide per-protocol
+TVL frame, downsamples them the way the pages do and reports the Arrow
+payload Streamlit would send for each chart. Checks that min/max bucketing
+keeps every bucket's extremes (and so the global ones), that LTTB keeps the
+end points, and that "Other" keeps the totals. Run from the repository
+root:
+
+    python -m benchmarks.bench_downsample --days 365 1825 3650
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from megadash.downsample import downsample, lttb_indices, minmax_indices, top_series
+
+
+def make_series(days, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 300000 + np.cumsum(rng.normal(0, 2000, days)) + rng.normal(0, 5000, days)
+    spikes = rng.choice(days, size=max(1, days // 200), replace=False)
+    values[spikes] *= rng.uniform(2, 4, len(spikes))
+    values[rng.choice(days, size=max(1, days // 300), replace=False)] *= 0.2
+    return pd.DataFrame({'Date':pd.date_range(end='2024-01-01', periods=days, freq='D'), 'Transactions':values})
+
+
+def make_protocols(days, protocols, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = make_series(days, seed)[['Date']]
+    for i in range(protocols):
+        listed = rng.integers(0, days // 2)
+        values = np.abs(rng.lognormal(14, 2) * (1 + np.cumsum(rng.normal(0, 0.01, days))))
+        values[:listed] = np.nan
+        frame[f'Protocol {i}'] = values
+    return frame
+
+
+def payload(frame):
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(frame)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def check_minmax(values, buckets):
+    kept = minmax_indices(values, buckets)
+    size = -(-len(values) // buckets)
+    for start in range(0, len(values), size):
+        chunk = values[start:start + size]
+        assert values[kept[(kept >= start) & (kept < start + size)]].max() == chunk.max()
+        assert values[kept[(kept >= start) & (kept < start + size)]].min() == chunk.min()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 1825, 3650])
+    parser.add_argument('--protocols', type=int, default=60)
+    parser.add_argument('--points', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"chart":>22} {"days":>6} {"rows":>6} {"kept":>6} {"raw KB":>8} {"sent KB":>8} {"ms":>7}')
+    for days in args.days:
+        series = make_series(days)
+        values = series['Transactions'].to_numpy()
+        check_minmax(values, args.points // 2)
+        lttb = lttb_indices(series['Date'].to_numpy(), values, args.points)
+        assert lttb[0] == 0 and lttb[-1] == days - 1 and len(lttb) == min(days, args.points)
+
+        protocols = make_protocols(days, args.protocols)
+        capped = top_series(protocols, 'Date')
+        assert np.allclose(capped.drop(columns='Date').sum(axis=1), protocols.drop(columns='Date').sum(axis=1))
+
+        charts = [
+            ('line minmax', series, lambda: downsample(series, 'Date', args.points)),
+            ('line lttb', series, lambda: downsample(series, 'Date', args.points, 'lttb')),
+            ('protocols top+minmax', protocols,
+             lambda: downsample(top_series(protocols, 'Date'), 'Date', args.points, stacked=True)),
+        ]
+        for name, raw, fn in charts:
+            ms, chart = timed(fn, args.repeat)
+            if name == 'line minmax':
+                assert chart['Transactions'].max() == values.max() and chart['Transactions'].min() == values.min()
+            print(f'{name:>22} {days:>6} {len(raw):>6} {len(chart):>6} {payload(raw) / 1024:>8.1f} '
+                  f'{payload(chart) / 1024:>8.1f} {ms:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Latest-epoch lookup and per-epoch metrics of the staking dataset.
+
+Builds a synthetic staking history and compares, per page run:
+
+    original   the Staking page's copy of the frame and two full sorts by
+               EPOCH_NUM to read the newest supply and stake
+    table      megadash.epochs.EpochTable.latest on the table of the version
+
+and, per new dataset version with `--new` more epochs, building the table
+from scratch against extending the previous one. Both tables are checked to
+hold the same derived metrics. Run from the repository root:
+
+    python -m benchmarks.bench_epochs --epochs 2000 20000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from megadash.epochs import EpochTable
+
+
+DERIVED = ['STAKING_RATIO', 'STAKED_CHANGE', 'SUPPLY_CHANGE', 'STAKING_RATIO_CHANGE']
+
+
+def make_staking(count, first=1000):
+    epochs = np.arange(first, first + count)
+    return pd.DataFrame({
+        'EPOCH_NUM':epochs,
+        'START_TIME':pd.Timestamp('2020-10-13') + pd.to_timedelta((epochs - first) * 12, unit='h'),
+        'TOTAL_NEAR_STAKED':4e8 + (epochs - first) * 1e5,
+        'TOTAL_NEAR_SUPPLY':1.1e9 + (epochs - first) * 2e5,
+    })
+
+
+def original(staking_df):
+    staking_df = staking_df.copy()
+    current_near_supply = staking_df.sort_values(by='EPOCH_NUM', ascending=False).iloc[0].loc['TOTAL_NEAR_SUPPLY']
+    current_near_staked = staking_df.sort_values(by='EPOCH_NUM', ascending=False).iloc[0].loc['TOTAL_NEAR_STAKED']
+    return current_near_supply, current_near_staked
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int, nargs='+', default=[2000, 20000])
+    parser.add_argument('--new', type=int, default=2, help='epochs added per dataset version')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"epochs":>8} {"original ms":>12} {"latest ms":>10} {"rebuild ms":>11} {"extend ms":>10}  same')
+    for count in args.epochs:
+        staking = make_staking(count + args.new)
+        old, new = staking.iloc[:count], staking.iloc[args.new:]
+        original_ms, (supply, staked) = timed(lambda: original(old), args.repeat)
+        table = EpochTable(old)
+        latest_ms, latest = timed(lambda: table.latest, args.repeat)
+        assert (supply, staked) == (latest['TOTAL_NEAR_SUPPLY'], latest['TOTAL_NEAR_STAKED'])
+
+        rebuild_ms, rebuilt = timed(lambda: EpochTable(new), args.repeat)
+        extend_ms, extended = timed(lambda: table.extend(new), args.repeat)
+        same = np.allclose(rebuilt.frame[DERIVED].iloc[1:], extended.frame[DERIVED].iloc[1:], equal_nan=True)
+        print(f'{count:>8} {original_ms:>12.2f} {latest_ms:>10.4f} {rebuild_ms:>11.2f} {extend_ms:>10.2f}  {same}')
+    print('the first row of an extended table keeps its change from the epoch before the window')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Parse time and peak memory of the typed Flipside loader on large synthetic results.
+
+Compares the original `json` + `pd.DataFrame(rows)` + `pd.to_datetime` path with
+megadash.flipside.parse. Each measurement runs in a fresh interpreter so peak
+RSS is not polluted by earlier runs. Run from the repository root:
+
+    python -m benchmarks.bench_flipside_loader --rows 100000 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from megadash import flipside
+
+
+SCHEMA = {
+    'UTC_DATE':'datetime',
+    'METRIC':'category',
+    'TIME_PERIOD':'category',
+    'TRANSACTIONS':'int64',
+    'SUCCESS_RATE':'float32',
+}
+
+
+def make_payload(rows):
+    metrics = ['Transactions', 'Active Accounts', 'Active Contracts']
+    periods = ['P24H', 'P7D', 'P30D']
+    data = [{'UTC_DATE':f'20{20 + i % 3}-{1 + i % 12:02d}-{1 + i % 28:02d} 00:00:00.000',
+             'METRIC':metrics[i % 3],
+             'TIME_PERIOD':periods[i % 3],
+             'TRANSACTIONS':300000 + i,
+             'SUCCESS_RATE':0.95 + (i % 50) / 1000}
+            for i in range(rows)]
+    return json.dumps(data).encode()
+
+
+def baseline(payload):
+    frame = pd.DataFrame(json.loads(payload))
+    frame['UTC_DATE'] = pd.to_datetime(frame['UTC_DATE'])
+    return frame
+
+
+LOADERS = {
+    'baseline':baseline,
+    'typed':lambda payload: flipside.parse(payload, SCHEMA),
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss survives fork+exec on Linux, so prefer the per-process high-water mark
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(loader, path):
+    with open(path, 'rb') as f:
+        payload = f.read()
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    frame = LOADERS[loader](payload)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb() - before
+    print(json.dumps({'time':elapsed, 'peak_mb':peak, 'frame_mb':frame.memory_usage(deep=True).sum()/2**20}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--measure', nargs=2, metavar=('LOADER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    print(f'parser: {"orjson" if flipside.orjson is not None else "json"}')
+    print(f'{"rows":>9} {"loader":>9} {"time (s)":>9} {"peak MB":>9} {"frame MB":>9}')
+    for rows in args.rows:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            f.write(make_payload(rows))
+        try:
+            for loader in LOADERS:
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_flipside_loader',
+                                         '--measure', loader, f.name],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f'{rows:>9} {loader:>9} {result["time"]:>9.2f} {result["peak_mb"]:>9.1f} {result["frame_mb"]:>9.1f}')
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Fetch latency of unpooled `requests` calls vs the shared pooled client.
+
+The stand-in server charges `--connect-latency` on every new connection to
+model the TCP and TLS handshakes that the pooled client avoids. Run from the
+repository root:
+
+    python -m benchmarks.bench_http_client
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.mock_server import MockServer
+from megadash.client import HttpClient
+
+
+def run_unpooled(urls):
+    for url in urls:
+        requests.get(url).json()
+
+
+def run_pooled(client, urls):
+    for url in urls:
+        client.get_json(url)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--connect-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with MockServer(protocols=5, latency=args.latency, connect_latency=args.connect_latency) as server:
+        urls = [f'{server.url}/api/v2/queries/q{i}/data/latest' for i in range(args.calls)]
+
+        start = time.perf_counter()
+        run_unpooled(urls)
+        unpooled = time.perf_counter() - start
+
+        client = HttpClient()
+        start = time.perf_counter()
+        run_pooled(client, urls)
+        pooled = time.perf_counter() - start
+
+        stats = next(iter(client.stats().values()))
+        client.close()
+
+    print(f'{args.calls} calls, {args.connect_latency*1000:.0f} ms simulated handshake, {args.latency*1000:.0f} ms server time')
+    print(f'unpooled: {unpooled:.3f}s ({unpooled/args.calls*1000:.1f} ms/call)')
+    print(f'pooled:   {pooled:.3f}s ({pooled/args.calls*1000:.1f} ms/call)')
+    print(f'client counters: {stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Script run time of the dashboard pages under Streamlit's AppTest harness.
+
+Every page runs against the local mock server, once with an empty cache
+(cold) and then `--reruns` more times (warm, the cost of every widget
+interaction). With `--baseline REV` the same pages are also run from a
+temporary git worktree of that revision, and the scorecard cards rendered by
+both trees are compared. Each measurement runs in its own interpreter with its
+own cache directory and without the boot warm-up, so a page only loads its own
+datasets. Run from the repository root:
+
+    python -m benchmarks.bench_pages --baseline HEAD~1
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import pkgutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['NEAR_Megadashboard.py'] + sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+
+
+def preload(root):
+    """Import the data layer up front, so import time is not counted as fetch time."""
+    for module in pkgutil.walk_packages([os.path.join(root, 'megadash')], 'megadash.'):
+        if not module.name.endswith('__main__'):
+            try:
+                importlib.import_module(module.name)
+            except Exception:
+                pass
+
+
+def measure(root, page, reruns):
+    """Child: time one page and print the result as JSON.
+
+    `cold` runs on an empty cache, `derived` again after dropping the
+    version-keyed memos (chart frames, cards) and `warm` is the median rerun.
+    The stages follow by difference: fetch = cold - derived, transform =
+    derived - warm, render = warm.
+    """
+    sys.path.insert(0, root)
+    os.chdir(root)
+    from streamlit.testing.v1 import AppTest
+    preload(root)
+    AppTest.from_string('import streamlit as st\nst.write("warm-up")').run()
+
+    def run():
+        app = AppTest.from_file(os.path.join(root, page), default_timeout=120)
+        start = time.perf_counter()
+        app.run()
+        return time.perf_counter() - start, app
+
+    cold, app = run()
+    exceptions = [e.message for e in app.exception]
+    for name in ['megadash.cache', 'megadash.aggregations']:
+        getattr(sys.modules.get(name), '_memo', {}).clear()
+    derived, app = run()
+    exceptions += [e.message for e in app.exception if e.message not in exceptions]
+    times = [run()[0] for _ in range(reruns)]
+    warm = statistics.median(times) if reruns else derived
+    print(json.dumps({
+        'cold':cold,
+        'derived':derived,
+        'warm':warm if reruns else None,
+        'stages':{'fetch':max(0.0, cold - derived), 'transform':max(0.0, derived - warm), 'render':warm},
+        'exceptions':exceptions + [e.message for e in app.exception if e.message not in exceptions],
+        'metrics':[[m.label, m.value, m.delta] for m in app.metric],
+    }))
+
+
+def run_tree(root, pages, reruns, env):
+    results = {}
+    for page in pages:
+        if not os.path.exists(os.path.join(root, page)):
+            continue
+        with tempfile.TemporaryDirectory() as cache_dir:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', root, page, str(reruns)],
+                                    env=dict(env, MEGADASH_CACHE_DIR=cache_dir), cwd=root,
+                                    check=True, capture_output=True, text=True).stdout
+        results[page] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', help='git revision to compare against')
+    parser.add_argument('--pages', nargs='+', default=PAGES)
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--measure', nargs=3, metavar=('ROOT', 'PAGE', 'RERUNS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        root, page, reruns = args.measure
+        measure(root, page, int(reruns))
+        return
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.mock_server import MockServer, make_dashboard_queries
+
+    with MockServer(protocols=20, latency=0.0, days=730, tokens=50, queries=make_dashboard_queries(730)) as mock:
+        env = dict(os.environ, MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                   MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                   MEGADASH_SCHEDULER='0', MEGADASH_BOOT_PREFETCH='0')
+        trees = {'current':run_tree(ROOT, args.pages, args.reruns, env)}
+        if args.baseline:
+            with tempfile.TemporaryDirectory() as worktree:
+                subprocess.run(['git', 'worktree', 'add', '--detach', worktree, args.baseline],
+                               cwd=ROOT, check=True, capture_output=True)
+                try:
+                    trees['baseline'] = run_tree(worktree, args.pages, args.reruns, env)
+                finally:
+                    subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=ROOT, capture_output=True)
+
+    print(f'{"page":<34} {"tree":>9} {"cold ms":>8} {"warm ms":>8} {"metrics":>8}  same cards')
+    for page in args.pages:
+        for tree, results in sorted(trees.items()):
+            if page not in results:
+                continue
+            result = results[page]
+            same = '' if 'baseline' not in trees or tree == 'baseline' or page not in trees['baseline'] \
+                else str(result['metrics'] == trees['baseline'][page]['metrics'])
+            warm = f'{result["warm"] * 1000:>8.1f}' if result['warm'] is not None else f'{"-":>8}'
+            errors = f'  {result["exceptions"][0][:60]}' if result['exceptions'] else ''
+            print(f'{page:<34} {tree:>9} {result["cold"] * 1000:>8.1f} {warm} {len(result["metrics"]):>8}  {same}{errors}')
+
+
+if __name__ == '__main__':
+    main()
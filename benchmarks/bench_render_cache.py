@@ -0,0 +1,132 @@
+"""CPU cost of warm page reruns with and without the render cache.
+
+Every page runs against the local mock server in `--sessions` concurrent
+simulated sessions (Streamlit AppTest instances on their own threads). After
+a first run that loads the data, each session reruns its page `--reruns`
+times, switching the granularity widget between Daily, Weekly and Monthly
+the way a visitor would. The process CPU time of those reruns is divided by
+their number. Each mode runs in its own interpreter, with
+MEGADASH_RENDER_CACHE on or off. First it checks that the cached spec of
+every chart kind has the marks and encodings the public st.<kind>_chart
+command draws, so a chart looks the same whichever path drew it. Run from
+the repository root:
+
+    python -m benchmarks.bench_render_cache --sessions 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = {
+    'pages/1_📊_On-Chain_Activity.py':'activity',
+    'pages/2_📈_Performance.py':'performance',
+    'pages/3_🪙_Staking.py':'staking',
+    'pages/4_🏦_DeFi.py':'defi',
+}
+GRANULARITIES = ['Daily', 'Weekly', 'Monthly']
+
+
+def measure(page, sessions, reruns):
+    """Child: CPU per warm rerun of `page` over concurrent sessions; prints JSON."""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from streamlit.testing.v1 import AppTest
+    from benchmarks.bench_pages import preload
+
+    preload(ROOT)
+    apps = [AppTest.from_file(os.path.join(ROOT, page), default_timeout=120) for _ in range(sessions)]
+    for app in apps:
+        app.run()
+    exceptions = [e.message for app in apps for e in app.exception]
+
+    def session(app, offset):
+        for i in range(reruns):
+            app.radio(key=f'{PAGES[page]}.granularity').set_value(GRANULARITIES[(i + offset) % len(GRANULARITIES)]).run()
+
+    threads = [threading.Thread(target=session, args=(app, i)) for i, app in enumerate(apps)]
+    cpu, start = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - start
+    exceptions += [e.message for app in apps for e in app.exception]
+    print(json.dumps({'cpu_ms':cpu * 1000 / (sessions * reruns), 'wall_s':wall, 'exceptions':exceptions[:1]}))
+
+
+def drawn(spec):
+    """(mark, encoding) of every layer of a Vega-Lite spec; selection parameter names differ between runs."""
+    return [(layer.get('mark'), layer.get('encoding')) for layer in spec.get('layer', [spec])]
+
+
+def check_specs():
+    """Kinds whose cached spec draws differently from the public chart command."""
+    from streamlit.testing.v1 import AppTest
+    from megadash.render import chart_spec
+
+    frame = pd.DataFrame({'Date':pd.date_range('2024-01-01', periods=30), 'A':range(30), 'B':range(30, 0, -1)})
+    mismatched = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'frame.pickle')
+        frame.to_pickle(path)
+        for kind in ['line', 'area', 'bar']:
+            app = AppTest.from_string(f'import pandas as pd\nimport streamlit as st\n'
+                                      f'st.{kind}_chart(pd.read_pickle({path!r}), x="Date", y=["A", "B"], height=500)')
+            public = json.loads(app.run()._tree.children[0].children[0].proto.spec)
+            cached = chart_spec(kind, frame, 'Date', ['A', 'B'], 500)
+            if drawn(cached) != drawn(public):
+                mismatched.append(kind)
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', nargs='+', default=list(PAGES))
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--reruns', type=int, default=12)
+    parser.add_argument('--measure', nargs=3, metavar=('PAGE', 'SESSIONS', 'RERUNS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        page, sessions, reruns = args.measure
+        measure(page, int(sessions), int(reruns))
+        return
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.mock_server import MockServer, make_dashboard_queries
+
+    mismatched = check_specs()
+    if mismatched:
+        raise SystemExit(f'cached chart specs differ from the public commands: {", ".join(mismatched)}')
+
+    env = dict(os.environ, MEGADASH_SCHEDULER='0')
+    with MockServer(protocols=20, latency=0.0, days=730, tokens=50) as mock:
+        env.update(MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                   MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/')
+        os.environ.update(env)
+        mock.queries = {query_id:json.dumps(rows).encode() for query_id, rows in make_dashboard_queries(730).items()}
+        print(f'{"page":<34} {"cache":>6} {"cpu ms/rerun":>13} {"wall s":>7}')
+        for page in args.pages:
+            for flag in ['0', '1']:
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_render_cache', '--measure', page,
+                                             str(args.sessions), str(args.reruns)],
+                                            env=dict(env, MEGADASH_CACHE_DIR=cache_dir, MEGADASH_RENDER_CACHE=flag),
+                                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                errors = f'  {result["exceptions"][0][:60]}' if result['exceptions'] else ''
+                print(f'{page:<34} {"on" if flag == "1" else "off":>6} {result["cpu_ms"]:>13.1f} '
+                      f'{result["wall_s"]:>7.2f}{errors}')
+
+
+if __name__ == '__main__':
+    main()
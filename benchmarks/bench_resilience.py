@@ -0,0 +1,140 @@
+"""Page behaviour while the upstreams fail, answer garbage or stall.
+
+Runs every page in this process under Streamlit's AppTest harness against
+the local mock server, switching its fault injection between scenarios:
+
+    healthy     cold start with working upstreams
+    outage      every request fails with HTTP 503 after the cache expired
+    malformed   every response body is truncated JSON
+    slow        cold cache and upstreams slower than the page budget
+    recovered   the slow scenario rerun until every page renders (a page stops
+                at its first unavailable dataset, so each rerun warms one more)
+
+For each page it prints the script time, exceptions, errors shown, whether
+the last-known-good badge is up and the metric count, then the upstream
+requests sent during the outage (circuit breakers keep them few) and the
+latency tail of hedged and unhedged small GETs against a server whose requests are
+sometimes slow. Run from the repository root:
+
+    python -m benchmarks.bench_resilience --budget 2
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def run_pages(pages, root):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for page in pages:
+        app = AppTest.from_file(os.path.join(root, page), default_timeout=120)
+        start = time.perf_counter()
+        app.run()
+        results[page] = {'ms':(time.perf_counter() - start) * 1000,
+                         'exceptions':[e.message for e in app.exception],
+                         'errors':[e.value for e in app.error],
+                         'badge':any('last known good' in w.value for w in app.warning),
+                         'metrics':len(app.metric)}
+    return results
+
+
+def print_scenario(name, results):
+    for page, r in results.items():
+        problem = (r['exceptions'] or r['errors'] or [''])[0][:70]
+        print(f'{name:<10} {page:<34} {r["ms"]:>8.0f} {len(r["exceptions"]):>4} {len(r["errors"]):>6} '
+              f'{str(r["badge"]):>6} {r["metrics"]:>8}  {problem}')
+
+
+def expire_all(config):
+    for source in config.CACHE_TTLS:
+        config.CACHE_TTLS[source] = 0
+
+
+def hedge_tail(url, requests_, hedge):
+    from megadash.client import HttpClient
+
+    client = HttpClient(hedge=hedge)
+    times = []
+    for _ in range(requests_):
+        start = time.perf_counter()
+        client.get(url, hedge=True).raise_for_status()
+        times.append(time.perf_counter() - start)
+    client.close()
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000, statistics.mean(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type=float, default=2.0)
+    parser.add_argument('--reset', type=float, default=1.0, help='circuit breaker reset timeout')
+    parser.add_argument('--hedge-requests', type=int, default=300)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    os.chdir(root)
+    from benchmarks.bench_pages import PAGES
+    from benchmarks.mock_server import MockServer, make_dashboard_queries
+
+    pages = [page for page in PAGES if page.startswith('pages/')]
+    with MockServer(protocols=10, latency=0.0, days=365, tokens=20) as mock, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ.update(MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                          MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                          MEGADASH_SCHEDULER='0', MEGADASH_CACHE_DIR=cache_dir,
+                          MEGADASH_PAGE_LATENCY_BUDGET=str(args.budget),
+                          MEGADASH_CIRCUIT_RESET_TIMEOUT=str(args.reset))
+        from megadash import cache, config
+
+        mock.queries = {query_id:json.dumps(rows).encode() for query_id, rows in make_dashboard_queries(365).items()}
+
+        print(f'{"scenario":<10} {"page":<34} {"ms":>8} {"exc":>4} {"errors":>6} {"badge":>6} {"metrics":>8}')
+        print_scenario('healthy', run_pages(pages, root))
+
+        expire_all(config)
+        mock.failure_rate = 1.0
+        sent = mock.requests
+        run_pages(pages, root)
+        time.sleep(0.5)
+        print_scenario('outage', run_pages(pages, root))
+        outage_requests = mock.requests - sent
+
+        mock.failure_rate = 0.0
+        mock.malformed_rate = 1.0
+        time.sleep(args.reset)
+        run_pages(pages, root)
+        time.sleep(0.5)
+        print_scenario('malformed', run_pages(pages, root))
+
+        mock.malformed_rate = 0.0
+        mock.latency = args.budget * 2
+        time.sleep(args.reset)
+        cache.get_cache().clear()
+        cache._failures.clear()
+        cache._memo.clear()
+        print_scenario('slow', run_pages(pages, root))
+        config.CACHE_TTLS.update({source:3600 for source in config.CACHE_TTLS})
+        for reruns in range(1, 6):
+            time.sleep(args.budget * 2)
+            results = run_pages(pages, root)
+            if not any(r['errors'] or r['exceptions'] for r in results.values()):
+                break
+        print_scenario('recovered', results)
+        print(f'\nreruns until recovered: {reruns}')
+        print(f'upstream requests during the outage: {outage_requests}')
+
+    with MockServer(protocols=5, latency=0.01, days=30, tokens=5, slow_rate=0.02, slow_latency=1.0) as mock:
+        print(f'\n{"hedging":<10} {"p50 ms":>8} {"p99 ms":>8} {"mean ms":>8}')
+        for hedge in (False, True):
+            p50, p99, mean = hedge_tail(f'{mock.url}/protocols', args.hedge_requests, hedge)
+            print(f'{"on" if hedge else "off":<10} {p50:>8.1f} {p99:>8.1f} {mean:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
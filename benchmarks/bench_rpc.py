@@ -0,0 +1,74 @@
+"""NEAR RPC client behaviour against local mock JSON-RPC servers.
+
+Measures, with a fixed per-request latency:
+
+    sequential   N `validators` calls one after another
+    batch        the same calls as one JSON-RPC batch
+    fallback     the same calls against a node that rejects batches
+                 (answered as concurrent single calls)
+    failover     one call with the first endpoint returning HTTP 503
+    epoch cold   NearRpc.validators() on an empty cache
+    epoch warm   NearRpc.validators() again within the same epoch
+    new epoch    NearRpc.validators() after the mock moves to the next epoch
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rpc --calls 5 --latency 0.05
+"""
+import argparse
+import time
+
+from benchmarks.mock_server import EPOCH_LENGTH, GENESIS_HEIGHT, MockServer
+from megadash.client import HttpClient
+from megadash.rpc import NearRpc
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--validators', type=int, default=300)
+    args = parser.parse_args()
+
+    mock_args = dict(protocols=0, latency=args.latency, validators=args.validators, archival_epochs=args.calls + 1)
+    with MockServer(**mock_args) as batching, MockServer(rpc_batch=False, **mock_args) as plain, \
+            MockServer(rpc_status=503, **mock_args) as down:
+        start_height = GENESIS_HEIGHT + batching.epoch * EPOCH_LENGTH
+        calls = [('validators', [start_height - 1 - i * EPOCH_LENGTH]) for i in range(args.calls)]
+
+        rpc = NearRpc([batching.url], client=HttpClient())
+        rpc.call('block', {'finality':'final'})
+        rows = [
+            ('sequential', *timed(lambda: [rpc.call(*c) for c in calls])),
+            ('batch', *timed(lambda: rpc.batch(calls))),
+        ]
+        fallback = NearRpc([plain.url], client=HttpClient())
+        fallback.call('block', {'finality':'final'})
+        rows.append(('fallback', *timed(lambda: fallback.batch(calls))))
+        failover = NearRpc([down.url, batching.url], client=HttpClient())
+        rows.append(('failover', *timed(lambda: failover.call('validators', [None]))))
+
+        epochs = NearRpc([batching.url], client=HttpClient())
+        rows.append(('epoch cold', *timed(epochs.validators)))
+        rows.append(('epoch warm', *timed(epochs.validators)))
+        batching.epoch += 1
+        rows.append(('new epoch', *timed(epochs.validators)))
+
+        assert [r['epoch_height'] for r in rows[1][2]] == [batching.epoch - 2 - i for i in range(args.calls)]
+        assert rows[1][2] == rows[2][2] == rows[0][2]
+        assert rows[-2][2] is rows[-3][2] and rows[-1][2]['epoch_height'] == batching.epoch
+
+    print(f'{args.calls} calls, {args.latency * 1000:.0f} ms latency, {args.validators} validators')
+    print(f'{"case":>12} {"ms":>8}')
+    for name, ms, _ in rows:
+        print(f'{name:>12} {ms:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
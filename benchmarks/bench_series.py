@@ -0,0 +1,96 @@
+"""Cost of a date range or granularity change on a multi-year chart history.
+
+For a random sequence of (range, granularity) selections, compares
+
+    filter     resample the full frame, boolean-mask the range and downsample
+               on every rerun (what a page would do without an index)
+    index      megadash.series.SeriesIndex.view, first time each selection
+               is seen (binary search on the DatetimeIndex of a cached
+               resample)
+    cached     the same view again, as on a rerun that did not change it
+
+and checks that both paths draw the same points. Run from the repository
+root:
+
+    python -m benchmarks.bench_series --days 1825 3650
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from megadash.downsample import downsample
+from megadash.series import GRANULARITIES, SeriesIndex
+
+
+HOW = {'BLOCKS_PRODUCED':'sum', 'BLOCK_TIME_SECONDS':'mean', 'MAX_TPS':'max', 'SUCCESS_RATE':'mean'}
+
+
+def make_frame(days, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'UTC_DATE':pd.date_range(end='2024-01-01', periods=days, freq='D'),
+        'BLOCKS_PRODUCED':rng.integers(80000, 90000, days),
+        'BLOCK_TIME_SECONDS':rng.normal(1.2, 0.05, days).astype('float32'),
+        'MAX_TPS':rng.lognormal(5, 0.5, days).astype('float32'),
+        'SUCCESS_RATE':rng.uniform(0.9, 1, days).astype('float32'),
+    })
+
+
+def filtered(frame, start, end, granularity, column):
+    periods = frame.set_index('UTC_DATE').resample(GRANULARITIES[granularity], label='left', closed='left')
+    rows = periods.agg(HOW)[[column]].loc[periods.size() > 0]
+    rows = rows.loc[(rows.index >= start) & (rows.index < end + pd.Timedelta(days=1))]
+    return downsample(rows.reset_index(), 'UTC_DATE')
+
+
+def selections(frame, count, seed=0):
+    rng = random.Random(seed)
+    days = list(frame['UTC_DATE'])
+    picked = []
+    for _ in range(count):
+        start, end = sorted(rng.sample(range(len(days)), 2))
+        picked.append((days[start], days[end], rng.choice(list(GRANULARITIES)), rng.choice(list(HOW))))
+    return picked
+
+
+def timed_each(fn, picked):
+    times = []
+    for selection in picked:
+        start = time.perf_counter()
+        fn(*selection)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 1825, 3650])
+    parser.add_argument('--selections', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f'{"days":>6} {"build ms":>9} {"filter ms":>10} {"index ms":>9} {"cached ms":>10} {"worst filter":>13} '
+          f'{"worst index":>12}')
+    for days in args.days:
+        frame = make_frame(days)
+        picked = selections(frame, args.selections)
+        start = time.perf_counter()
+        index = SeriesIndex(frame, 'UTC_DATE', HOW)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for selection in picked[:5]:
+            pd.testing.assert_frame_equal(index.view(*selection[:3], [selection[3]]), filtered(frame, *selection))
+        index = SeriesIndex(frame, 'UTC_DATE', HOW)
+
+        filter_ms, filter_worst = timed_each(lambda *s: filtered(frame, *s), picked)
+        index_ms, index_worst = timed_each(lambda s, e, g, c: index.view(s, e, g, [c]), picked)
+        cached_ms, _ = timed_each(lambda s, e, g, c: index.view(s, e, g, [c]), picked)
+        print(f'{days:>6} {build_ms:>9.2f} {filter_ms:>10.2f} {index_ms:>9.2f} {cached_ms:>10.4f} '
+              f'{filter_worst:>13.2f} {index_worst:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Per-process memory of snapshot readers, and consistency across version swaps.
+
+memory   publishes a DeFi dataset (TVL frame and token matrices from the
+         synthetic DefiLlama fixtures) as an Arrow and as a Parquet
+         snapshot, then starts 1..N reader processes at once. Each loads
+         the dataset through SnapshotStore and touches every value; the
+         growth of its private memory (USS) and proportional share (PSS) is
+         read while all readers hold the data. Mapped Arrow columns are shared page cache, so the total PSS
+         stays close to one copy as readers are added; Parquet readers each
+         hold their own copy.
+
+swap     one process publishes a new version every few milliseconds (keeping
+         only two versions on disk, so readers' files get pruned under them)
+         while reader processes read the dataset in a loop. Every value a
+         reader sees must come from a single version: the frame column and
+         the token matrices of a version all hold its number.
+
+Linux only (reads /proc/self/smaps_rollup). Run from the repository root:
+
+    python -m benchmarks.bench_snapshots --protocols 40 --days 1095 --readers 1 2 4 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_aggregations import load_frames
+from megadash.snapshots import SnapshotStore
+from megadash.tokens import TokenMatrix
+
+
+def memory(pid='self'):
+    """(USS, PSS) of a process in MB."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return fields['Private_Clean'] + fields['Private_Dirty'], fields['Pss']
+
+
+def touch(value):
+    if isinstance(value, pd.DataFrame):
+        return sum(float(pd.util.hash_pandas_object(value[c], index=False).sum() % 7) for c in value.columns)
+    if isinstance(value, tuple):
+        return sum(touch(item) for item in value)
+    if isinstance(value, dict):
+        return sum(float(np.nansum(m.values)) + float(m.dates.astype('int64').sum()) for m in value.values()
+                   if isinstance(m, TokenMatrix))
+    return 0
+
+
+def read_once(root):
+    """Child: load the dataset, report memory growth, then hold it until stdin closes."""
+    store = SnapshotStore(root)
+    before = memory()
+    value, _ = store.entry('defi.defi')
+    touch(value)
+    after = memory()
+    print(f'{after[0] - before[0]:.2f} {before[1]:.2f}', flush=True)
+    sys.stdin.read()
+
+
+def measure_readers(root, count):
+    children = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_snapshots', '--read', root],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(count)]
+    try:
+        reports = [[float(x) for x in child.stdout.readline().split()] for child in children]
+        # PSS splits shared pages between the processes mapping them, so read it with all of them loaded
+        return [(private, memory(child.pid)[1] - pss_before) for child, (private, pss_before) in zip(children, reports)]
+    finally:
+        for child in children:
+            child.stdin.close()
+            child.wait()
+
+
+def swap_values(version, rows=20000, days=365):
+    dates = pd.date_range(end='2024-01-01', periods=days, freq='D')
+    frame = pd.DataFrame({'v':np.full(rows, version, dtype='int64'), 'x':np.arange(rows, dtype='float64')})
+    matrices = {f'dex-{i}':TokenMatrix(np.asarray(dates), np.array([f'T{j}' for j in range(20)], dtype=object),
+                                       np.full((days, 20), float(version))) for i in range(5)}
+    return frame, matrices, {'version':str(version)}
+
+
+def publish_loop(root, versions, interval):
+    """Child: publish `versions` versions of the swap dataset."""
+    store = SnapshotStore(root)
+    for version in range(1, versions + 1):
+        store.publish({'swap':(swap_values(version), float(version))}, keep=2)
+        time.sleep(interval)
+
+
+def read_loop(root, seconds):
+    """Child: read the swap dataset until `seconds` pass and report versions seen and inconsistencies."""
+    store = SnapshotStore(root)
+    seen, errors, reads = set(), [], 0
+    stop = time.time() + seconds
+    while time.time() < stop:
+        entry = store.entry('swap')
+        if entry is None:
+            continue
+        (frame, matrices, record), created = entry
+        versions = {int(created), int(record['version'])} | set(frame['v'].unique().tolist())
+        versions |= {int(np.unique(m.values)[0]) for m in matrices.values()}
+        if len(versions) != 1:
+            errors.append(sorted(versions))
+        seen |= versions
+        reads += 1
+    print(reads, len(seen), len(errors), errors[:3], flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--protocols', type=int, default=40)
+    parser.add_argument('--days', type=int, default=1095)
+    parser.add_argument('--tokens', type=int, default=200)
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--swap-readers', type=int, default=4)
+    parser.add_argument('--swap-versions', type=int, default=200)
+    parser.add_argument('--read', help=argparse.SUPPRESS)
+    parser.add_argument('--publish', nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument('--read-loop', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.read:
+        return read_once(args.read)
+    if args.publish:
+        return publish_loop(args.publish[0], int(args.publish[1]), float(args.publish[2]))
+    if args.read_loop:
+        return read_loop(args.read_loop[0], float(args.read_loop[1]))
+
+    frames = load_frames(args.protocols, args.days, args.tokens)
+    value = (frames['tvl'], frames['token_matrices'], {})
+    with tempfile.TemporaryDirectory() as root:
+        print(f'tvl rows: {len(frames["tvl"])}, '
+              f'token matrices: {sum(m.nbytes for m in frames["token_matrices"].values()) / 2**20:.1f} MB')
+        print(f'{"format":>8} {"readers":>8} {"private MB/proc":>16} {"PSS MB/proc":>12} {"total PSS MB":>13}')
+        for format in ['arrow', 'parquet']:
+            store = SnapshotStore(os.path.join(root, format), format)
+            store.publish({'defi.defi':(value, 1.0)})
+            decoded, _ = store.entry('defi.defi')
+            pd.testing.assert_frame_equal(decoded[0], frames['tvl'])
+            for name, matrix in frames['token_matrices'].items():
+                assert np.array_equal(decoded[1][name].values, matrix.values, equal_nan=True)
+                assert list(decoded[1][name].symbols) == list(matrix.symbols)
+            for count in args.readers:
+                reports = measure_readers(store.root, count)
+                private = sum(r[0] for r in reports) / count
+                pss = sum(r[1] for r in reports)
+                print(f'{format:>8} {count:>8} {private:>16.1f} {pss / count:>12.1f} {pss:>13.1f}')
+
+        swap_root = os.path.join(root, 'swap')
+        interval = 0.005
+        seconds = args.swap_versions * interval * 3
+        SnapshotStore(swap_root).publish({'swap':(swap_values(0), 0.0)})
+        readers = [subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_snapshots', '--read-loop', swap_root,
+                                     str(seconds)], stdout=subprocess.PIPE, text=True)
+                   for _ in range(args.swap_readers)]
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_snapshots', '--publish', swap_root,
+                        str(args.swap_versions), str(interval)], check=True)
+        print(f'{"reader":>7} {"reads":>7} {"versions seen":>14} {"inconsistent":>13}')
+        for i, reader in enumerate(readers):
+            reads, seen, inconsistent, examples = reader.communicate()[0].split(' ', 3)
+            print(f'{i:>7} {reads:>7} {seen:>14} {inconsistent:>13} {examples.strip() if int(inconsistent) else ""}')
+            assert reader.returncode == 0 and int(inconsistent) == 0 and int(seen) > 1
+
+
+if __name__ == '__main__':
+    main()
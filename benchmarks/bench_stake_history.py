@@ -0,0 +1,107 @@
+"""Ingest, reload and query time of the validator stake history.
+
+Generates synthetic `validators` RPC results for `--epochs` consecutive
+epochs, with a few validators joining and leaving every epoch, and records
+them one epoch at a time in a megadash.stakehistory.StakeHistory under a
+temporary directory. The concentration metrics it computed per epoch are
+checked against a from-scratch pandas recomputation over the long
+(epoch, account_id, stake) frame, which is also timed, as is reloading the
+history from disk and reading one validator's stake history. Run from the
+repository root:
+
+    python -m benchmarks.bench_stake_history --epochs 1000 --validators 300 1000
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from megadash.stakehistory import NAKAMOTO_THRESHOLD, TOP_N, StakeHistory
+
+
+def make_epochs(epochs, validators, churn=3, seed=0):
+    """`validators` results of `epochs` consecutive epochs; `churn` validators are replaced each epoch."""
+    rng = random.Random(seed)
+    pool = list(range(validators))
+    next_id = validators
+    stakes = {v:rng.randrange(10**28, 10**32) for v in pool}
+    for epoch in range(epochs):
+        for _ in range(churn):
+            pool.remove(rng.choice(pool))
+            pool.append(next_id)
+            stakes[next_id] = rng.randrange(10**28, 10**31)
+            next_id += 1
+        for v in pool:
+            stakes[v] += rng.randrange(0, 10**27)
+        yield {'epoch_height':epoch, 'epoch_start_height':9820210 + epoch * 43200,
+               'current_validators':[{'account_id':f'validator-{v}.poolv1.near', 'stake':str(stakes[v])} for v in pool]}
+
+
+def reference(long):
+    """Concentration metrics recomputed from the long frame, one epoch at a time."""
+    rows, previous = [], None
+    for epoch, group in long.groupby('EPOCH_NUM', sort=True):
+        stakes = np.sort(group['stake'].to_numpy())
+        n, total = len(stakes), stakes.sum()
+        largest = np.cumsum(stakes[::-1])
+        current = set(group['account_id'])
+        rows.append({
+            'EPOCH_NUM':epoch,
+            'GINI':np.abs(stakes[:, None] - stakes[None, :]).sum() / (2 * n * total),
+            'NAKAMOTO':int(np.argmax(largest > total * NAKAMOTO_THRESHOLD)) + 1,
+            f'TOP{TOP_N}_SHARE':largest[TOP_N - 1] / total,
+            'CHURN':np.nan if previous is None else len(current ^ previous) / len(previous),
+        })
+        previous = current
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--epochs', type=int, default=1000)
+    parser.add_argument('--validators', type=int, nargs='+', default=[300, 1000])
+    args = parser.parse_args()
+
+    print(f'{"validators":>10} {"rows":>9} {"add ms":>7} {"reload ms":>10} {"recompute ms":>13} {"stakes ms":>10} '
+          f'{"history MB":>11} {"long MB":>8}  same')
+    for count in args.validators:
+        results = list(make_epochs(args.epochs, count))
+        with tempfile.TemporaryDirectory() as root:
+            history = StakeHistory(root, epochs=args.epochs)
+            start = time.perf_counter()
+            for result in results:
+                history.add(result)
+            add_ms = (time.perf_counter() - start) * 1000 / len(results)
+
+            start = time.perf_counter()
+            reloaded = StakeHistory(root, epochs=args.epochs)
+            reload_ms = (time.perf_counter() - start) * 1000
+            assert reloaded.metrics().equals(history.metrics()) and reloaded.rows == history.rows
+
+            account = results[-1]['current_validators'][0]['account_id']
+            start = time.perf_counter()
+            stakes = reloaded.validator_stakes(account)
+            stakes_ms = (time.perf_counter() - start) * 1000
+            assert len(stakes)
+
+        long = pd.DataFrame({
+            'EPOCH_NUM':np.repeat([r['epoch_height'] for r in results], [len(r['current_validators']) for r in results]),
+            'account_id':[v['account_id'] for r in results for v in r['current_validators']],
+            'stake':[int(v['stake']) / 1e24 for r in results for v in r['current_validators']],
+        })
+        start = time.perf_counter()
+        expected = reference(long)
+        recompute_ms = (time.perf_counter() - start) * 1000
+        metrics = history.metrics()
+        same = all(np.allclose(metrics[c], expected[c], rtol=1e-9, equal_nan=True) for c in expected.columns)
+
+        print(f'{count:>10} {history.rows:>9} {add_ms:>7.2f} {reload_ms:>10.1f} {recompute_ms:>13.1f} {stakes_ms:>10.2f} '
+              f'{history.nbytes / 2**20:>11.1f} {long.memory_usage(deep=True).sum() / 2**20:>8.1f}  {same}')
+    print('add ms: per epoch, including its segment and metrics writes; long MB: the same rows as a pandas frame')
+
+
+if __name__ == '__main__':
+    main()
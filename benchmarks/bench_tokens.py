@@ -0,0 +1,101 @@
+"""Build time and peak memory of the token liquidity engine.
+
+Builds synthetic DEX `tokensInUsd` histories (500 tokens x 3 years by default)
+and ranks tokens by latest liquidity in two ways:
+
+    melt     the list-comprehension + melt frame and sort/groupby ranking the
+             DeFi page used
+    matrix   megadash.tokens.TokenMatrix.from_entries + latest_by_symbol
+
+Rankings are checked to match. Peak memory is measured with tracemalloc.
+Run from the repository root:
+
+    python -m benchmarks.bench_tokens --dexes 3 --tokens 500 --days 1095
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks import defillama_fixtures
+from megadash import aggregations
+from megadash.tokens import TokenMatrix
+
+
+def melt(name, entries):
+    tokens_df = pd.concat([pd.DataFrame([{'date':x['date']} for x in entries]),
+                           pd.DataFrame([x['tokens'] for x in entries])], axis=1)
+    tokens_df['date'] = tokens_df['date'].apply(lambda x: datetime.utcfromtimestamp(x))
+    tokens_df = tokens_df.melt(id_vars='date', var_name='symbol', value_name='tvl_usd')
+    tokens_df['protocol'] = name
+    return tokens_df
+
+
+def rank_melted(token_tvl_data, reference):
+    chart_data = token_tvl_data.copy()
+    reference_tokens = token_tvl_data.loc[token_tvl_data['protocol'] == reference].symbol.unique()
+    chart_data = chart_data.loc[chart_data['symbol'].isin(reference_tokens)]
+    chart_data = chart_data.dropna()
+    chart_data['date'] = chart_data['date'].dt.date
+    chart_data = chart_data.sort_values(by=['symbol','date','tvl_usd'], ascending=[False,False,False])
+    chart_data = chart_data.groupby(['date','symbol','protocol'], as_index=False).head(1)
+    chart_data = chart_data.groupby(['date','symbol'], as_index=False).agg({'tvl_usd':'sum'})
+    chart_data = chart_data.sort_values(by=['symbol','date'], ascending=[False,False])
+    chart_data = chart_data.groupby(['symbol'], as_index=False).head(1)
+    return chart_data.sort_values(by='tvl_usd', ascending=False).reset_index(drop=True)
+
+
+def run_melt(histories, reference):
+    frame = pd.concat([melt(name, entries) for name, entries in histories.items()], axis=0)
+    return rank_melted(frame, reference)[['symbol', 'tvl_usd']]
+
+
+def run_matrix(histories, reference):
+    matrices = {name:TokenMatrix.from_entries(entries) for name, entries in histories.items()}
+    ranked = aggregations.top_tokens(matrices, reference)
+    return ranked.rename(columns={'TVL ($)':'tvl_usd'})[['symbol', 'tvl_usd']], matrices
+
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dexes', type=int, default=3)
+    parser.add_argument('--tokens', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1095)
+    args = parser.parse_args()
+
+    histories = {f'DEX {i}':defillama_fixtures.make_protocol(f'dex-{i}', 'Dexes', args.days, args.tokens)['tokensInUsd']
+                 for i in range(args.dexes)}
+    reference = 'DEX 0'
+    cells = sum(len(e['tokens']) for entries in histories.values() for e in entries)
+    print(f'{args.dexes} DEXes x {args.tokens} tokens x {args.days} days, {cells} token points')
+
+    expected, melt_time, melt_peak = measure(lambda: run_melt(histories, reference))
+    (got, matrices), matrix_time, matrix_peak = measure(lambda: run_matrix(histories, reference))
+    pd.testing.assert_frame_equal(got.round(2), expected.round(2), check_dtype=False)
+
+    print(f'{"engine":>8} {"time (s)":>9} {"peak MB":>9} {"held MB":>9}')
+    print(f'{"melt":>8} {melt_time:>9.2f} {melt_peak:>9.1f} {"":>9}')
+    print(f'{"matrix":>8} {matrix_time:>9.2f} {matrix_peak:>9.1f} {sum(m.nbytes for m in matrices.values()) / 2**20:>9.1f}')
+
+    start = time.perf_counter()
+    for _ in range(100):
+        aggregations.top_tokens(matrices, reference)
+    print(f'ranking only: {(time.perf_counter() - start) * 10:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Overhead of megadash.tracing, disabled and enabled.
+
+Times a no-op function called bare, through `traced` and inside `span`, with
+tracing off and on, then (unless --no-pages) runs every page through
+benchmarks.bench_pages with MEGADASH_TRACING=0 and =1 and compares their cold
+and warm script times. Run from the repository root:
+
+    python -m benchmarks.bench_tracing
+"""
+import argparse
+import os
+import time
+
+from benchmarks.bench_pages import PAGES, ROOT, run_tree
+from megadash import tracing
+
+
+def noop():
+    pass
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def micro(calls):
+    saved = tracing._recorder
+    results = {}
+    try:
+        for state, recorder in [('off', None), ('on', tracing.Recorder())]:
+            tracing._recorder = recorder
+            wrapped = tracing.traced('bench.traced')(noop)
+
+            def in_span():
+                with tracing.span('bench.span'):
+                    noop()
+
+            results[state] = {'bare':per_call_ns(noop, calls), 'traced':per_call_ns(wrapped, calls),
+                              'span':per_call_ns(in_span, calls)}
+    finally:
+        tracing._recorder = saved
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--no-pages', action='store_true')
+    args = parser.parse_args()
+
+    print(f'{"tracing":>8} {"bare ns":>8} {"traced ns":>10} {"span ns":>8}')
+    for state, result in micro(args.calls).items():
+        print(f'{state:>8} {result["bare"]:>8.0f} {result["traced"]:>10.0f} {result["span"]:>8.0f}')
+    if args.no_pages:
+        return
+
+    from benchmarks.mock_server import MockServer, make_dashboard_queries
+
+    with MockServer(protocols=20, latency=0.0, days=730, tokens=50, queries=make_dashboard_queries(730)) as mock:
+        env = dict(os.environ, MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                   MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                   MEGADASH_SCHEDULER='0')
+        runs = {state:run_tree(ROOT, PAGES, args.reruns, dict(env, MEGADASH_TRACING=flag))
+                for state, flag in [('off', '0'), ('on', '1')]}
+
+    print(f'\n{"page":<34} {"cold off":>9} {"cold on":>8} {"warm off":>9} {"warm on":>8}')
+    for page in PAGES:
+        off, on = runs['off'][page], runs['on'][page]
+        print(f'{page:<34} {off["cold"] * 1000:>9.1f} {on["cold"] * 1000:>8.1f} '
+              f'{off["warm"] * 1000:>9.1f} {on["warm"] * 1000:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Refresh cost of the incremental time-series store vs re-parsing the full history.
+
+Each refresh receives the full upstream history with one new day appended,
+as the Flipside latest-result endpoint does, so the JSON decode itself is
+paid either way. The columns show:
+
+    baseline     pd.DataFrame(json.loads(...)) + pd.to_datetime, as the pages did
+    typed full   megadash.flipside.parse of every row
+    typed since  megadash.flipside.parse of rows at or after the high-water mark
+    merge        TimeSeriesStore.merge of those rows
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tsstore
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import pandas as pd
+
+from megadash import flipside
+from megadash.tsstore import TimeSeriesStore
+
+
+SCHEMA = {
+    'UTC_DATE':'datetime',
+    'TRANSACTIONS':'int64',
+    'ACTIVE_ACCOUNTS':'int64',
+    'ACTIVE_CONTRACTS':'int64',
+}
+
+
+def make_payload(days):
+    dates = pd.date_range(start='2000-01-01', periods=days, freq='D')
+    return json.dumps([{'UTC_DATE':d.strftime('%Y-%m-%d 00:00:00.000'), 'TRANSACTIONS':300000 + i,
+                        'ACTIVE_ACCOUNTS':50000 + i, 'ACTIVE_CONTRACTS':1000 + i}
+                       for i, d in enumerate(dates)]).encode()
+
+
+def baseline(payload):
+    frame = pd.DataFrame(json.loads(payload))
+    frame['UTC_DATE'] = pd.to_datetime(frame['UTC_DATE'])
+    return frame
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 3650, 36500])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"history (days)":>15} {"baseline (ms)":>14} {"typed full (ms)":>16} {"typed since (ms)":>17} '
+          f'{"merge (ms)":>11} {"rows merged":>12}')
+    for days in args.days:
+        previous, payload = make_payload(days - 1), make_payload(days)
+        base, _ = timed(lambda: baseline(payload), args.repeat)
+        full, _ = timed(lambda: flipside.parse(payload, SCHEMA), args.repeat)
+
+        with tempfile.TemporaryDirectory() as root:
+            store = TimeSeriesStore(root)
+            store.merge('bench', flipside.parse(previous, SCHEMA), date_column='UTC_DATE', key='UTC_DATE')
+            since = ('UTC_DATE', store.high_water_mark('bench'))
+            incremental, new_rows = timed(lambda: flipside.parse(payload, SCHEMA, since=since), args.repeat)
+            merge, _ = timed(lambda: store.merge('bench', new_rows, date_column='UTC_DATE', key='UTC_DATE'), args.repeat)
+            assert len(store.read('bench')) == days
+
+        print(f'{days:>15} {base:>14.1f} {full:>16.1f} {incremental:>17.1f} {merge:>11.1f} {len(new_rows):>12}')
+
+
+if __name__ == '__main__':
+    main()
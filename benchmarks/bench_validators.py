@@ -0,0 +1,94 @@
+"""Build time, size and stake precision of the validator table.
+
+Generates synthetic `validators` RPC results with yoctoNEAR stakes and builds
+the Staking page's validator data in two ways:
+
+    original   pd.DataFrame + astype(float)/1e24 + sort + per-row apply for the
+               type, then the page's copy, two query() scans and label concat
+    compact    megadash.validators.validator_table + type_counts
+
+Stake precision is checked against exact integer arithmetic. Run from the
+repository root:
+
+    python -m benchmarks.bench_validators --validators 1000 10000
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from megadash.validators import MICRO, type_counts, validator_table
+
+
+def make_result(count, seed=0):
+    rng = random.Random(seed)
+    return {'current_validators':[
+        {'account_id':f'validator-{i}.poolv1.near',
+         'stake':str(rng.randrange(10**28, 10**32)),
+         'num_expected_blocks':rng.choice([0, rng.randrange(1, 500)]),
+         'num_produced_blocks':rng.randrange(0, 500),
+         'num_expected_chunks':rng.randrange(0, 2000),
+         'num_produced_chunks':rng.randrange(0, 2000),
+         'shards':[rng.randrange(4)], 'is_slashed':False}
+        for i in range(count)]}
+
+
+def original(data):
+    validators_df = pd.DataFrame(data['current_validators'])
+    validators_df['stake'] = validators_df['stake'].astype('float')/1e24
+    validators_df = validators_df.sort_values(by='stake', ascending=False)
+    validators_df = validators_df.reset_index().drop('index', axis=1)
+    validators_df = validators_df.assign(validator_type = lambda x: x['num_expected_blocks'].apply(lambda y: 'Block Producer' if y > 0 else 'Chunk-Only Producer'))
+    validators_df['rank'] = validators_df.index+1
+
+    validators_df = validators_df.copy()
+    block_producers_count = validators_df.query("validator_type=='Block Producer'").shape[0]
+    chunk_only_producers_count = validators_df.query("validator_type=='Chunk-Only Producer'").shape[0]
+    chart_data = validators_df[['account_id','stake','rank']].copy()
+    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(4, ' ') + '. ' + chart_data['account_id']
+    return validators_df, chart_data, block_producers_count, chunk_only_producers_count
+
+
+def compact(data):
+    table = validator_table(data['current_validators'])
+    return table, table[['label','stake']], type_counts(table)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--validators', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"validators":>10} {"original ms":>12} {"compact ms":>11} {"original MB":>12} {"compact MB":>11} '
+          f'{"float err":>10} {"exact":>6}')
+    for count in args.validators:
+        data = make_result(count)
+        original_ms, (frame, chart, producers, chunk_only) = timed(lambda: original(data), args.repeat)
+        compact_ms, (table, _, counts) = timed(lambda: compact(data), args.repeat)
+
+        assert (producers, chunk_only) == (counts['Block Producer'], counts['Chunk-Only Producer'])
+        assert list(chart['xlabel']) == list(table['label'])
+        exact_total = sum(int(v['stake']) for v in data['current_validators']) // 10**18
+        float_error = abs(frame['stake'].sum() * MICRO - exact_total)
+        truncated = sum(int(v['stake']) // 10**18 for v in data['current_validators'])
+        exact = int(table['stake_micro'].sum()) == truncated
+
+        print(f'{count:>10} {original_ms:>12.1f} {compact_ms:>11.1f} '
+              f'{frame.memory_usage(deep=True).sum() / 2**20:>12.2f} {table.memory_usage(deep=True).sum() / 2**20:>11.2f} '
+              f'{float_error:>10.0f} {str(exact):>6}')
+    print('float err: total stake error of the float column, in microNEAR')
+
+
+if __name__ == '__main__':
+    main()
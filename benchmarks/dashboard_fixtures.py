@@ -0,0 +1,104 @@
+"""Response fixtures for every upstream endpoint the dashboard pages read.
+
+A fixture directory holds one recorded (or generated) response per endpoint:
+
+    flipside/<query id>.json        Flipside query results
+    defillama/protocols.json        DefiLlama protocol listing
+    defillama/protocol/<slug>.json  DefiLlama protocol histories
+    near_rpc/block.json             NEAR RPC `block` (finality final) result
+    near_rpc/validators.json        NEAR RPC `validators` result
+
+`generate` writes synthetic responses at one of the SCALES; `record` saves the
+live responses. MockServer.from_fixtures serves a directory.
+
+    python -m benchmarks.dashboard_fixtures generate fixtures/medium --scale medium
+    python -m benchmarks.dashboard_fixtures record fixtures/live
+"""
+import argparse
+import json
+import os
+
+from benchmarks import defillama_fixtures
+from benchmarks.mock_server import EPOCH_LENGTH, GENESIS_HEIGHT, make_dashboard_queries, make_validators
+
+
+SCALES = {
+    'small':{'days':90, 'protocols':5, 'tokens':10, 'validators':50},
+    'medium':{'days':365, 'protocols':20, 'tokens':50, 'validators':100},
+    'large':{'days':1825, 'protocols':60, 'tokens':200, 'validators':300},
+}
+EPOCH = 100
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def generate(out_dir, scale='medium'):
+    params = SCALES[scale]
+    from megadash.aggregations import REFERENCE_DEX
+
+    for query_id, rows in make_dashboard_queries(params['days']).items():
+        write_json(os.path.join(out_dir, 'flipside', f'{query_id}.json'), rows)
+    defillama_dir = os.path.join(out_dir, 'defillama')
+    defillama_fixtures.generate(defillama_dir, params['protocols'], params['days'], params['tokens'])
+    listing, _ = defillama_fixtures.load(defillama_dir)
+    listing[0]['name'] = REFERENCE_DEX
+    write_json(os.path.join(defillama_dir, 'protocols.json'), listing)
+    write_json(os.path.join(out_dir, 'near_rpc', 'block.json'),
+               {'header':{'height':GENESIS_HEIGHT + EPOCH * EPOCH_LENGTH + 100, 'epoch_id':f'epoch-{EPOCH}'}})
+    write_json(os.path.join(out_dir, 'near_rpc', 'validators.json'), make_validators(params['validators'], EPOCH))
+
+
+def record(out_dir, limit=None):
+    from megadash.flipside import fetch_rows
+    from megadash.rpc import get_rpc
+    from megadash.sources import activity, performance, staking
+
+    for query_id in [activity.SCORECARD_QUERY, activity.BARCHART_QUERY, performance.SCORECARD_QUERY,
+                     performance.BARCHART_QUERY, staking.STAKING_QUERY]:
+        write_json(os.path.join(out_dir, 'flipside', f'{query_id}.json'), fetch_rows(query_id))
+    defillama_fixtures.record(os.path.join(out_dir, 'defillama'), limit)
+    rpc = get_rpc()
+    write_json(os.path.join(out_dir, 'near_rpc', 'block.json'), rpc.call('block', {'finality':'final'}))
+    write_json(os.path.join(out_dir, 'near_rpc', 'validators.json'), rpc.call('validators', [None]))
+
+
+def load(fixture_dir):
+    """{'flipside': {query id: bytes}, 'protocols': list, 'payloads': {slug: bytes}, 'block': dict, 'validators': dict}."""
+    flipside_dir = os.path.join(fixture_dir, 'flipside')
+    flipside = {}
+    for name in sorted(os.listdir(flipside_dir)):
+        with open(os.path.join(flipside_dir, name), 'rb') as f:
+            flipside[name[:-len('.json')]] = f.read()
+    protocols, responses = defillama_fixtures.load(os.path.join(fixture_dir, 'defillama'))
+    with open(os.path.join(fixture_dir, 'near_rpc', 'block.json')) as f:
+        block = json.load(f)
+    with open(os.path.join(fixture_dir, 'near_rpc', 'validators.json')) as f:
+        validators = json.load(f)
+    return {'flipside':flipside, 'protocols':protocols,
+            'payloads':{slug:json.dumps(data).encode() for slug, data in responses.items()},
+            'block':block, 'validators':validators}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record')
+    rec.add_argument('out_dir')
+    rec.add_argument('--limit', type=int, help='DefiLlama protocols to record')
+    gen = sub.add_parser('generate')
+    gen.add_argument('out_dir')
+    gen.add_argument('--scale', choices=list(SCALES), default='medium')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.out_dir, args.limit)
+    else:
+        generate(args.out_dir, args.scale)
+
+
+if __name__ == '__main__':
+    main()
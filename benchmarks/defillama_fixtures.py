@@ -0,0 +1,126 @@
+"""DefiLlama response fixtures for replaying refreshes offline.
+
+`record` saves live /protocols and /protocol/{slug} responses for NEAR
+protocols into a directory; `generate` writes synthetic responses of the same
+shape (daily points plus DefiLlama's intraday "now" point). `advance` turns a
+response into the one DefiLlama would serve some days later, which is what a
+refresh sees.
+
+    python -m benchmarks.defillama_fixtures record fixtures/defillama
+    python -m benchmarks.defillama_fixtures generate fixtures/defillama --protocols 40
+"""
+import argparse
+import copy
+import json
+import os
+import random
+
+from megadash.client import HttpClient
+from megadash.config import defillama_url
+
+
+DAY = 86400
+END = 1700000000 - 1700000000 % DAY
+
+
+def make_protocol(slug, category, days, tokens, seed=0, end=END):
+    rng = random.Random(f'{slug}-{seed}')
+    tvl, level = [], rng.uniform(1e5, 1e8)
+    token_points = []
+    symbols = [f'TKN{j}' for j in range(tokens)]
+    for i in range(days):
+        date = end - DAY * (days - 1 - i)
+        level *= rng.uniform(0.97, 1.03)
+        tvl.append({'date':date, 'totalLiquidityUSD':round(level, 2)})
+        listed = symbols[:max(1, tokens * (i + 1) // days)]
+        token_points.append({'date':date, 'tokens':{s:round(level / len(listed) * rng.uniform(0.5, 1.5), 2)
+                                                    for s in listed}})
+    now = end + DAY // 2
+    tvl.append({'date':now, 'totalLiquidityUSD':round(level * 1.01, 2)})
+    token_points.append({'date':now, 'tokens':dict(token_points[-1]['tokens'])})
+    data = {'name':slug, 'category':category, 'chainTvls':{'Near':{'tvl':tvl}}}
+    if category == 'Dexes':
+        data['tokensInUsd'] = token_points
+    return data
+
+
+def generate(out_dir, protocols=20, days=730, tokens=50, seed=0):
+    os.makedirs(os.path.join(out_dir, 'protocol'), exist_ok=True)
+    listing = [{'name':f'Protocol {i}', 'slug':f'protocol-{i}', 'chains':['Near'],
+                'category':'Dexes' if i % 4 == 0 else 'Lending'}
+               for i in range(protocols)]
+    with open(os.path.join(out_dir, 'protocols.json'), 'w') as f:
+        json.dump(listing, f)
+    for p in listing:
+        with open(os.path.join(out_dir, 'protocol', f'{p["slug"]}.json'), 'w') as f:
+            json.dump(make_protocol(p['slug'], p['category'], days, tokens if p['category'] == 'Dexes' else 0, seed), f)
+
+
+def record(out_dir, limit=None):
+    client = HttpClient()
+    os.makedirs(os.path.join(out_dir, 'protocol'), exist_ok=True)
+    protocols = client.get_json(defillama_url('protocols'))
+    listing = [x for x in protocols if 'Near' in x['chains'] and x['category'] != 'CEX'][:limit]
+    with open(os.path.join(out_dir, 'protocols.json'), 'w') as f:
+        json.dump(listing, f)
+    for p in listing:
+        with open(os.path.join(out_dir, 'protocol', f'{p["slug"]}.json'), 'w') as f:
+            json.dump(client.get_json(defillama_url(f'protocol/{p["slug"]}')), f)
+
+
+def load(fixture_dir):
+    """Return (protocols, {slug: /protocol response}) from a fixture directory."""
+    with open(os.path.join(fixture_dir, 'protocols.json')) as f:
+        protocols = json.load(f)
+    responses = {}
+    for p in protocols:
+        path = os.path.join(fixture_dir, 'protocol', f'{p["slug"]}.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                responses[p['slug']] = json.load(f)
+    return protocols, responses
+
+
+def advance(data, days=1, seed=1):
+    """The response DefiLlama would serve `days` days after `data`."""
+    rng = random.Random(seed)
+    data = copy.deepcopy(data)
+    series = [data['chainTvls']['Near']['tvl']]
+    if 'tokensInUsd' in data:
+        series.append(data['tokensInUsd'])
+    for points in series:
+        now = points.pop()
+        last = points[-1]
+        for i in range(days):
+            point = copy.deepcopy(now)
+            point['date'] = last['date'] + DAY * (i + 1)
+            if 'totalLiquidityUSD' in point:
+                point['totalLiquidityUSD'] = round(point['totalLiquidityUSD'] * rng.uniform(0.97, 1.03), 2)
+            points.append(point)
+        now = copy.deepcopy(points[-1])
+        now['date'] += DAY // 2
+        points.append(now)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record')
+    rec.add_argument('out_dir')
+    rec.add_argument('--limit', type=int)
+    gen = sub.add_parser('generate')
+    gen.add_argument('out_dir')
+    gen.add_argument('--protocols', type=int, default=20)
+    gen.add_argument('--days', type=int, default=730)
+    gen.add_argument('--tokens', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.out_dir, args.limit)
+    else:
+        generate(args.out_dir, args.protocols, args.days, args.tokens)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""Concurrent-viewer load test of the dashboard served by `streamlit run`.
+
+Serves generated upstream responses (benchmarks.dashboard_fixtures at
+`--scale`) from MockServer, starts the app with `streamlit run` in a child
+process against it, and connects simulated viewers over Streamlit's websocket
+protocol the way a browser tab does. Each viewer opens a session on one of
+the four pages (round robin), loads it, then reruns it `--visit` times by
+switching the page's granularity radio, waiting `--think` seconds (+-50%)
+between interactions, and starts over as a new visitor. One probe session
+loads every page first, so the levels measure a replica with warm data
+caches.
+
+For every concurrency level in `--sessions` the viewers run for `--duration`
+seconds and the report shows:
+
+    reruns/s     script runs (loads and reruns) finished per second
+    p50 .. p99   rerun latency: from sending a rerun to its script_finished
+    load p90     latency of the first run of a new session
+    cpu %        app server process CPU over the level (100 = one core)
+    rss MB       app server resident memory at the end of the level, and peak
+    errors       runs that raised, timed out or lost their connection
+
+When latency grows with the level while throughput stays flat, reruns are
+queueing for the server's CPU. The load generator shares the machine, so its
+own CPU is reported as well. Results are written as JSON and can be compared
+against an earlier file; exits non-zero on errors or a regression. Run from
+the repository root:
+
+    python -m benchmarks.loadtest --sessions 1 8 32 --output load.json
+    python -m benchmarks.loadtest --env MEGADASH_RENDER_CACHE=0 --compare load.json
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+from benchmarks import dashboard_fixtures
+from benchmarks.bench_pages import ROOT
+from benchmarks.mock_server import MockServer
+from benchmarks.suite import git_revision
+
+
+APP = 'NEAR_Megadashboard.py'
+PAGES = sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, 'pages', '*.py')))
+PERCENTILES = [50, 90, 99]
+
+
+class Session:
+    """One simulated browser tab: a websocket session of the app server."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.app_pages = []
+        self.radios = {}
+        self.cached = set()
+        self.websocket = None
+
+    async def __aenter__(self):
+        self.websocket = await connect(self.url, subprotocols=['streamlit'], max_size=None,
+                                       open_timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.websocket.close()
+
+    async def run(self, page_hash='', widgets=None):
+        """Rerun the script of `page_hash` with the string `widgets` states; returns (seconds, exception messages)."""
+        message = BackMsg()
+        state = message.rerun_script
+        state.page_script_hash = page_hash
+        # like a browser, report the elements already received so the server sends references to them
+        state.cached_message_hashes.extend(self.cached)
+        for widget_id, value in (widgets or {}).items():
+            widget = state.widget_states.widgets.add()
+            widget.id = widget_id
+            widget.string_value = value
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        exceptions = await asyncio.wait_for(self._receive(), self.timeout)
+        return time.perf_counter() - start, exceptions
+
+    async def _receive(self):
+        exceptions = []
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self.websocket.recv())
+            kind = message.WhichOneof('type')
+            if message.metadata.cacheable:
+                self.cached.add(message.hash)
+            if kind in ('new_session', 'navigation') and getattr(message, kind).app_pages:
+                self.app_pages = list(getattr(message, kind).app_pages)
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                if element.WhichOneof('type') == 'exception':
+                    exceptions.append(element.exception.message)
+                elif element.WhichOneof('type') == 'radio':
+                    self.radios[element.radio.id] = list(element.radio.options)
+            elif kind == 'page_not_found':
+                exceptions.append(f'page not found: {message.page_not_found.page_name}')
+            elif kind == 'script_finished':
+                return exceptions
+
+    def radio(self, suffix):
+        """(widget id, options) of the radio whose user key ends with `suffix`."""
+        for widget_id, options in self.radios.items():
+            if widget_id.endswith(suffix):
+                return widget_id, options
+        return None, []
+
+
+async def viewer(url, page, page_hash, deadline, args, samples, errors, rng):
+    """Visit `page` as new sessions until `deadline`, appending (page, kind, seconds) to `samples`."""
+    while time.monotonic() < deadline:
+        try:
+            async with Session(url, args.timeout) as session:
+                seconds, exceptions = await session.run(page_hash)
+                samples.append((page, 'load', seconds))
+                errors.extend(exceptions)
+                widget_id, options = session.radio('.granularity')
+                for i in range(args.visit):
+                    await asyncio.sleep(args.think * rng.uniform(0.5, 1.5))
+                    if time.monotonic() >= deadline:
+                        break
+                    widgets = {widget_id:options[(i + 1) % len(options)]} if widget_id else {}
+                    seconds, exceptions = await session.run(page_hash, widgets)
+                    samples.append((page, 'rerun', seconds))
+                    errors.extend(exceptions)
+        except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+            errors.append(f'{type(e).__name__}: {e}')
+            await asyncio.sleep(0.1)
+
+
+def process_stats(pid):
+    """(CPU seconds, resident MB, peak resident MB) of process `pid`, from /proc."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    with open(f'/proc/{pid}/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return cpu, int(status['VmRSS'].split()[0]) / 1024, int(status['VmHWM'].split()[0]) / 1024
+
+
+def percentiles(values):
+    if not values:
+        return {f'p{p}':None for p in PERCENTILES}
+    return {f'p{p}':round(float(v) * 1000, 1) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+async def run_level(url, pid, pages, sessions, args):
+    samples, errors, rss_peak = [], [], 0.0
+    rng = random.Random(sessions)
+    cpu, start, client_cpu = process_stats(pid)[0], time.monotonic(), time.process_time()
+    deadline = start + args.duration
+    viewers = [asyncio.create_task(viewer(url, page, page_hash, deadline, args, samples, errors, rng))
+               for page, page_hash in (list(pages.items())[i % len(pages)] for i in range(sessions))]
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.25)
+        rss_peak = max(rss_peak, process_stats(pid)[1])
+    finished = len(samples)
+    await asyncio.gather(*viewers)
+    wall = time.monotonic() - start
+    cpu, rss, _ = process_stats(pid)[0] - cpu, *process_stats(pid)[1:]
+    samples = samples[:finished]
+    reruns = [seconds for _, kind, seconds in samples if kind == 'rerun']
+    return {
+        'runs':len(samples),
+        'throughput':round(len(samples) / args.duration, 2),
+        'rerun_ms':percentiles(reruns),
+        'load_ms':percentiles([seconds for _, kind, seconds in samples if kind == 'load']),
+        'pages':{page:dict(percentiles([s for p, kind, s in samples if p == page and kind == 'rerun']),
+                           reruns=sum(1 for p, kind, _ in samples if p == page and kind == 'rerun'))
+                 for page in pages},
+        'cpu_percent':round(cpu * 100 / wall, 1),
+        'client_cpu_percent':round((time.process_time() - client_cpu) * 100 / wall, 1),
+        'rss_mb':round(rss, 1),
+        'rss_peak_mb':round(max(rss_peak, rss), 1),
+        'errors':len(errors),
+        'error_sample':errors[:3],
+    }
+
+
+async def load_pages(url, timeout):
+    """Page script hash of every page, loading each once; returns ({page: hash}, {page: cold seconds}, errors)."""
+    async with Session(url, timeout) as session:
+        _, errors = await session.run()
+        pages, cold = {}, {}
+        for page in PAGES:
+            name = os.path.basename(page)[:-3]
+            match = [p for p in session.app_pages if p.url_pathname and name.endswith(p.url_pathname)]
+            if not match:
+                errors.append(f'{page}: not among the app pages')
+                continue
+            pages[page] = match[0].page_script_hash
+            cold[page], exceptions = await session.run(pages[page])
+            errors.extend(exceptions)
+    return pages, cold, errors
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(env, log, timeout=60):
+    """Start `streamlit run` on a free port and wait for its health check; returns (process, base URL)."""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', APP, '--server.headless', 'true',
+                                '--server.address', '127.0.0.1', '--server.port', str(port),
+                                '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+                               cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process, f'127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'streamlit did not start within {timeout}s, see {log.name}')
+
+
+def check(results, previous, tolerance=0.25):
+    """Human-readable problems: errors, and levels slower or with less throughput than `previous` by `tolerance`."""
+    problems = [f'{sessions} sessions: {level["errors"]} errors, e.g. {level["error_sample"][0][:120]}'
+                for sessions, level in results['levels'].items() if level['errors']]
+    for sessions, level in results['levels'].items():
+        before = (previous or {}).get('levels', {}).get(sessions)
+        if not before:
+            continue
+        for p in ['p50', 'p90']:
+            now, then = level['rerun_ms'][p], before['rerun_ms'][p]
+            # latencies of a few milliseconds are mostly noise
+            if now and then and then >= 20 and now > then * (1 + tolerance):
+                problems.append(f'{sessions} sessions: rerun {p} {now:.0f} ms vs {then:.0f} ms before')
+        if before['throughput'] and level['throughput'] < before['throughput'] * (1 - tolerance):
+            problems.append(f'{sessions} sessions: {level["throughput"]} runs/s vs {before["throughput"]} before')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16, 32], help='concurrency levels')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level')
+    parser.add_argument('--think', type=float, default=1.0, help='mean seconds between interactions')
+    parser.add_argument('--visit', type=int, default=5, help='reruns per session before it reconnects')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds before a run counts as an error')
+    parser.add_argument('--scale', choices=list(dashboard_fixtures.SCALES), default='medium')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every upstream request')
+    parser.add_argument('--env', nargs='*', default=[], metavar='NAME=VALUE', help='extra app server environment')
+    parser.add_argument('--slo', type=float, default=1.0, help='p90 rerun seconds a level has to stay under')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        'created':time.time(),
+        'revision':git_revision(),
+        'python':platform.python_version(),
+        'cpus':os.cpu_count(),
+        'config':{'scale':args.scale, 'latency':args.latency, 'duration':args.duration, 'think':args.think,
+                  'visit':args.visit, 'env':args.env},
+        'levels':{},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        dashboard_fixtures.generate(os.path.join(tmp, 'fixtures'), args.scale)
+        with MockServer.from_fixtures(os.path.join(tmp, 'fixtures'), latency=args.latency) as mock, \
+                open(os.path.join(tmp, 'streamlit.log'), 'w') as log:
+            env = dict(os.environ, MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                       MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                       MEGADASH_SCHEDULER='0', MEGADASH_READ_SNAPSHOTS='0',
+                       MEGADASH_CACHE_DIR=os.path.join(tmp, 'cache'),
+                       **dict(item.split('=', 1) for item in args.env))
+            process, address = start_app(env, log)
+            try:
+                url = f'ws://{address}/_stcore/stream'
+                pages, cold, errors = asyncio.run(load_pages(url, args.timeout))
+                results['cold_ms'] = {page:round(seconds * 1000, 1) for page, seconds in cold.items()}
+                results['startup_errors'] = errors[:3]
+                print(f'cold loads: {", ".join(f"{os.path.basename(p)} {t:.0f} ms" for p, t in results["cold_ms"].items())}')
+                print(f'{"sessions":>8} {"reruns/s":>9} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"load p90":>9} '
+                      f'{"cpu %":>6} {"client %":>9} {"rss MB":>7} {"peak MB":>8} {"errors":>7}')
+                for sessions in args.sessions:
+                    level = results['levels'][str(sessions)] = asyncio.run(run_level(url, process.pid, pages, sessions, args))
+                    rerun = {p:'-' if v is None else f'{v:.0f}' for p, v in level['rerun_ms'].items()}
+                    load = level['load_ms']['p90']
+                    print(f'{sessions:>8} {level["throughput"]:>9.1f} {rerun["p50"]:>8} {rerun["p90"]:>8} {rerun["p99"]:>8} '
+                          f'{"-" if load is None else f"{load:.0f}":>9} {level["cpu_percent"]:>6.0f} '
+                          f'{level["client_cpu_percent"]:>9.0f} {level["rss_mb"]:>7.0f} {level["rss_peak_mb"]:>8.0f} '
+                          f'{level["errors"]:>7}')
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    within = [int(s) for s, level in results['levels'].items()
+              if level['rerun_ms']['p90'] is not None and level['rerun_ms']['p90'] <= args.slo * 1000]
+    results['max_sessions_within_slo'] = max(within, default=None)
+    print(f'highest level with p90 rerun <= {args.slo:g}s: {results["max_sessions_within_slo"]} sessions '
+          f'({results["cpus"]} CPUs)')
+    for page in pages:
+        p90s = [(s, level['pages'][page]['p90']) for s, level in results['levels'].items()]
+        print(f'  {page:<34} ' + '  '.join(f'{s}: p90 {"-" if p90 is None else f"{p90:.0f}"} ms' for s, p90 in p90s))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    problems = check(results, previous, args.tolerance)
+    problems += [f'startup: {error[:120]}' for error in results['startup_errors']]
+    for problem in problems:
+        print('REGRESSION' if 'before' in problem else 'ERROR', problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
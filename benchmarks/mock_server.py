@@ -0,0 +1,259 @@
+"""Local stand-in for the Flipside, DefiLlama and NEAR RPC APIs used by the benchmarks."""
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DAY = 86400
+
+
+def make_protocol_list(count):
+    return [{'name':f'Protocol {i}', 'slug':f'protocol-{i}', 'chains':['Near'],
+             'category':'Dexes' if i % 3 == 0 else 'Lending'}
+            for i in range(count)]
+
+
+def make_protocol(slug, days=365, tokens=20, end=1700000000):
+    dates = [end - DAY*(days-1-i) for i in range(days)]
+    return {
+        'name':slug,
+        'chainTvls':{'Near':{'tvl':[{'date':d, 'totalLiquidityUSD':1e6 + i*1e3} for i, d in enumerate(dates)]}},
+        'tokensInUsd':[{'date':d, 'tokens':{f'TKN{j}':1e4 + i + j for j in range(tokens)}} for i, d in enumerate(dates)],
+    }
+
+
+def make_flipside_rows(days=365, end=1700000000):
+    return [{'UTC_DATE':time.strftime('%Y-%m-%d', time.gmtime(end - DAY*(days-1-i))),
+             'TRANSACTIONS':300000 + i, 'ACTIVE_ACCOUNTS':50000 + i, 'ACTIVE_CONTRACTS':1000 + i}
+            for i in range(days)]
+
+
+def make_dashboard_queries(days=365, end=1700000000):
+    """Flipside rows for each query the dashboard pages read, keyed by query id."""
+    from megadash.sources import activity, performance, staking
+
+    dates = [time.strftime('%Y-%m-%d 00:00:00.000', time.gmtime(end - DAY*(days-1-i))) for i in range(days)]
+    performance_scorecard = {}
+    for metric, value in [('BLOCKS_PRODUCED', 86000), ('BLOCK_TIME_SECONDS', 1.21), ('SUCCESS_RATE', 0.974)]:
+        for period in ['24H', '7D', '30D']:
+            performance_scorecard[f'{metric}__PAST_{period}'] = value
+            performance_scorecard[f'{metric}__DELTA_{period}'] = 0.012
+    for period in ['24H', '7D', '30D']:
+        performance_scorecard[f'MAX_TPS__PAST_{period}'] = 210.5
+    return {
+        activity.SCORECARD_QUERY:[{'METRIC':metric, 'TIME_PERIOD':period, 'CURRENT_VALUE':1000 * (i + 1) + j,
+                                   'DELTA':0.05 * (i - 1)}
+                                  for j, metric in enumerate(['Transactions', 'Active Accounts', 'Active Contracts'])
+                                  for i, period in enumerate(['P24H', 'P7D', 'P30D'])],
+        activity.BARCHART_QUERY:[{'UTC_DATE':d, 'TRANSACTIONS':300000 + i, 'ACTIVE_ACCOUNTS':50000 + i,
+                                  'ACTIVE_CONTRACTS':1000 + i} for i, d in enumerate(dates)],
+        performance.SCORECARD_QUERY:[performance_scorecard],
+        performance.BARCHART_QUERY:[{'UTC_DATE':d, 'BLOCKS_PRODUCED':86000 + i, 'BLOCK_TIME_SECONDS':1.1 + i / 10000,
+                                     'MAX_TPS':100 + i, 'SUCCESS_RATE':0.95} for i, d in enumerate(dates)],
+        staking.STAKING_QUERY:[{'EPOCH_NUM':1000 + i, 'START_TIME':time.strftime('%Y-%m-%d %H:%M:%S.000',
+                                                                                   time.gmtime(end - 43200*(2*days-i))),
+                                'TOTAL_NEAR_STAKED':4e8 + i * 1e5, 'TOTAL_NEAR_SUPPLY':1.1e9 + i * 1e5}
+                               for i in range(2 * days)],
+    }
+
+
+EPOCH_LENGTH = 43200
+GENESIS_HEIGHT = 9820210
+
+
+def make_validators(count=100, epoch=0):
+    start = GENESIS_HEIGHT + epoch * EPOCH_LENGTH
+
+    def validator(i, shift):
+        return {'account_id':f'validator-{(i + shift) % (count + 5)}.poolv1.near',
+                'stake':str((count - i) * 10**30 + epoch * 10**24),
+                'num_expected_blocks':100 if i < count // 2 else 0,
+                'num_produced_blocks':95 if i < count // 2 else 0}
+
+    return {
+        'current_validators':[validator(i, epoch) for i in range(count)],
+        'next_validators':[validator(i, epoch + 1) for i in range(count)],
+        'current_proposals':[validator(i, epoch + 2) for i in range(count // 10)],
+        'prev_epoch_kickout':[],
+        'epoch_start_height':start,
+        'epoch_height':epoch,
+    }
+
+
+class MockServer:
+    """Serve synthetic upstream responses on a random localhost port.
+
+    `latency` is added to every request and `connect_latency` once per new
+    connection, standing in for the TCP and TLS handshakes of the real hosts.
+    `queries` maps Flipside query ids to their rows (see make_dashboard_queries);
+    other queries get generic daily activity rows. `jitter` adds up to that
+    many seconds of random latency and `failure_rate` is the share of
+    requests answered with HTTP `failure_status` instead. `slow_rate` of the
+    requests take `slow_latency` seconds longer, and `malformed_rate` of them
+    get a truncated JSON body. All of these can be changed while serving.
+    """
+
+    def __init__(self, protocols=10, latency=0.05, days=365, tokens=20, connect_latency=0.0,
+                 validators=100, epoch=100, rpc_batch=True, rpc_status=200, archival_epochs=5, queries=None,
+                 jitter=0.0, failure_rate=0.0, failure_status=503, seed=0, slow_rate=0.0, slow_latency=0.0,
+                 malformed_rate=0.0):
+        self.protocols = make_protocol_list(protocols)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.flipside = json.dumps(make_flipside_rows(days)).encode()
+        self.queries = {query_id:json.dumps(rows).encode() for query_id, rows in (queries or {}).items()}
+        self.validator_count = validators
+        self.epoch = epoch
+        self.rpc_batch = rpc_batch
+        self.rpc_status = rpc_status
+        self.archival_epochs = archival_epochs
+        self.rpc_requests = 0
+        self.payloads = {p['slug']:json.dumps(make_protocol(p['slug'], days, tokens)).encode() for p in self.protocols}
+        self.block = None
+        self.validator_set = None
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.malformed_rate = malformed_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.server = None
+
+    @classmethod
+    def from_fixtures(cls, fixtures, **kwargs):
+        """Serve a benchmarks.dashboard_fixtures directory (or its loaded dict) instead of synthetic data."""
+        if isinstance(fixtures, str):
+            from benchmarks.dashboard_fixtures import load
+            fixtures = load(fixtures)
+        mock = cls(protocols=0, days=1, **kwargs)
+        mock.queries = dict(fixtures['flipside'])
+        mock.protocols = fixtures['protocols']
+        mock.payloads = dict(fixtures['payloads'])
+        mock.block = fixtures['block']
+        mock.validator_set = fixtures['validators']
+        return mock
+
+    def delay(self):
+        """Seconds to wait before answering, whether to fail the request and whether to corrupt its body."""
+        with self._random_lock:
+            self.requests += 1
+            wait = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            if self.slow_rate > 0 and self._random.random() < self.slow_rate:
+                wait += self.slow_latency
+            fail = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            malformed = self.malformed_rate > 0 and self._random.random() < self.malformed_rate
+            self.failures += fail
+        return wait, fail, malformed
+
+    def rpc_result(self, request):
+        method, params = request.get('method'), request.get('params')
+        if method == 'block' and self.block is not None:
+            return self.block
+        if method == 'validators' and self.validator_set is not None:
+            block_id = params[0] if isinstance(params, list) else (params or {}).get('block_id')
+            if block_id is not None:
+                raise LookupError('UNKNOWN_EPOCH')
+            return self.validator_set
+        if method == 'block':
+            height = GENESIS_HEIGHT + self.epoch * EPOCH_LENGTH + 100
+            return {'header':{'height':height, 'epoch_id':f'epoch-{self.epoch}'}}
+        if method == 'validators':
+            block_id = params[0] if isinstance(params, list) else (params or {}).get('block_id')
+            epoch = self.epoch if block_id is None else (block_id - GENESIS_HEIGHT) // EPOCH_LENGTH
+            if not 0 <= self.epoch - epoch < self.archival_epochs:
+                raise LookupError('UNKNOWN_EPOCH')
+            return make_validators(self.validator_count, epoch)
+        raise KeyError(method)
+
+    def rpc_response(self, request):
+        try:
+            return {'jsonrpc':'2.0', 'id':request.get('id'), 'result':self.rpc_result(request)}
+        except KeyError:
+            error = {'name':'REQUEST_VALIDATION_ERROR', 'cause':{'name':'METHOD_NOT_FOUND'}}
+        except LookupError as e:
+            error = {'name':'HANDLER_ERROR', 'cause':{'name':str(e.args[0])}}
+        return {'jsonrpc':'2.0', 'id':request.get('id'),
+                'error':dict(error, code=-32000, message='Server error', data=error['cause']['name'])}
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                time.sleep(mock.connect_latency)
+                super().setup()
+
+            def do_GET(self):
+                wait, fail, malformed = mock.delay()
+                time.sleep(wait)
+                if fail:
+                    self.send_error(mock.failure_status)
+                    return
+                if self.path == '/protocols':
+                    body = json.dumps(mock.protocols).encode()
+                elif self.path.startswith('/protocol/') and self.path[len('/protocol/'):] in mock.payloads:
+                    body = mock.payloads[self.path[len('/protocol/'):]]
+                elif self.path.startswith('/api/v2/queries/'):
+                    body = mock.queries.get(self.path.split('/')[4], mock.flipside)
+                else:
+                    self.send_error(404)
+                    return
+                self.send_body(body[:len(body) // 2] if malformed else body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                wait, fail, malformed = mock.delay()
+                time.sleep(wait)
+                mock.rpc_requests += 1
+                if fail:
+                    self.send_error(mock.failure_status)
+                    return
+                if mock.rpc_status != 200:
+                    self.send_error(mock.rpc_status)
+                    return
+                if isinstance(request, list) and mock.rpc_batch:
+                    response = [mock.rpc_response(r) for r in request]
+                elif isinstance(request, list):
+                    response = {'jsonrpc':'2.0', 'id':None,
+                                'error':{'code':-32700, 'message':'Parse error', 'name':'REQUEST_VALIDATION_ERROR',
+                                         'cause':{'name':'PARSE_ERROR'}, 'data':'batch requests are not supported'}}
+                else:
+                    response = mock.rpc_response(request)
+                body = json.dumps(response).encode()
+                self.send_body(body[:len(body) // 2] if malformed else body)
+
+            def send_body(self, body):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, compresslevel=1)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,127 @@
+"""Offline page-load benchmark suite with machine-readable results.
+
+For each fixture scale, serves the recorded or generated upstream responses
+(benchmarks.dashboard_fixtures) from MockServer with the given latency and
+failure injection, then times every page through Streamlit's AppTest in its
+own interpreter with an empty cache (see benchmarks.bench_pages.measure):
+cold load, fetch, transform and render. Results are written as JSON and
+checked against per-stage thresholds in milliseconds, and optionally
+against a previous results file. Exits non-zero on a regression or a page
+exception. Run from the repository root:
+
+    python -m benchmarks.suite --scales small medium --output results.json
+    python -m benchmarks.suite --fixtures fixtures/live --compare results.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import dashboard_fixtures
+from benchmarks.bench_pages import PAGES, ROOT, run_tree
+from benchmarks.mock_server import MockServer
+
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+STAGES = ['cold', 'fetch', 'transform', 'render']
+
+
+def run_scale(fixture_dir, pages, reruns, latency, jitter, failure_rate):
+    with MockServer.from_fixtures(fixture_dir, latency=latency, jitter=jitter, failure_rate=failure_rate) as mock:
+        env = dict(os.environ, MEGADASH_FLIPSIDE_URL=mock.url, MEGADASH_DEFILLAMA_URL=mock.url,
+                   MEGADASH_NEAR_RPC_URL=mock.url + '/', MEGADASH_NEAR_RPC_URLS=mock.url + '/',
+                   MEGADASH_SCHEDULER='0', MEGADASH_READ_SNAPSHOTS='0', MEGADASH_BOOT_PREFETCH='0')
+        results = run_tree(ROOT, pages, reruns, env)
+        requests, failures = mock.requests, mock.failures
+    pages_ms = {page:dict({stage:round(result['stages'][stage] * 1000, 2) for stage in STAGES[1:]},
+                          cold=round(result['cold'] * 1000, 2), exceptions=result['exceptions'])
+                for page, result in results.items()}
+    return {'pages':pages_ms, 'requests':requests, 'failures':failures}
+
+
+def check(results, thresholds, previous=None, tolerance=0.25):
+    """Human-readable regressions: stages over their threshold or `tolerance` slower than `previous`."""
+    problems = []
+    for scale, scale_results in results['scales'].items():
+        limits = thresholds.get(scale, {})
+        for page, timings in scale_results['pages'].items():
+            if timings['exceptions']:
+                problems.append(f'{scale} {page}: exception {timings["exceptions"][0][:120]}')
+            page_limits = dict(limits.get('*', {}), **limits.get(page, {}))
+            for stage in STAGES:
+                if stage in page_limits and timings[stage] > page_limits[stage]:
+                    problems.append(f'{scale} {page}: {stage} {timings[stage]:.0f} ms > {page_limits[stage]} ms')
+                before = (previous or {}).get('scales', {}).get(scale, {}).get('pages', {}).get(page, {}).get(stage)
+                # small stages are mostly noise, so only compare the ones that take real time
+                if before and before >= 20 and timings[stage] > before * (1 + tolerance):
+                    problems.append(f'{scale} {page}: {stage} {timings[stage]:.0f} ms vs {before:.0f} ms before')
+    return problems
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', nargs='+', choices=list(dashboard_fixtures.SCALES), default=['small', 'medium'])
+    parser.add_argument('--fixtures', help='recorded fixture directory to use instead of generated scales')
+    parser.add_argument('--pages', nargs='+', default=PAGES)
+    parser.add_argument('--reruns', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every upstream request')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--thresholds', default=THRESHOLDS)
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        'created':time.time(),
+        'revision':git_revision(),
+        'python':platform.python_version(),
+        'config':{'latency':args.latency, 'jitter':args.jitter, 'failure_rate':args.failure_rate,
+                  'reruns':args.reruns},
+        'scales':{},
+    }
+    scales = {'recorded':args.fixtures} if args.fixtures else {scale:None for scale in args.scales}
+    print(f'{"scale":>8} {"page":<34} {"cold ms":>8} {"fetch":>8} {"transform":>10} {"render":>8}')
+    for scale, fixture_dir in scales.items():
+        with tempfile.TemporaryDirectory() as generated:
+            if fixture_dir is None:
+                fixture_dir = generated
+                dashboard_fixtures.generate(fixture_dir, scale)
+            results['scales'][scale] = run_scale(fixture_dir, args.pages, args.reruns, args.latency, args.jitter,
+                                                 args.failure_rate)
+        for page, t in results['scales'][scale]['pages'].items():
+            print(f'{scale:>8} {page:<34} {t["cold"]:>8.1f} {t["fetch"]:>8.1f} {t["transform"]:>10.1f} '
+                  f'{t["render"]:>8.1f}{"  " + t["exceptions"][0][:60] if t["exceptions"] else ""}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    problems = check(results, thresholds, previous, args.tolerance)
+    for problem in problems:
+        print('REGRESSION', problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
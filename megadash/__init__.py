@@ -0,0 +1 @@
+"""Shared data layer for the NEAR Mega Dashboard pages."""
@@ -0,0 +1,6 @@
+import sys
+
+from megadash.pipeline import main
+
+
+sys.exit(main())
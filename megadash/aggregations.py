@@ -0,0 +1,69 @@
+"""Chart-ready frames derived from the page datasets.
+
+Each aggregation is a plain function of the dataset frames. `get_defi_frames`
+runs all of them once per version of the cached DeFi dataset (the time its
+cache entry was stored) and keeps the result in process memory, so reruns and
+other sessions reuse it instead of re-aggregating on the script thread.
+"""
+from collections import namedtuple
+
+from megadash.cache import memoized
+from megadash.downsample import top_series
+from megadash.series import SeriesIndex
+from megadash.sources.defi import get_defi_data
+from megadash.tokens import latest_by_symbol
+from megadash.tracing import traced
+
+
+REFERENCE_DEX = 'Ref Finance'
+
+DefiFrames = namedtuple('DefiFrames', ['by_category', 'by_protocol', 'top_protocols', 'top_tokens', 'failed'])
+
+
+def tvl_by_category(tvl):
+    """Daily TVL summed per category, one column per category."""
+    chart_data = tvl.groupby(['date', 'category'])['tvl_usd'].sum().unstack('category')
+    return chart_data.reset_index().rename(columns={'date':'Date'})
+
+
+def tvl_by_protocol(tvl):
+    """Daily TVL per protocol, one column per protocol."""
+    chart_data = tvl.groupby(['date', 'protocol'])['tvl_usd'].mean().unstack('protocol')
+    return chart_data.reset_index().rename(columns={'date':'Date'})
+
+
+def top_protocols(tvl):
+    """Latest TVL of each protocol, ranked."""
+    chart_data = tvl.sort_values(by=['protocol', 'date']).drop_duplicates(subset='protocol', keep='last')
+    chart_data = chart_data.sort_values(by='tvl_usd', ascending=False).reset_index(drop=True)
+    chart_data['rank'] = chart_data.index+1
+    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(3, ' ') + '. ' + chart_data['protocol'] + ' (' + chart_data['category'] + ')'
+    chart_data['tvl_usd'] = chart_data['tvl_usd'].round(2)
+    return chart_data.rename(columns={'tvl_usd':'TVL ($)', 'xlabel':'Protocol'})
+
+
+def top_tokens(tokens, reference=REFERENCE_DEX):
+    """Latest DEX liquidity of each token listed on the `reference` DEX, summed over DEXes and ranked.
+
+    `tokens` maps DEX names to megadash.tokens.TokenMatrix objects.
+    """
+    symbols = tokens[reference].listed() if reference in tokens else []
+    chart_data = latest_by_symbol(tokens, symbols)
+    chart_data = chart_data.sort_values(by='tvl_usd', ascending=False).reset_index(drop=True)
+    chart_data['tvl_usd'] = chart_data['tvl_usd'].round(2)
+    chart_data['rank'] = chart_data.index+1
+    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(3, ' ') + '. ' + chart_data['symbol']
+    return chart_data.rename(columns={'xlabel':'Token', 'tvl_usd':'TVL ($)'})
+
+
+@traced('transform.defi_frames')
+def defi_frames(tvl, tokens, failed):
+    """All DeFi chart frames; the TVL histories are capped to their largest series and indexed by date."""
+    by_category = SeriesIndex(top_series(tvl_by_category(tvl), 'Date'), 'Date', 'mean')
+    by_protocol = SeriesIndex(top_series(tvl_by_protocol(tvl), 'Date'), 'Date', 'mean')
+    return DefiFrames(by_category, by_protocol, top_protocols(tvl), top_tokens(tokens), failed)
+
+
+def get_defi_frames():
+    entry = get_defi_data.entry()
+    return memoized(f'{get_defi_data.cache_name}.frames', entry.created, lambda: defi_frames(*entry.value))
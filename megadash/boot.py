@@ -0,0 +1,112 @@
+"""App-boot warm-up: load the datasets of every page at once.
+
+Without it the first visitor of a fresh process waits for each page's
+datasets one after another, and only when the page is visited. `Boot` walks
+the dependency graph in megadash.datasets: every dataset starts loading at
+once, through the same shared load a page asking for it waits on (see
+cache.cached), and each transform is built as soon as all of its inputs are
+in. Cold boot to every page warm then takes about as long as the slowest
+chain of upstream calls instead of the sum of all of them.
+
+Datasets that are fresh in the cache are not fetched again. A dataset that
+fails is left to the pages and the scheduler, and the transforms built from
+it are skipped.
+"""
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from megadash import config
+from megadash.datasets import DATASETS, PAGES, TRANSFORMS
+
+
+class Boot:
+    def __init__(self, datasets=None, transforms=None):
+        self.datasets = DATASETS if datasets is None else datasets
+        self.transforms = TRANSFORMS if transforms is None else transforms
+        self.started = None
+        self.futures = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Start loading every dataset, and building every transform once its inputs are in; returns self."""
+        with self._lock:
+            if self.started is not None:
+                return self
+            self.started = time.monotonic()
+            for dataset in self.datasets:
+                self._track(dataset.name, dataset.loader.prefetch())
+            for transform in self.transforms:
+                future = Future()
+                self._track(transform.name, future)
+                threading.Thread(target=self._build, args=(transform, future), name=f'megadash-boot-{transform.name}',
+                                 daemon=True).start()
+        return self
+
+    def _track(self, name, future):
+        self.futures[name] = future
+        self._stats[name] = {'state':'loading', 'seconds':None, 'error':None}
+        future.add_done_callback(lambda f: self._finished(name, f))
+
+    def _finished(self, name, future):
+        error = future.exception()
+        with self._lock:
+            self._stats[name] = {'state':'ready' if error is None else 'failed',
+                                 'seconds':time.monotonic() - self.started,
+                                 'error':None if error is None else f'{type(error).__name__}: {error}'}
+
+    def _build(self, transform, future):
+        inputs = [self.futures[name] for name in transform.inputs]
+        wait(inputs)
+        failed = [name for name, f in zip(transform.inputs, inputs) if f.exception() is not None]
+        try:
+            if failed:
+                raise RuntimeError(f'skipped, {", ".join(failed)} failed to load')
+            future.set_result(transform.build())
+        except Exception as e:
+            future.set_exception(e)
+
+    def ready(self, page=None):
+        """Whether everything `page` reads (default: every page) has finished loading or failed."""
+        names = PAGES[page] if page is not None else list(self.futures)
+        with self._lock:
+            return self.started is not None and all(self.futures[name].done() for name in names if name in self.futures)
+
+    def wait(self, timeout=None):
+        """Block until every dataset and transform is done or `timeout` passes; returns whether all are."""
+        with self._lock:
+            futures = list(self.futures.values())
+        return not wait(futures, timeout=timeout).not_done
+
+    @property
+    def elapsed(self):
+        """Seconds from the start to the last dataset or transform done, or None while any is loading."""
+        stats = self.stats()
+        if not stats or any(s['seconds'] is None for s in stats.values()):
+            return None
+        return max(s['seconds'] for s in stats.values())
+
+    def stats(self):
+        with self._lock:
+            return {name:dict(s) for name, s in self._stats.items()}
+
+
+_boot = None
+_boot_lock = threading.Lock()
+
+
+def get_boot():
+    global _boot
+    with _boot_lock:
+        if _boot is None:
+            _boot = Boot()
+        return _boot
+
+
+def ensure_booted():
+    """Start the process-wide warm-up once, unless disabled or the app serves snapshots."""
+    boot = get_boot()
+    if config.BOOT_PREFETCH and not config.READ_SNAPSHOTS:
+        boot.start()
+    return boot
@@ -0,0 +1,313 @@
+"""Two-tier dataset cache: an in-process LRU backed by a SQLite file on disk.
+
+Entries survive process restarts through the disk tier and expire after a
+per-source TTL. With stale-while-revalidate enabled, an expired entry is still
+returned immediately while a background thread fetches a fresh copy, so page
+renders never wait on upstream latency once a snapshot exists.
+
+Loads run on their own thread, shared by every caller waiting for the same
+key, and callers inside a page wait at most for the page's remaining latency
+budget (see megadash.resilience). When a load fails or outlasts the budget,
+the last-known-good copy is returned instead: the expired entry, or the
+dataset in the published snapshot.
+"""
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from megadash import config
+from megadash.resilience import Unavailable, remaining
+from megadash.snapshots import get_snapshots
+from megadash.tracing import count, traced
+
+
+Entry = namedtuple('Entry', ['value', 'created'])
+Failure = namedtuple('Failure', ['error', 'since'])
+
+
+class MemoryCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                         'key TEXT PRIMARY KEY, source TEXT, created REAL, accessed REAL, size INTEGER, value BLOB)')
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value, created FROM entries WHERE key=?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE entries SET accessed=? WHERE key=?', (time.time(), key))
+        try:
+            return Entry(pickle.loads(row[0]), row[1])
+        except Exception:
+            return None
+
+    def set(self, key, source, entry):
+        blob = pickle.dumps(entry.value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, source, entry.created, time.time(), len(blob), blob))
+            self._evict()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+            self._db.execute('DELETE FROM entries WHERE key=?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+
+
+class TieredCache:
+    def __init__(self, path=None, memory_entries=None, disk_max_bytes=None):
+        self.memory = MemoryCache(memory_entries or config.CACHE_MEMORY_ENTRIES)
+        self.disk = DiskCache(path or os.path.join(config.CACHE_DIR, 'cache.sqlite3'),
+                              disk_max_bytes or config.CACHE_DISK_MAX_BYTES)
+        self._key_locks = {}
+        self._loads = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def set(self, key, source, value, created=None):
+        entry = Entry(value, time.time() if created is None else created)
+        self.memory.set(key, entry)
+        self.disk.set(key, source, entry)
+        return entry
+
+    def key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def load(self, key, source, loader):
+        """Run `loader` and store its result, or wait for the load of `key` already running instead."""
+        return self.load_in_background(key, source, loader).result().value
+
+    def load_in_background(self, key, source, loader):
+        """Future of the stored Entry, from the load of `key` already running or a new one."""
+        with self._lock:
+            future = self._loads.get(key)
+            if future is not None:
+                return future
+            future = self._loads[key] = Future()
+
+        def load():
+            try:
+                with self.key_lock(key):
+                    entry = self.set(key, source, loader())
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(entry)
+            finally:
+                with self._lock:
+                    self._loads.pop(key, None)
+
+        threading.Thread(target=load, name=f'megadash-load-{key}', daemon=True).start()
+        return future
+
+    def refresh_in_background(self, key, source, loader):
+        self.load_in_background(key, source, loader)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TieredCache()
+        return _cache
+
+
+def cache_key(name, args=()):
+    return name if not args else f'{name}{args!r}'
+
+
+_failures = {}
+
+
+def record_failure(key, error):
+    """Remember that loading `key` is failing, keeping the time it started failing."""
+    previous = _failures.get(key)
+    _failures[key] = Failure(error, time.time() if previous is None else previous.since)
+
+
+def last_known_good(name, args=()):
+    """The published snapshot's Entry for an argument-less dataset, or None."""
+    if args:
+        return None
+    try:
+        snapshot = get_snapshots().entry(name)
+    except Exception:
+        return None
+    return None if snapshot is None else Entry(*snapshot)
+
+
+def cached(name, source, ttl=None, stale_while_revalidate=None):
+    """Cache a data function under `name` with the TTL configured for `source`.
+
+    Positional arguments become part of the key, so they must have a stable repr.
+    With READ_SNAPSHOTS, argument-less functions answer from the published
+    snapshot when it has `name`. A failed or over-budget load returns the
+    last-known-good copy and is reported by `failure()` until a load succeeds;
+    without any copy it raises Unavailable.
+    """
+    def decorator(fn):
+        traced_fn = traced(f'load.{name}')(fn)
+
+        def load(*args):
+            key = cache_key(name, args)
+            try:
+                value = traced_fn(*args)
+            except Exception as e:
+                record_failure(key, f'{type(e).__name__}: {e}')
+                raise
+            _failures.pop(key, None)
+            return value
+
+        def max_age():
+            return config.CACHE_TTLS.get(source, config.CACHE_DEFAULT_TTL) if ttl is None else ttl
+
+        def entry(*args):
+            """The cached Entry for `args`, loading it as the wrapper would. Its `created` is the data version."""
+            if config.READ_SNAPSHOTS and not args:
+                snapshot = get_snapshots().entry(name)
+                if snapshot is not None:
+                    count('cache', dataset=name, outcome='snapshot')
+                    return Entry(*snapshot)
+            cache = get_cache()
+            key = cache_key(name, args)
+            swr = config.CACHE_STALE_WHILE_REVALIDATE if stale_while_revalidate is None else stale_while_revalidate
+            loader = functools.partial(load, *args)
+
+            current = cache.get(key)
+            if current is not None and time.time() - current.created < max_age():
+                count('cache', dataset=name, outcome='hit')
+                return current
+            if current is not None and swr:
+                count('cache', dataset=name, outcome='stale')
+                cache.refresh_in_background(key, source, loader)
+                return current
+
+            count('cache', dataset=name, outcome='miss')
+            future = cache.load_in_background(key, source, loader)
+            try:
+                return future.result(timeout=remaining())
+            except Exception as e:
+                fallback = current if current is not None else last_known_good(name, args)
+                if not future.done():
+                    record_failure(key, f'still loading after the {config.PAGE_LATENCY_BUDGET:g}s page budget')
+                    error = f'{name} is still loading'
+                else:
+                    error = f'{name}: {type(e).__name__}: {e}'
+                if fallback is None:
+                    raise Unavailable(error) from e
+                count('cache', dataset=name, outcome='fallback')
+                return fallback
+
+        def peek(*args):
+            """The stored or last-known-good Entry for `args`, without loading anything."""
+            if config.READ_SNAPSHOTS and not args:
+                snapshot = get_snapshots().entry(name)
+                if snapshot is not None:
+                    return Entry(*snapshot)
+            return get_cache().get(cache_key(name, args)) or last_known_good(name, args)
+
+        def prefetch(*args):
+            """Future of the Entry for `args`: done already when it is fresh, else the load every caller waits on."""
+            key = cache_key(name, args)
+            current = get_cache().get(key)
+            if current is not None and time.time() - current.created < max_age():
+                future = Future()
+                future.set_result(current)
+                return future
+            return get_cache().load_in_background(key, source, functools.partial(load, *args))
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            return entry(*args).value
+
+        def refresh(*args):
+            """Fetch a fresh value now and store it, bypassing the TTL."""
+            return get_cache().load(cache_key(name, args), source, functools.partial(load, *args))
+
+        wrapper.entry = entry
+        wrapper.peek = peek
+        wrapper.prefetch = prefetch
+        wrapper.failure = lambda *args: _failures.get(cache_key(name, args))
+        wrapper.refresh = refresh
+        wrapper.cache_name = name
+        wrapper.cache_source = source
+        return wrapper
+    return decorator
+
+
+_memo = {}
+_memo_lock = threading.Lock()
+_build_locks = {}
+
+
+def memoized(name, version, build):
+    """Return `build()` for `version` of `name`, computing it once while that version is current."""
+    with _memo_lock:
+        lock = _build_locks.setdefault(name, threading.Lock())
+    with lock:
+        memo = _memo.get(name)
+        if memo is None or memo[0] != version:
+            memo = (version, build())
+            _memo[name] = memo
+        return memo[1]
@@ -0,0 +1,210 @@
+"""Shared pooled HTTP client used by every page.
+
+One keep-alive session is kept per upstream host (Flipside, DefiLlama, NEAR RPC)
+so repeated calls skip the TCP and TLS handshakes. Each host's connection pool
+is capped, every request gets a timeout, and per-host counters are kept for
+requests, errors, bytes received and latency.
+
+Each host has a circuit breaker (see megadash.resilience). Small idempotent
+calls can ask to be hedged: if no response has arrived after the host's
+recent p95 latency (HTTP_HEDGE_DELAY until enough requests were seen),
+counted from when the request was actually sent, the same request is sent
+again and whichever answers first is used. Large downloads are never hedged,
+as a hedge downloads them twice.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from megadash import config
+from megadash.resilience import get_breaker
+from megadash.tracing import observe, record_size, span
+
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.recent = deque(maxlen=200)
+
+    def as_dict(self):
+        return {
+            'requests':self.requests,
+            'errors':self.errors,
+            'bytes':self.bytes,
+            'latency_total':self.latency_total,
+            'latency_avg':self.latency_total/self.requests if self.requests else 0.0,
+            'latency_max':self.latency_max,
+            'hedges':self.hedges,
+            'hedge_wins':self.hedge_wins,
+        }
+
+
+class HttpClient:
+    def __init__(self, max_connections_per_host=None, timeout=None, hedge=None):
+        self.max_connections_per_host = max_connections_per_host or config.HTTP_MAX_CONNECTIONS_PER_HOST
+        self.timeout = timeout or (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+        self.hedge = config.HTTP_HEDGE if hedge is None else hedge
+        self._sessions = {}
+        self._stats = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections_per_host,
+                                      pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept-Encoding'] = 'gzip, deflate'
+                self._sessions[host] = session
+                self._stats[host] = HostStats()
+            return self._sessions[host]
+
+    def _request(self, method, url, **kwargs):
+        session = self.session(url)
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        stats = self._stats[host]
+        breaker = get_breaker(host)
+        breaker.before()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            breaker.failure()
+            with self._lock:
+                stats.requests += 1
+                stats.errors += 1
+            raise
+        elapsed = time.perf_counter() - start
+        if response.status_code in RETRY_STATUS:
+            breaker.failure()
+        else:
+            breaker.success()
+        # A streamed body is read later by the caller, so count what the server announced.
+        size = int(response.headers.get('Content-Length', 0)) if kwargs.get('stream') else len(response.content)
+        with self._lock:
+            stats.requests += 1
+            stats.errors += response.status_code >= 400
+            stats.bytes += size
+            stats.latency_total += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+            stats.recent.append(elapsed)
+        observe(f'http.{host}', elapsed)
+        record_size(f'http.{host}', size)
+        return response
+
+    def hedge_delay(self, url):
+        """Seconds to wait for a response before hedging a request to `url`'s host."""
+        self.session(url)
+        with self._lock:
+            recent = list(self._stats[urlsplit(url).netloc].recent)
+        if len(recent) < config.HTTP_HEDGE_MIN_SAMPLES:
+            return config.HTTP_HEDGE_DELAY
+        return float(np.quantile(recent, config.HTTP_HEDGE_QUANTILE))
+
+    def _hedged(self, method, url, kwargs):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=config.HTTP_HEDGE_WORKERS, thread_name_prefix='megadash-http')
+            pool = self._pool
+        sent = threading.Event()
+
+        def send():
+            sent.set()
+            return self._request(method, url, **kwargs)
+
+        delay = self.hedge_delay(url)
+        primary = pool.submit(send)
+        sent.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        backup = pool.submit(self._request, method, url, **kwargs)
+        stats = self._stats[urlsplit(url).netloc]
+        with self._lock:
+            stats.hedges += 1
+        error = None
+        for future in as_completed([primary, backup]):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if future is backup:
+                with self._lock:
+                    stats.hedge_wins += 1
+            return response
+        raise error
+
+    def request(self, method, url, hedge=False, **kwargs):
+        """Send a request through the host's session, hedged if `hedge` is set and the client allows hedging.
+
+        Only set `hedge` for small idempotent calls.
+        """
+        if hedge and self.hedge:
+            return self._hedged(method, url, kwargs)
+        return self._request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        with span('decode.json'):
+            return response.json()
+
+    def post_json(self, url, payload, **kwargs):
+        response = self.post(url, json=payload, **kwargs)
+        response.raise_for_status()
+        with span('decode.json'):
+            return response.json()
+
+    def stats(self):
+        with self._lock:
+            return {host:s.as_dict() for host, s in self._stats.items()}
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,79 @@
+"""Upstream endpoints and tuning knobs, overridable through environment variables."""
+import os
+
+
+FLIPSIDE_API = os.environ.get('MEGADASH_FLIPSIDE_URL', 'https://node-api.flipsidecrypto.com').rstrip('/')
+DEFILLAMA_API = os.environ.get('MEGADASH_DEFILLAMA_URL', 'https://api.llama.fi').rstrip('/')
+NEAR_RPC_URL = os.environ.get('MEGADASH_NEAR_RPC_URL', 'https://rpc.mainnet.near.org/')
+NEAR_RPC_URLS = [url.strip() for url in os.environ.get('MEGADASH_NEAR_RPC_URLS', NEAR_RPC_URL).split(',') if url.strip()]
+NEAR_RPC_DEADLINE = float(os.environ.get('MEGADASH_NEAR_RPC_DEADLINE', 20))
+NEAR_RPC_MAX_WORKERS = int(os.environ.get('MEGADASH_NEAR_RPC_MAX_WORKERS', 8))
+NEAR_RPC_EPOCH_CACHE_ENTRIES = int(os.environ.get('MEGADASH_NEAR_RPC_EPOCH_CACHE_ENTRIES', 256))
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('MEGADASH_HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.environ.get('MEGADASH_HTTP_READ_TIMEOUT', 30))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get('MEGADASH_HTTP_MAX_CONNECTIONS_PER_HOST', 10))
+HTTP_HEDGE = os.environ.get('MEGADASH_HTTP_HEDGE', '1') != '0'
+HTTP_HEDGE_DELAY = float(os.environ.get('MEGADASH_HTTP_HEDGE_DELAY', 1.0))
+HTTP_HEDGE_QUANTILE = float(os.environ.get('MEGADASH_HTTP_HEDGE_QUANTILE', 0.95))
+HTTP_HEDGE_MIN_SAMPLES = 20
+HTTP_HEDGE_WORKERS = int(os.environ.get('MEGADASH_HTTP_HEDGE_WORKERS', 32))
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('MEGADASH_CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('MEGADASH_CIRCUIT_RESET_TIMEOUT', 30))
+PAGE_LATENCY_BUDGET = float(os.environ.get('MEGADASH_PAGE_LATENCY_BUDGET', 10))
+
+
+CACHE_DIR = os.environ.get('MEGADASH_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'near-megadash'))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('MEGADASH_CACHE_MEMORY_ENTRIES', 64))
+CACHE_DISK_MAX_BYTES = int(os.environ.get('MEGADASH_CACHE_DISK_MAX_BYTES', 512 * 2**20))
+CACHE_STALE_WHILE_REVALIDATE = os.environ.get('MEGADASH_CACHE_STALE_WHILE_REVALIDATE', '1') != '0'
+CACHE_DEFAULT_TTL = 600
+CACHE_TTLS = {
+    'flipside':float(os.environ.get('MEGADASH_TTL_FLIPSIDE', 600)),
+    'defillama':float(os.environ.get('MEGADASH_TTL_DEFILLAMA', 3600)),
+    'near_rpc':float(os.environ.get('MEGADASH_TTL_NEAR_RPC', 600)),
+}
+
+SNAPSHOT_DIR = os.environ.get('MEGADASH_SNAPSHOT_DIR', os.path.join(CACHE_DIR, 'snapshots'))
+SNAPSHOT_KEEP = int(os.environ.get('MEGADASH_SNAPSHOT_KEEP', 3))
+SNAPSHOT_FORMAT = os.environ.get('MEGADASH_SNAPSHOT_FORMAT', 'arrow')
+READ_SNAPSHOTS = os.environ.get('MEGADASH_READ_SNAPSHOTS', '0') != '0'
+PUBLISH_SNAPSHOTS = os.environ.get('MEGADASH_PUBLISH_SNAPSHOTS', '0') != '0'
+
+SCHEDULER_ENABLED = os.environ.get('MEGADASH_SCHEDULER', '1') != '0'
+SCHEDULER_MAX_WORKERS = int(os.environ.get('MEGADASH_SCHEDULER_MAX_WORKERS', 4))
+SCHEDULER_RETRY_INTERVAL = float(os.environ.get('MEGADASH_SCHEDULER_RETRY_INTERVAL', 60))
+BOOT_PREFETCH = os.environ.get('MEGADASH_BOOT_PREFETCH', '1') != '0'
+REFRESH_INTERVALS = {
+    'flipside_scorecard':float(os.environ.get('MEGADASH_REFRESH_FLIPSIDE_SCORECARD', 300)),
+    'flipside_history':float(os.environ.get('MEGADASH_REFRESH_FLIPSIDE_HISTORY', 1800)),
+    'near_rpc_epoch':float(os.environ.get('MEGADASH_REFRESH_NEAR_RPC_EPOCH', 12 * 3600)),
+    'defillama':float(os.environ.get('MEGADASH_REFRESH_DEFILLAMA', 3600)),
+}
+
+
+DEFILLAMA_STREAMING = os.environ.get('MEGADASH_DEFILLAMA_STREAMING', '1') != '0'
+DEFILLAMA_MAX_WORKERS = int(os.environ.get('MEGADASH_DEFILLAMA_MAX_WORKERS', 8))
+HISTORY_WINDOW_DAYS = int(os.environ['MEGADASH_HISTORY_WINDOW_DAYS']) if os.environ.get('MEGADASH_HISTORY_WINDOW_DAYS') else None
+CHART_MAX_POINTS = int(os.environ.get('MEGADASH_CHART_MAX_POINTS', 500))
+CHART_MAX_SERIES = int(os.environ.get('MEGADASH_CHART_MAX_SERIES', 12))
+SERIES_VIEW_CACHE_ENTRIES = int(os.environ.get('MEGADASH_SERIES_VIEW_CACHE_ENTRIES', 32))
+RENDER_CACHE = os.environ.get('MEGADASH_RENDER_CACHE', '1') != '0'
+RENDER_CACHE_BYTES = int(os.environ.get('MEGADASH_RENDER_CACHE_BYTES', 64 * 2**20))
+STAKE_HISTORY_EPOCHS = int(os.environ.get('MEGADASH_STAKE_HISTORY_EPOCHS', 1000))
+STAKE_HISTORY_BACKFILL = int(os.environ.get('MEGADASH_STAKE_HISTORY_BACKFILL', 10))
+
+TRACING = os.environ.get('MEGADASH_TRACING', '0') != '0'
+TRACE_SAMPLES = int(os.environ.get('MEGADASH_TRACE_SAMPLES', 1024))
+TRACE_PROMETHEUS_FILE = os.environ.get('MEGADASH_TRACE_PROMETHEUS_FILE')
+TRACE_PROMETHEUS_PUSH_URL = os.environ.get('MEGADASH_TRACE_PROMETHEUS_PUSH_URL')
+TRACE_EXPORT_INTERVAL = float(os.environ.get('MEGADASH_TRACE_EXPORT_INTERVAL', 15))
+
+
+def flipside_query_url(query_id):
+    return f'{FLIPSIDE_API}/api/v2/queries/{query_id}/data/latest'
+
+
+def defillama_url(path):
+    return f'{DEFILLAMA_API}/{path.lstrip("/")}'
@@ -0,0 +1,52 @@
+"""Registry of every dataset the pages read, with its refresh cadence.
+
+`derived`, if set, rebuilds the frames computed from a dataset and runs right
+after each scheduled refresh, so pages find them ready.
+
+TRANSFORMS lists the version-memoized frames built from one or more datasets
+(`inputs`, by name), and PAGES the datasets and transforms each page reads.
+Together they are the dependency graph megadash.boot warms at startup.
+"""
+import time
+from collections import namedtuple
+
+from megadash import aggregations, config, epochs
+from megadash.cache import cache_key, get_cache
+from megadash.sources import activity, defi, performance, staking
+
+
+Dataset = namedtuple('Dataset', ['name', 'loader', 'interval', 'derived'], defaults=[None])
+Transform = namedtuple('Transform', ['name', 'build', 'inputs'])
+
+
+DATASETS = [
+    Dataset('activity.scorecard', activity.get_scorecard_data, config.REFRESH_INTERVALS['flipside_scorecard']),
+    Dataset('activity.barchart', activity.get_barchart_data, config.REFRESH_INTERVALS['flipside_history']),
+    Dataset('performance.scorecard', performance.get_scorecard_data, config.REFRESH_INTERVALS['flipside_scorecard']),
+    Dataset('performance.barchart', performance.get_barchart_data, config.REFRESH_INTERVALS['flipside_history']),
+    Dataset('staking.staking', staking.get_staking_data, config.REFRESH_INTERVALS['flipside_history']),
+    Dataset('staking.validators', staking.get_validators_data, config.REFRESH_INTERVALS['near_rpc_epoch']),
+    Dataset('staking.concentration', staking.get_concentration_data, config.REFRESH_INTERVALS['near_rpc_epoch']),
+    Dataset('defi.defi', defi.get_defi_data, config.REFRESH_INTERVALS['defillama'],
+            aggregations.get_defi_frames),
+]
+
+TRANSFORMS = [
+    Transform('defi.frames', aggregations.get_defi_frames, ['defi.defi']),
+    Transform('staking.epochs', epochs.get_epoch_table, ['staking.staking', 'staking.validators']),
+]
+
+PAGES = {
+    'activity':['activity.scorecard', 'activity.barchart'],
+    'performance':['performance.scorecard', 'performance.barchart'],
+    'staking':['staking.staking', 'staking.validators', 'staking.concentration', 'staking.epochs'],
+    'defi':['defi.defi', 'defi.frames'],
+}
+
+
+def age(dataset, now=None):
+    """Seconds since `dataset` was last stored in the cache, or None if it never was."""
+    entry = get_cache().get(cache_key(dataset.loader.cache_name))
+    if entry is None:
+        return None
+    return (time.time() if now is None else now) - entry.created
@@ -0,0 +1,293 @@
+"""Incremental sync of DefiLlama TVL and token histories for NEAR protocols.
+
+Near-chain TVL and (for DEXes) token liquidity histories of all protocols are
+kept in two datasets of the local time-series store, keyed by protocol slug
+and UTC day. A refresh only converts the points at or after each protocol's
+last stored day, scanning responses from the end, and merges them in one write
+per dataset. Keying by day means DefiLlama's intraday "now" point replaces
+itself until the day closes instead of piling up.
+
+The last `window_days` days are held in memory per protocol (TVL as frames,
+tokens as megadash.tokens.TokenMatrix) and trimmed as new days arrive, so the
+view the DeFi page reads is assembled from already-windowed data rather than
+a filter over the full history. Protocols whose fetch failed keep serving
+their stored window.
+
+`sync_stream` is the bounded-memory variant: it takes raw response bodies one
+at a time, walks them with megadash.jsonstream as they download and writes
+only the points of the window into a preallocated DayWindow ring per series,
+so neither a protocol's full history nor its whole response text is ever
+held at once.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from megadash.jsonstream import walk
+from megadash.tokens import DAY, TokenMatrix
+from megadash.tracing import traced
+from megadash.tsstore import get_store
+
+
+WINDOW_DAYS = 365
+
+TVL_DATASET = 'defillama.tvl'
+TOKEN_DATASET = 'defillama.tokens'
+
+TVL_COLUMNS = ['protocol', 'category', 'date', 'tvl_usd']
+
+
+def to_days(seconds):
+    return pd.to_datetime(seconds, unit='s').floor('D')
+
+
+def tail_since(points, since):
+    """The trailing points of a chronological DefiLlama series dated at or after `since`."""
+    if since is None:
+        return points
+    since = int(since.timestamp())
+    start = len(points)
+    while start and points[start - 1]['date'] >= since:
+        start -= 1
+    return points[start:]
+
+
+def tvl_points(data, since=None):
+    """Near-chain TVL points of a /protocol response as a (date, tvl_usd) frame, one row per UTC day."""
+    points = tail_since(data['chainTvls']['Near']['tvl'], since)
+    seconds = np.fromiter((p['date'] for p in points), dtype='int64', count=len(points))
+    values = np.fromiter((p['totalLiquidityUSD'] for p in points), dtype='float64', count=len(points))
+    frame = pd.DataFrame({'date':to_days(seconds), 'tvl_usd':values})
+    return frame.drop_duplicates(subset='date', keep='last')
+
+
+def token_points(data, since=None):
+    """Token liquidity points of a /protocol response as a TokenMatrix, empty when it has no `tokensInUsd`."""
+    return TokenMatrix.from_entries(tail_since(data.get('tokensInUsd') or [], since))
+
+
+class DayWindow:
+    """Preallocated ring holding the last `days` UTC days of a chronological series.
+
+    Each day is one row of float64 values over a growing set of columns; a
+    later point on the same day overwrites the values it carries. Points
+    dated before `since` are skipped.
+    """
+
+    def __init__(self, days, since=None):
+        self.days = days
+        self.since = None if since is None else int(pd.Timestamp(since).timestamp()) // DAY
+        self.day_numbers = np.zeros(days, dtype='int64')
+        self.values = np.full((days, 1), np.nan)
+        self.columns = {}
+        self.count = 0
+        self.last = None
+
+    def _row(self, seconds):
+        day = seconds // DAY
+        if self.since is not None and day < self.since:
+            return None
+        if self.last is not None and day < self.last:
+            held = min(self.count, self.days)
+            rows = np.flatnonzero(self.day_numbers[:held] == day)
+            return rows[0] if len(rows) else None
+        if day != self.last:
+            row = self.count % self.days
+            self.count += 1
+            self.last = day
+            self.day_numbers[row] = day
+            self.values[row] = np.nan
+        return (self.count - 1) % self.days
+
+    def add(self, seconds, values):
+        """Write a {column: value} point dated `seconds` (Unix time)."""
+        row = self._row(seconds)
+        if row is None:
+            return
+        for name, value in values.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = len(self.columns)
+                if column == self.values.shape[1]:
+                    self.values = np.hstack([self.values, np.full(self.values.shape, np.nan)])
+            self.values[row, column] = value
+
+    def rows(self):
+        """(day dates, column names, values) in chronological order, without columns that are all missing."""
+        held = min(self.count, self.days)
+        order = np.arange(self.count - held, self.count) % self.days
+        dates = (self.day_numbers[order] * DAY).astype('datetime64[s]').astype('datetime64[ns]')
+        values = self.values[order, :len(self.columns)]
+        listed = ~np.isnan(values).all(axis=0)
+        return dates, np.array(list(self.columns), dtype=object)[listed], values[:, listed]
+
+
+TVL_PATH = ('chainTvls', 'Near', 'tvl')
+TOKENS_PATH = ('tokensInUsd',)
+
+
+def stream_points(text, tvl_since=None, token_since=None, window_days=WINDOW_DAYS, tokens=False):
+    """(TVL frame, TokenMatrix or None) of a raw /protocol response, like tvl_points and token_points.
+
+    `text` is the response text or an iterable of its chunks (see jsonstream.walk).
+
+    Only the last `window_days + 1` days at or after the `since` days are kept.
+    A missing or null `tokensInUsd` gives an empty TokenMatrix.
+    """
+    tvl = DayWindow(window_days + 1, tvl_since)
+    handlers = {TVL_PATH:lambda p: tvl.add(p['date'], {'tvl_usd':p['totalLiquidityUSD']})}
+    if tokens:
+        token_window = DayWindow(window_days + 1, token_since)
+        handlers[TOKENS_PATH] = lambda e: token_window.add(e['date'], e['tokens'])
+    if TVL_PATH not in walk(text, handlers):
+        raise KeyError('.'.join(TVL_PATH))
+    dates, _, values = tvl.rows()
+    frame = pd.DataFrame({'date':dates, 'tvl_usd':values[:, 0] if values.shape[1] else np.full(len(dates), np.nan)})
+    if not tokens:
+        return frame, None
+    return frame, TokenMatrix(*token_window.rows())
+
+
+def split_by_slug(frame):
+    if frame is None:
+        return {}
+    return {slug:rows.drop(columns='slug').reset_index(drop=True)
+            for slug, rows in frame.groupby('slug', sort=False)}
+
+
+class DefiLlamaSync:
+    def __init__(self, store=None, window_days=WINDOW_DAYS):
+        self.store = store or get_store()
+        self.window_days = window_days
+        self._tvl = None
+        self._tokens = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._tvl is None:
+            self._tvl = split_by_slug(self.store.read_window(TVL_DATASET, days=self.window_days))
+            self._tokens = {slug:TokenMatrix.from_frame(frame) for slug, frame in
+                            split_by_slug(self.store.read_window(TOKEN_DATASET, days=self.window_days)).items()}
+
+    def _last_tvl_day(self, slug):
+        frame = self._tvl.get(slug)
+        return None if frame is None or frame.empty else frame['date'].iloc[-1]
+
+    def _last_token_day(self, slug):
+        matrix = self._tokens.get(slug)
+        return None if matrix is None or not len(matrix) else pd.Timestamp(matrix.dates[-1])
+
+    def _merge_tvl(self, new):
+        new = {slug:frame for slug, frame in new.items() if not frame.empty}
+        if not new:
+            return
+        self.store.merge(TVL_DATASET, pd.concat([frame.assign(slug=slug) for slug, frame in new.items()],
+                                                ignore_index=True),
+                         date_column='date', key=['slug', 'date'])
+        for slug, frame in new.items():
+            current = self._tvl.get(slug)
+            if current is not None:
+                frame = pd.concat([current.loc[current['date'] < frame['date'].min()], frame], ignore_index=True)
+            self._tvl[slug] = frame
+
+    def _merge_tokens(self, new):
+        new = {slug:matrix for slug, matrix in new.items() if len(matrix)}
+        if not new:
+            return
+        self.store.merge(TOKEN_DATASET, pd.concat([matrix.to_frame().assign(slug=slug) for slug, matrix in new.items()],
+                                                  ignore_index=True),
+                         date_column='date', key=['slug', 'date', 'symbol'])
+        for slug, matrix in new.items():
+            current = self._tokens.get(slug)
+            self._tokens[slug] = matrix if current is None else current.combine(matrix)
+
+    @traced('transform.defillama_sync')
+    def sync(self, protocols, responses):
+        """Merge the new points of {slug: /protocol response} into the store.
+
+        Returns {slug: error} for responses that could not be read; those
+        protocols keep their stored history.
+        """
+        failed = {}
+        with self._lock:
+            self._load()
+            new_tvl, new_tokens = {}, {}
+            for p in protocols:
+                slug = p['slug']
+                if slug not in responses:
+                    continue
+                try:
+                    tvl = tvl_points(responses[slug], since=self._last_tvl_day(slug))
+                    if p['category'] == 'Dexes':
+                        new_tokens[slug] = token_points(responses[slug], since=self._last_token_day(slug))
+                    new_tvl[slug] = tvl
+                except Exception as e:
+                    new_tokens.pop(slug, None)
+                    failed[slug] = f'{type(e).__name__}: {e}'
+            self._merge_tvl(new_tvl)
+            self._merge_tokens(new_tokens)
+        return failed
+
+    def sync_stream(self, protocols, texts):
+        """Merge the new points of raw /protocol responses, read one at a time from (slug, text) pairs.
+
+        Each text is a response text or an iterable of its chunks, read
+        before the next pair is taken. Like `sync`, returns {slug: error} for
+        responses that could not be read.
+        """
+        by_slug = {p['slug']:p for p in protocols}
+        failed = {}
+        with self._lock:
+            self._load()
+            new_tvl, new_tokens = {}, {}
+            for slug, text in texts:
+                p = by_slug.get(slug)
+                if p is None:
+                    continue
+                try:
+                    tvl, tokens = stream_points(text, self._last_tvl_day(slug), self._last_token_day(slug),
+                                                self.window_days, tokens=p['category'] == 'Dexes')
+                    new_tvl[slug] = tvl
+                    if tokens is not None:
+                        new_tokens[slug] = tokens
+                except Exception as e:
+                    failed[slug] = f'{type(e).__name__}: {e}'
+                del text
+            self._merge_tvl(new_tvl)
+            self._merge_tokens(new_tokens)
+        return failed
+
+    @traced('transform.defillama_window')
+    def window(self, protocols):
+        """Compiled TVL frame and {protocol name: TokenMatrix} for `protocols` over the last `window_days` days."""
+        with self._lock:
+            self._load()
+            slugs = [p['slug'] for p in protocols if self._last_tvl_day(p['slug']) is not None]
+            if not slugs:
+                return pd.DataFrame(columns=TVL_COLUMNS), {}
+            end_date = max(self._last_tvl_day(slug) for slug in slugs)
+            start_date = end_date - timedelta(days=self.window_days)
+            for slug, frame in self._tvl.items():
+                if len(frame) and frame['date'].iloc[0] < start_date:
+                    self._tvl[slug] = frame.loc[frame['date'] >= start_date].reset_index(drop=True)
+            for slug, matrix in self._tokens.items():
+                self._tokens[slug] = matrix.trim(start_date)
+
+            tvl = pd.concat([self._tvl[p['slug']].assign(protocol=p['name'], category=p['category'])
+                             for p in protocols if p['slug'] in slugs], ignore_index=True)
+            tokens = {p['name']:self._tokens[p['slug']] for p in protocols if len(self._tokens.get(p['slug'], ()))}
+        return tvl[TVL_COLUMNS], tokens
+
+
+_sync = None
+_sync_lock = threading.Lock()
+
+
+def get_sync():
+    global _sync
+    with _sync_lock:
+        if _sync is None:
+            _sync = DefiLlamaSync()
+        return _sync
@@ -0,0 +1,120 @@
+"""Hidden diagnostics view: stage timings, cache hit ratios, payload sizes and memory per dataset.
+
+Rendered by the home page when it is opened with `?diagnostics`, so it stays
+out of the sidebar. Timings, hit ratios and payload sizes need tracing
+(MEGADASH_TRACING=1); HTTP and memory figures are always available.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from megadash import cache, config, tracing
+from megadash.client import get_client
+from megadash.datasets import DATASETS
+from megadash.resilience import breaker_stats
+from megadash.snapshots import get_snapshots
+from megadash.tracing import nbytes
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None off Linux."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def stage_table():
+    rows = [{'Stage':name.split('.', 1)[0], 'Span':name, 'Count':s['count'],
+             'p50 (ms)':s['p50'] * 1000, 'p95 (ms)':s['p95'] * 1000, 'Max (ms)':s['max'] * 1000,
+             'Total (s)':s['total']}
+            for name, s in tracing.get_recorder().spans().items()]
+    return pd.DataFrame(rows, columns=['Stage', 'Span', 'Count', 'p50 (ms)', 'p95 (ms)', 'Max (ms)', 'Total (s)'])
+
+
+def cache_table():
+    counts = {}
+    for (name, labels), value in tracing.get_recorder().counters().items():
+        if name == 'cache':
+            labels = dict(labels)
+            dataset, outcome = labels['dataset'], labels['outcome']
+            counts.setdefault(dataset, {'hit':0, 'stale':0, 'miss':0, 'fallback':0, 'snapshot':0})[outcome] += value
+    rows = [dict({'Dataset':dataset, 'Hit Ratio':(c['hit'] + c['stale'] + c['snapshot']) / max(1, sum(c.values()))},
+                 **{outcome.title():count for outcome, count in c.items()})
+            for dataset, c in sorted(counts.items())]
+    return pd.DataFrame(rows, columns=['Dataset', 'Hit Ratio', 'Hit', 'Stale', 'Miss', 'Fallback', 'Snapshot'])
+
+
+def render_cache_table():
+    counts = {}
+    for (name, labels), value in tracing.get_recorder().counters().items():
+        if name == 'render':
+            labels = dict(labels)
+            counts.setdefault(labels['section'], {'hit':0, 'miss':0, 'fallback':0})[labels['outcome']] += value
+    rows = [{'Section':section, 'Hit Ratio':c['hit'] / max(1, c['hit'] + c['miss']), 'Hit':c['hit'], 'Miss':c['miss'],
+             'Fallback':c['fallback']}
+            for section, c in sorted(counts.items())]
+    return pd.DataFrame(rows, columns=['Section', 'Hit Ratio', 'Hit', 'Miss', 'Fallback'])
+
+
+def payload_table():
+    rows = [{'Payload':name, 'Count':s['count'], 'Last (KB)':s['last'] / 1024, 'p50 (KB)':s['p50'] / 1024,
+             'Max (KB)':s['max'] / 1024}
+            for name, s in tracing.get_recorder().sizes().items()]
+    return pd.DataFrame(rows, columns=['Payload', 'Count', 'Last (KB)', 'p50 (KB)', 'Max (KB)'])
+
+
+def http_table():
+    breakers = breaker_stats()
+    rows = [{'Host':host, 'Requests':s['requests'], 'Errors':s['errors'], 'Received (MB)':s['bytes'] / 2**20,
+             'Avg (ms)':s['latency_avg'] * 1000, 'Max (ms)':s['latency_max'] * 1000,
+             'Hedged':s['hedges'], 'Hedge Wins':s['hedge_wins'],
+             'Circuit':breakers.get(host, {}).get('state'), 'Trips':breakers.get(host, {}).get('trips', 0)}
+            for host, s in get_client().stats().items()]
+    return pd.DataFrame(rows, columns=['Host', 'Requests', 'Errors', 'Received (MB)', 'Avg (ms)', 'Max (ms)',
+                                       'Hedged', 'Hedge Wins', 'Circuit', 'Trips'])
+
+
+def memory_table():
+    """Memory of every dataset held by this process and of the frames derived from it, without loading anything."""
+    rows = []
+    for dataset in DATASETS:
+        name = dataset.loader.cache_name
+        entry = None
+        if config.READ_SNAPSHOTS:
+            entry = get_snapshots().held(name)
+        if entry is None:
+            entry = cache.get_cache().memory.get(cache.cache_key(name))
+        derived = [memo[1] for memo_name, memo in list(cache._memo.items()) if memo_name.startswith(f'{name}.')]
+        rows.append({'Dataset':dataset.name, 'Loaded':entry is not None,
+                     'Data (MB)':None if entry is None else nbytes(entry[0]) / 2**20,
+                     'Derived (MB)':sum(nbytes(value) for value in derived) / 2**20})
+    return pd.DataFrame(rows, columns=['Dataset', 'Loaded', 'Data (MB)', 'Derived (MB)'])
+
+
+def render():
+    st.title('Diagnostics')
+    rss = process_rss()
+    if rss is not None:
+        st.write(f'Process RSS: {rss / 2**20:,.1f} MB')
+    if tracing.enabled():
+        st.subheader('Stages')
+        st.dataframe(stage_table(), use_container_width=True, hide_index=True)
+        st.subheader('Cache')
+        st.dataframe(cache_table(), use_container_width=True, hide_index=True)
+        st.subheader('Render Cache')
+        st.dataframe(render_cache_table(), use_container_width=True, hide_index=True)
+        st.subheader('Payloads')
+        st.dataframe(payload_table(), use_container_width=True, hide_index=True)
+        if st.button('Reset timings'):
+            tracing.get_recorder().clear()
+    else:
+        st.info('Tracing is off. Set MEGADASH_TRACING=1 to record stage timings, cache hit ratios and payload sizes.')
+    st.subheader('HTTP')
+    st.dataframe(http_table(), use_container_width=True, hide_index=True)
+    st.subheader('Memory')
+    st.dataframe(memory_table(), use_container_width=True, hide_index=True)
@@ -0,0 +1,104 @@
+"""Chart-sized views of long time series.
+
+Charts are drawn a few hundred pixels wide, so sending every daily row of a
+multi-year history only costs payload and browser time. Frames are cut to the
+requested range first; ranges that fit in `config.CHART_MAX_POINTS` are drawn
+as they are and longer ones are thinned:
+
+    minmax    keeps the first and last row and the minimum and maximum of each
+              bucket, so every peak and trough of the series is still drawn
+    lttb      Largest-Triangle-Three-Buckets, one visually significant row per
+              bucket, for smooth lines
+
+Weekly and monthly totals are resampled by megadash.series before a view is
+downsampled.
+
+`top_series` caps the number of series in a chart, grouping the smallest ones
+into "Other".
+"""
+import numpy as np
+import pandas as pd
+
+from megadash import config
+
+
+OTHER = 'Other'
+
+
+def minmax_indices(values, buckets):
+    """Sorted positions of the first, last and each bucket's minimum and maximum of `values` (NaN ignored)."""
+    values = np.asarray(values, dtype='float64')
+    count = len(values)
+    if count <= 2 * buckets + 2:
+        return np.arange(count)
+    size = -(-count // buckets)
+    rows = -(-count // size)
+    offsets = np.arange(rows) * size
+    missing = np.isnan(values)
+    low = np.full(rows * size, np.inf)
+    low[:count] = np.where(missing, np.inf, values)
+    high = np.full(rows * size, -np.inf)
+    high[:count] = np.where(missing, -np.inf, values)
+    lows = low.reshape(rows, size).argmin(axis=1) + offsets
+    highs = high.reshape(rows, size).argmax(axis=1) + offsets
+    return np.unique(np.concatenate([[0, count - 1], lows, highs]))
+
+
+def lttb_indices(x, values, points):
+    """Sorted positions of the `points` rows Largest-Triangle-Three-Buckets keeps (NaN counts as 0)."""
+    y = np.nan_to_num(np.asarray(values, dtype='float64'))
+    count = len(y)
+    if points >= count or points < 3:
+        return np.arange(count)
+    x = np.asarray(x)
+    x = (x.astype('datetime64[ns]').astype('int64') if np.issubdtype(x.dtype, np.datetime64) else x).astype('float64')
+    edges = np.linspace(1, count - 1, points - 1).astype('int64')
+    kept = np.empty(points, dtype='int64')
+    kept[0], kept[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x, next_y = x[end:edges[bucket + 2]].mean(), y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample(frame, x, points=None, method='minmax', stacked=False):
+    """Rows of `frame` (sorted by `x`) to draw its numeric columns with about `points` points.
+
+    Each column keeps its own extremes, or with `stacked` their row total does
+    (the outline of a stacked area chart).
+    """
+    points = points or config.CHART_MAX_POINTS
+    if len(frame) <= points:
+        return frame
+    columns = [c for c in frame.columns if c != x and pd.api.types.is_numeric_dtype(frame[c])]
+    series = [frame[columns].sum(axis=1, min_count=1)] if stacked else [frame[c] for c in columns]
+    if method == 'lttb':
+        kept = [lttb_indices(frame[x].to_numpy(), s.to_numpy(), max(3, points // len(series))) for s in series]
+    elif method == 'minmax':
+        kept = [minmax_indices(s.to_numpy(), max(1, points // (2 * len(series)))) for s in series]
+    else:
+        raise ValueError(f'unknown downsampling method {method!r}')
+    return frame.iloc[np.unique(np.concatenate(kept))].reset_index(drop=True)
+
+
+def top_series(frame, x, count=None, other=OTHER):
+    """`frame` with only its `count` largest series by latest value and the rest summed into `other`."""
+    count = count or config.CHART_MAX_SERIES
+    columns = [c for c in frame.columns if c != x]
+    if len(columns) <= count:
+        return frame
+    latest = frame[columns].ffill().iloc[-1].fillna(0).sort_values(ascending=False, kind='stable')
+    top = list(latest.index[:count - 1])
+    rest = list(latest.index[count - 1:])
+    chart_data = frame[[x] + top].copy()
+    chart_data[other] = frame[rest].sum(axis=1, min_count=1)
+    return chart_data
+
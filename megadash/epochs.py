@@ -0,0 +1,129 @@
+"""Per-epoch staking history with indexed lookups and derived metrics.
+
+An `EpochTable` holds the staking dataset indexed by EPOCH_NUM, in epoch
+order, so the latest epoch is the last row and any other epoch is one index
+lookup. START_TIME stays the datetime column the store parsed. Next to the
+raw columns it carries:
+
+    STAKING_RATIO         staked / total supply
+    STAKED_CHANGE         epoch-over-epoch change of the staked supply
+    SUPPLY_CHANGE         epoch-over-epoch change of the total supply
+    STAKING_RATIO_CHANGE  epoch-over-epoch change of the staking ratio
+
+and the validator count and seat price recorded for the epoch, where there is
+one (see sources.staking.record_validators).
+
+`get_epoch_table` builds the table once per version of the staking and
+validator datasets. A new version extends the previous table with the epochs
+it has not seen; only those rows are derived, unless upstream restated older
+ones.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from megadash.cache import memoized
+from megadash.sources.staking import (VALIDATOR_HISTORY_COLUMNS, get_staking_data, get_validators_data,
+                                      read_validator_history)
+from megadash.tracing import span
+
+
+RAW_COLUMNS = ['START_TIME', 'TOTAL_NEAR_STAKED', 'TOTAL_NEAR_SUPPLY']
+VALIDATOR_COLUMNS = [c for c in VALIDATOR_HISTORY_COLUMNS if c not in ('EPOCH_NUM', 'RECORDED_AT')]
+
+
+def by_epoch(frame):
+    """`frame` indexed by EPOCH_NUM in epoch order, sorting only when it is not already."""
+    frame = frame.set_index('EPOCH_NUM')
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+    return frame[~frame.index.duplicated(keep='last')]
+
+
+def derive(rows, previous=None):
+    """Derived columns of consecutive epochs `rows`; `previous` is the row of the epoch before, if known."""
+    staked = rows['TOTAL_NEAR_STAKED'].to_numpy(dtype='float64')
+    supply = rows['TOTAL_NEAR_SUPPLY'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = staked / supply
+    derived = {'STAKING_RATIO':ratio}
+    for column, values in [('STAKED_CHANGE', staked), ('SUPPLY_CHANGE', supply), ('STAKING_RATIO_CHANGE', ratio)]:
+        before = np.empty_like(values)
+        before[1:] = values[:-1]
+        before[:1] = np.nan if previous is None else previous[column]
+        derived[column] = values - before
+    return rows.assign(**derived)
+
+
+def _previous_values(row):
+    return {'STAKED_CHANGE':row['TOTAL_NEAR_STAKED'], 'SUPPLY_CHANGE':row['TOTAL_NEAR_SUPPLY'],
+            'STAKING_RATIO_CHANGE':row['STAKING_RATIO']}
+
+
+class EpochTable:
+    """Staking epochs of `staking` (the staking dataset frame) with `validators` (read_validator_history)."""
+
+    def __init__(self, staking, validators=None, epochs=None):
+        self.epochs = derive(by_epoch(staking[['EPOCH_NUM'] + RAW_COLUMNS])) if epochs is None else epochs
+        self.validators = pd.DataFrame(columns=VALIDATOR_HISTORY_COLUMNS) if validators is None else validators
+        history = self.validators.set_index('EPOCH_NUM')[VALIDATOR_COLUMNS]
+        self.frame = self.epochs.join(history[~history.index.duplicated(keep='last')], how='left')
+        self._latest = self.frame.iloc[-1] if len(self.frame) else None
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def latest(self):
+        """Row of the newest epoch, or None when there are no epochs."""
+        return self._latest
+
+    @property
+    def latest_epoch(self):
+        return None if self._latest is None else int(self._latest.name)
+
+    def at(self, epoch):
+        """Row of `epoch`; KeyError when the table does not hold it."""
+        return self.frame.loc[epoch]
+
+    def extend(self, staking, validators=None):
+        """Table for a newer version of the staking dataset, deriving only the epochs added since this one.
+
+        Epochs that fell out of the new frame's window are dropped. If any
+        epoch held here has different raw values in `staking` the table is
+        rebuilt instead.
+        """
+        validators = self.validators if validators is None else validators
+        incoming = by_epoch(staking[['EPOCH_NUM'] + RAW_COLUMNS])
+        if not len(incoming) or self._latest is None:
+            return EpochTable(staking, validators)
+        known = incoming.index.searchsorted(self.latest_epoch, side='right')
+        kept = self.epochs.iloc[self.epochs.index.searchsorted(incoming.index[0]):]
+        if not (kept.index.equals(incoming.index[:known])
+                and all(np.array_equal(kept[c].to_numpy(), incoming[c].to_numpy()[:known]) for c in RAW_COLUMNS)):
+            return EpochTable(staking, validators)
+        if known < len(incoming):
+            kept = pd.concat([kept, derive(incoming.iloc[known:], _previous_values(self._latest))])
+        return EpochTable(None, validators, epochs=kept)
+
+
+_latest_table = None
+_latest_lock = threading.Lock()
+
+
+def get_epoch_table():
+    """EpochTable of the cached staking and validator datasets, extended rather than rebuilt as epochs arrive."""
+    staking, validators = get_staking_data.entry(), get_validators_data.entry()
+
+    def build():
+        global _latest_table
+        history = read_validator_history()
+        with _latest_lock, span('transform.epochs'):
+            if _latest_table is None:
+                _latest_table = EpochTable(staking.value, history)
+            else:
+                _latest_table = _latest_table.extend(staking.value, history)
+            return _latest_table
+
+    return memoized('staking.epochs', (staking.created, validators.created), build)
@@ -0,0 +1,120 @@
+"""Concurrent fetch engine for fanning out many upstream JSON requests."""
+import codecs
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from megadash.client import RETRY_STATUS, get_client
+from megadash.resilience import CircuitOpenError
+
+
+CHUNK_SIZE = 64 * 1024
+
+FetchResult = namedtuple('FetchResult', ['results', 'failures'])
+
+
+class FetchError(Exception):
+    pass
+
+
+def fetch_response(url, timeout=None, retries=2, backoff=0.5, session=None, stream=False):
+    """GET `url`, retrying transient failures with exponential backoff; raises for any error status.
+
+    Requests refused by an open circuit breaker are not retried. `timeout`
+    defaults to the client's. With `stream` the body is left unread.
+    """
+    http = session or get_client()
+    kwargs = {} if timeout is None else {'timeout':timeout}
+    attempt = 0
+    while True:
+        try:
+            response = http.get(url, stream=stream, **kwargs)
+            if response.status_code >= 400:
+                response.close()
+            if response.status_code in RETRY_STATUS:
+                raise FetchError(f'HTTP {response.status_code} from {url}')
+            response.raise_for_status()
+            return response
+        except CircuitOpenError:
+            raise
+        except (requests.ConnectionError, requests.Timeout, FetchError):
+            if attempt >= retries:
+                raise
+        attempt += 1
+        time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random() / 2))
+
+
+def fetch_json(url, timeout=10, retries=2, backoff=0.5, session=None):
+    """GET `url` and decode JSON, retrying transient failures with exponential backoff."""
+    return fetch_response(url, timeout, retries, backoff, session).json()
+
+
+def fetch_all(urls, max_workers=8, timeout=10, retries=2, backoff=0.5, session=None):
+    """Fetch a {key: url} mapping on a bounded thread pool.
+
+    Returns a FetchResult whose `results` holds the decoded JSON for every key
+    that succeeded and whose `failures` maps every failed key to its error.
+    """
+    if not urls:
+        return FetchResult({}, {})
+
+    def fetch_one(url):
+        return fetch_json(url, timeout=timeout, retries=retries, backoff=backoff, session=session)
+
+    results, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        futures = {key: pool.submit(fetch_one, url) for key, url in urls.items()}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                failures[key] = f'{type(e).__name__}: {e}'
+    return FetchResult(results, failures)
+
+
+def iter_text(response, chunk_size=CHUNK_SIZE):
+    """Yield the body of a streamed response as UTF-8 text, a chunk at a time, and close it."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+    finally:
+        response.close()
+
+
+def iter_fetch(urls, max_workers=8, timeout=10, retries=2, backoff=0.5, session=None):
+    """Yield (key, chunks, error) for a {key: url} mapping as responses arrive.
+
+    `chunks` iterates over the body as text while it downloads (see
+    `iter_text`), and is None when `error` is set. The response is closed
+    when the next item is taken. At most `max_workers` responses are open at
+    once; the bodies not being read wait in their connections.
+    """
+    def fetch_one(url):
+        return fetch_response(url, timeout, retries, backoff, session, stream=True)
+
+    pending = iter(urls.items())
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        running = {}
+        for key, url in pending:
+            running[pool.submit(fetch_one, url)] = key
+            if len(running) >= max_workers:
+                break
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                try:
+                    response, error = future.result(), None
+                except Exception as e:
+                    response, error = None, f'{type(e).__name__}: {e}'
+                for next_key, url in pending:
+                    running[pool.submit(fetch_one, url)] = next_key
+                    break
+                yield key, None if response is None else iter_text(response), error
+                if response is not None:
+                    response.close()
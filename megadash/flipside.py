@@ -0,0 +1,172 @@
+"""Typed, columnar loader for Flipside query results.
+
+Query results are decoded in bounded batches of rows (with orjson when it is
+installed) and each batch is turned straight into one typed array per declared
+column, so large results never go through a row-by-row DataFrame constructor,
+a second datetime parsing pass, or a fully materialised list of row dicts.
+
+Schemas map column names to one of:
+    'datetime', 'int64', 'float32', 'float64', 'category', 'str'
+Columns not listed in the schema are dropped.
+"""
+import json
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from megadash.config import flipside_query_url
+from megadash.fetcher import fetch_response
+from megadash.tracing import record_size, traced
+from megadash.tsstore import get_store
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+BATCH_BYTES = 2**20
+NON_WHITESPACE = re.compile(rb'\S')
+
+
+def iter_row_batches(payload, batch_bytes=BATCH_BYTES):
+    """Yield the rows of a top-level JSON array in lists of roughly `batch_bytes` of input.
+
+    Batches are cut after a `},` and only accepted if they decode as a complete
+    array, so a cut that falls inside a string or a nested object is extended
+    to the next candidate instead.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    start = payload.index(b'[') + 1
+    end = payload.rindex(b']')
+    while NON_WHITESPACE.search(payload, start, end):
+        cut = start + batch_bytes
+        while True:
+            pos = payload.find(b'},', cut, end) if cut < end else -1
+            stop, next_start = (end, end) if pos == -1 else (pos + 1, pos + 2)
+            try:
+                rows = loads(b'[' + payload[start:stop] + b']')
+                break
+            except ValueError:
+                if pos == -1:
+                    raise
+                cut = pos + 2
+        yield rows
+        start = next_start
+
+
+def fetch_payload(query_id):
+    """Download the raw JSON bytes of the latest result of a Flipside query, retrying transient failures."""
+    response = fetch_response(flipside_query_url(query_id))
+    record_size(f'flipside.{query_id}', len(response.content))
+    return response.content
+
+
+def fetch_rows(query_id):
+    """Download and decode the latest result of a Flipside query as a list of row dicts."""
+    return loads(fetch_payload(query_id))
+
+
+def to_column(values, dtype):
+    if dtype == 'datetime':
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                return np.array(values, dtype='datetime64[ns]')
+        except (TypeError, ValueError, UserWarning):
+            return pd.to_datetime(values, utc=True).tz_localize(None).values
+    if dtype == 'int64':
+        try:
+            return np.array(values, dtype='int64')
+        except (TypeError, ValueError):
+            return pd.array(values, dtype='Int64')
+    if dtype in ('float32', 'float64'):
+        return np.array(values, dtype=dtype)
+    if dtype == 'category':
+        return pd.Categorical(values)
+    if dtype == 'str':
+        return np.array(values, dtype=object)
+    raise ValueError(f'unknown column type {dtype!r}')
+
+
+def concat_column(parts, dtype):
+    if len(parts) == 1:
+        return parts[0]
+    if dtype == 'category':
+        return union_categoricals(parts)
+    if all(isinstance(part, np.ndarray) for part in parts):
+        return np.concatenate(parts)
+    return pd.concat([pd.Series(part) for part in parts], ignore_index=True).array
+
+
+def rows_to_columns(rows, schema):
+    return {name:to_column([row.get(name) for row in rows], dtype) for name, dtype in schema.items()}
+
+
+def rows_to_frame(rows, schema):
+    """Build a DataFrame from decoded rows, one typed column per schema entry."""
+    return pd.DataFrame(rows_to_columns(rows, schema), copy=False)
+
+
+@traced('decode.flipside')
+def parse(payload, schema, batch_bytes=BATCH_BYTES, since=None):
+    """Decode a raw JSON array payload (bytes or str) into a typed DataFrame.
+
+    `since`, if given, is a `(column, value)` pair: only rows whose `column` is
+    at or after `value` are converted. Timestamps are compared by calendar day,
+    so the last stored day is always re-read and can be corrected.
+    """
+    if since is not None:
+        since_column, since_value = since
+        if isinstance(since_value, pd.Timestamp):
+            since_value = since_value.normalize().to_datetime64()
+    parts = {name:[] for name in schema}
+    for rows in iter_row_batches(payload, batch_bytes):
+        if since is not None:
+            keys = to_column([row.get(since_column) for row in rows], schema[since_column])
+            mask = keys >= since_value
+            if hasattr(mask, 'fillna'):
+                mask = mask.fillna(False)
+            keep = np.flatnonzero(np.asarray(mask, dtype=bool))
+            if len(keep) < len(rows):
+                rows = [rows[i] for i in keep]
+        for name, column in rows_to_columns(rows, schema).items():
+            parts[name].append(column)
+        del rows
+    if not parts or not next(iter(parts.values())):
+        return rows_to_frame([], schema)
+    return pd.DataFrame({name:concat_column(parts[name], dtype) for name, dtype in schema.items()}, copy=False)
+
+
+def load_query(query_id, schema, since=None):
+    """Fetch the latest result of a Flipside query into a typed DataFrame."""
+    return parse(fetch_payload(query_id), schema, since=since)
+
+
+def sync_query(query_id, schema, dataset, date_column, key, store=None):
+    """Merge the rows of a Flipside query at or after the dataset's high-water mark into the local store.
+
+    Returns the number of rows merged.
+    """
+    store = store or get_store()
+    high_water_mark = store.high_water_mark(dataset)
+    since = None if high_water_mark is None else (key, high_water_mark)
+    frame = load_query(query_id, schema, since=since)
+    store.merge(dataset, frame, date_column=date_column, key=key)
+    return len(frame)
+
+
+def read_query(dataset, schema, days=None, store=None):
+    """The last `days` days of a dataset kept by `sync_query`, empty with the query's columns when it has no rows."""
+    frame = (store or get_store()).read_window(dataset, days=days)
+    return rows_to_frame([], schema) if frame is None else frame
@@ -0,0 +1,130 @@
+"""Streaming walk over a JSON document held as text or read in chunks.
+
+`walk` steps through objects member by member with the standard library's C
+scanner and decodes arrays one element at a time. Elements of the arrays at
+the requested key paths go to their callbacks; everything else is decoded
+piecewise and dropped at once. Given the chunks of a streamed response, only
+the unparsed rest of the current chunk is kept, so peak memory is about a
+chunk plus the largest single array element instead of the whole document.
+"""
+import json
+import re
+from json.decoder import scanstring
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# What may be left of a number cut off by the end of a chunk.
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+_decode = json.JSONDecoder().raw_decode
+
+
+class _Buffer:
+    """The unparsed rest of a document read from an iterator of text chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.s = ''
+        self.i = 0
+
+    def more(self):
+        """Append the next chunk, dropping the parsed text before it; returns False at the end."""
+        for chunk in self.chunks:
+            if chunk:
+                self.s = self.s[self.i:] + chunk
+                self.i = 0
+                return True
+        return False
+
+    def peek(self):
+        """The next character that is not whitespace, or '' at the end of the document."""
+        while True:
+            self.i = WHITESPACE.match(self.s, self.i).end()
+            if self.i < len(self.s):
+                return self.s[self.i]
+            if not self.more():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}' if self.i < len(self.s) else 'Unexpected end of document',
+                                       self.s, self.i)
+        self.i += 1
+
+    def decode(self, parse):
+        """Run `parse(s, i) -> (value, end)` at the next character, reading chunks until the value is complete."""
+        while True:
+            try:
+                value, end = parse(self.s, self.i)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                continue
+            # A number up to the end of the buffer may go on in the next chunk ("1.5" of "1.5e3").
+            if NUMBER_TAIL.match(self.s, end) and self.more():
+                continue
+            self.i = end
+            return value
+
+
+def _array(buf, handler):
+    buf.expect('[')
+    if buf.peek() == ']':
+        buf.i += 1
+        return
+    while True:
+        buf.peek()
+        value = buf.decode(_decode)
+        if handler is not None:
+            handler(value)
+        if buf.peek() == ']':
+            buf.i += 1
+            return
+        buf.expect(',')
+
+
+def _object(buf, path, handlers, found):
+    buf.expect('{')
+    if buf.peek() == '}':
+        buf.i += 1
+        return
+    while True:
+        buf.expect('"')
+        key = buf.decode(scanstring)
+        buf.expect(':')
+        _value(buf, path + (key,), handlers, found)
+        if buf.peek() == '}':
+            buf.i += 1
+            return
+        buf.expect(',')
+
+
+def _value(buf, path, handlers, found):
+    char = buf.peek()
+    if char == '{':
+        _object(buf, path, handlers, found)
+    elif char == '[':
+        handler = handlers.get(path)
+        if handler is not None:
+            found.add(path)
+        _array(buf, handler)
+    elif char == '':
+        raise json.JSONDecodeError('Unexpected end of document', buf.s, buf.i)
+    else:
+        buf.decode(_decode)
+
+
+def walk(text, handlers):
+    """Call `handlers[path](element)` for each element of the arrays at `path` (a tuple of object keys).
+
+    `text` is the document, or an iterable of consecutive pieces of it (such
+    as the decoded chunks of a streamed response), read as far as the walk
+    has got. Returns the set of paths that were found. Raises ValueError if
+    `text` is not a single valid JSON document.
+    """
+    found = set()
+    buf = _Buffer([text] if isinstance(text, str) else text)
+    _value(buf, (), handlers, found)
+    if buf.peek() != '':
+        raise json.JSONDecodeError('Extra data', buf.s, buf.i)
+    return found
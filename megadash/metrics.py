@@ -0,0 +1,58 @@
+"""Declarative scorecard metrics and their card renderer.
+
+A page lists its scorecard as MetricSpec entries. Each spec names the metric
+prefix in the scorecard dict (values are read from `{name}__PAST_{period}` and
+`{name}__DELTA_{period}`), the periods shown, and how values and deltas are
+formatted. `metric_cards` formats every card of a page in one pass, once per
+version of the scorecard dataset, and `render_metrics` draws a row of cards.
+"""
+from collections import namedtuple
+
+import streamlit as st
+
+from megadash.cache import memoized
+from megadash.tracing import traced
+
+
+MetricSpec = namedtuple('MetricSpec', ['name', 'periods', 'value_format', 'delta_format', 'delta_color'],
+                        defaults=['{:.1%}', 'normal'])
+MetricCard = namedtuple('MetricCard', ['label', 'value', 'delta', 'delta_color', 'help'], defaults=[None])
+
+
+def periods(suffix=''):
+    """The (label, period) pairs shown on the scorecards."""
+    return (('Past 24 Hours' + suffix, '24H'), ('Past 7 Days' + suffix, '7D'), ('Past 30 Days' + suffix, '30D'))
+
+
+def format_value(value, fmt):
+    if value is None or fmt is None:
+        return None
+    try:
+        return fmt.format(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@traced('transform.format_cards')
+def format_cards(specs, scorecard):
+    """{spec name: [MetricCard, ...]} for every spec and period."""
+    return {spec.name:[MetricCard(label,
+                                  format_value(scorecard.get(f'{spec.name}__PAST_{period}'), spec.value_format),
+                                  format_value(scorecard.get(f'{spec.name}__DELTA_{period}'), spec.delta_format),
+                                  spec.delta_color)
+                       for label, period in spec.periods]
+            for spec in specs}
+
+
+def metric_cards(loader, specs):
+    """Formatted cards for the scorecard dataset behind the cached `loader`, built once per dataset version."""
+    entry = loader.entry()
+    return memoized(f'{loader.cache_name}.cards', entry.created, lambda: format_cards(specs, entry.value))
+
+
+def render_metrics(cards, widths=(1, 3, 3, 3)):
+    """Draw `cards` in a row of columns, leaving the first column as a spacer."""
+    for column, card in zip(st.columns(list(widths))[1:], cards):
+        with column:
+            st.metric(label=card.label, value=card.value, delta=card.delta, delta_color=card.delta_color,
+                      help=card.help, label_visibility='visible')
@@ -0,0 +1,63 @@
+"""Headless data pipeline: refresh every dataset in parallel and publish a snapshot.
+
+Runs the same data functions the pages use, outside Streamlit, so the heavy
+fetching and transformation can run from cron while the app only reads the
+published snapshot (MEGADASH_READ_SNAPSHOTS=1). The incremental stores under
+the cache directory are reused between runs, so each run only fetches what
+changed upstream.
+
+    python -m megadash [--datasets activity.barchart defi.defi] [--workers 4]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from megadash.datasets import DATASETS
+from megadash.snapshots import SnapshotStore, get_snapshots
+
+
+def refresh(dataset):
+    started = time.time()
+    value = dataset.loader.refresh()
+    return value, time.time(), time.time() - started
+
+
+def run(datasets=None, max_workers=None, store=None, keep=None):
+    """Refresh `datasets` (default: all) concurrently and publish them as a new snapshot.
+
+    Returns (manifest, {name: seconds}, {name: error}); failed datasets keep
+    their previous snapshot.
+    """
+    datasets = DATASETS if datasets is None else datasets
+    store = store or get_snapshots()
+    values, durations, errors = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(datasets), thread_name_prefix='megadash-pipeline') as pool:
+        futures = {dataset.name:pool.submit(refresh, dataset) for dataset in datasets}
+        for name, future in futures.items():
+            try:
+                value, created, durations[name] = future.result()
+            except Exception as e:
+                errors[name] = f'{type(e).__name__}: {e}'
+                continue
+            values[name] = (value, created)
+    return store.publish(values, errors, keep), durations, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m megadash', description=__doc__.split('\n')[0])
+    parser.add_argument('--datasets', nargs='+', choices=[dataset.name for dataset in DATASETS],
+                        help='datasets to refresh (default: all)')
+    parser.add_argument('--workers', type=int, help='concurrent refreshes (default: one per dataset)')
+    parser.add_argument('--keep', type=int, help='snapshot versions to keep')
+    parser.add_argument('--snapshot-dir', help='where to write snapshots (default: MEGADASH_SNAPSHOT_DIR)')
+    args = parser.parse_args(argv)
+
+    datasets = [dataset for dataset in DATASETS if args.datasets is None or dataset.name in args.datasets]
+    store = SnapshotStore(args.snapshot_dir) if args.snapshot_dir else None
+    started = time.time()
+    manifest, durations, errors = run(datasets, args.workers, store, args.keep)
+    for dataset in datasets:
+        status = errors.get(dataset.name) or f'{durations[dataset.name]:.2f}s'
+        print(f'{dataset.name:<24} {status}')
+    print(f'snapshot {manifest["version"]} published in {time.time() - started:.2f}s')
+    return 1 if errors else 0
@@ -0,0 +1,152 @@
+"""Render cache: finished page sections shared by every session.
+
+Every widget interaction and every new session reruns a page from the top.
+Most of a warm rerun goes into turning chart frames into Vega-Lite specs:
+Streamlit's built-in charts build an Altair chart and validate it against the
+Vega-Lite schema on every call. `chart` builds the spec of a built-in line,
+area or bar chart once and draws the cached spec with st.vega_lite_chart, and
+`rendered` caches any other section payload (formatted metric cards, chart
+frames).
+
+Keys carry the version of every dataset a section is built from and the
+widget values it depends on, so a refresh produces new keys and the old
+entries age out. Entries are shared by all sessions without copying, like
+st.cache_resource, and must not be mutated. The cache is an LRU bounded by
+`config.RENDER_CACHE_BYTES`; MEGADASH_RENDER_CACHE=0 bypasses it.
+
+The spec is built with Streamlit's internal chart helpers. Where they are
+missing or fail (their signatures are not part of Streamlit's API), `chart`
+logs the error once and draws that kind of chart with the public chart
+commands from then on.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from megadash import config
+from megadash.tracing import count, nbytes, record_size
+
+try:
+    from streamlit.elements.lib.built_in_chart_utils import ChartType, generate_chart
+    from streamlit.elements.vega_charts import _convert_altair_to_vega_lite_spec
+except ImportError:
+    generate_chart = None
+
+logger = logging.getLogger(__name__)
+_failed_kinds = set()
+
+
+class RenderCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key, build):
+        """(value, hit): the cached value of `key`, or `build()`'s, built once however many sessions ask."""
+        entry = self._get(key)
+        if entry is not None:
+            return entry[0], True
+        with self._lock:
+            lock = self._building.setdefault(key, threading.Lock())
+        with lock:
+            entry = self._get(key)
+            if entry is not None:
+                return entry[0], True
+            try:
+                value = build()
+                size = nbytes(value)
+                with self._lock:
+                    if size <= self.max_bytes:
+                        self._entries[key] = (value, size)
+                        self.size += size
+                        while self.size > self.max_bytes:
+                            _, (_, evicted) = self._entries.popitem(last=False)
+                            self.size -= evicted
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache(config.RENDER_CACHE_BYTES)
+        return _render_cache
+
+
+def rendered(name, loaders, build, params=()):
+    """`build()` for section `name`, cached per version of the cached `loaders`' datasets and the values `params`."""
+    if not config.RENDER_CACHE:
+        return build()
+    key = (name, tuple(loader.entry().created for loader in loaders), params)
+    value, hit = get_render_cache().get(key, build)
+    count('render', section=name, outcome='hit' if hit else 'miss')
+    if not hit:
+        record_size(f'render.{name}', nbytes(value))
+    return value
+
+
+def chart_spec(kind, data, x, y, height):
+    """Vega-Lite spec, data included, of st.line_chart/area_chart/bar_chart (`kind`) with their defaults."""
+    # st.area_chart passes its default stack=None on as 'layered', so cached area charts overlap the same way.
+    chart_type, options = {
+        'line':(ChartType.LINE, {}),
+        'area':(ChartType.AREA, {'stack':'layered'}),
+        'bar':(ChartType.VERTICAL_BAR, {'sort_from_user':True}),
+    }[kind]
+    return _convert_altair_to_vega_lite_spec(generate_chart(chart_type, data, x_from_user=x, y_from_user=y,
+                                                            height=height, **options))
+
+
+def chart(kind, name, loaders, build, x, y=None, params=(), height=500):
+    """Draw a built-in `kind` chart of the frame `build()` returns, its spec cached like `rendered`.
+
+    `y` defaults to every column but `x`.
+    """
+    def draw(data):
+        return getattr(st, f'{kind}_chart')(data=data, x=x, y=y, use_container_width=True, height=height)
+
+    if generate_chart is None or not config.RENDER_CACHE or kind in _failed_kinds:
+        return draw(build())
+
+    def build_spec():
+        data = build()
+        try:
+            return chart_spec(kind, data, x, y, height)
+        except Exception:
+            logger.exception('Building the %s chart spec failed, falling back to st.%s_chart', kind, kind)
+            _failed_kinds.add(kind)
+            return None
+
+    key = (x, tuple(y) if isinstance(y, list) else y, height) + tuple(params)
+    spec = rendered(name, loaders, build_spec, key)
+    if spec is None:
+        count('render', section=name, outcome='fallback')
+        return draw(build())
+    return st.vega_lite_chart(spec=spec, use_container_width=True, height=height)
@@ -0,0 +1,161 @@
+"""Circuit breakers, page latency budgets and the last-known-good badge.
+
+Every upstream host (Flipside, DefiLlama, each NEAR RPC endpoint) gets a
+circuit breaker in the shared HTTP client. After CIRCUIT_FAILURE_THRESHOLD
+consecutive failures (connection errors, timeouts, 429 and 5xx) the breaker
+opens and requests fail at once with CircuitOpenError. After
+CIRCUIT_RESET_TIMEOUT seconds a single trial request is let through: it
+closes the breaker again on success and reopens it on failure.
+
+Pages load their data inside `page_data()`, which bounds how long cached
+datasets may block the script (PAGE_LATENCY_BUDGET). A dataset that fails to
+load, or is still loading when the budget runs out, is served from its
+last-known-good copy (an expired cache entry or the published snapshot) and
+`stale_badge` tells the reader. Without any copy the page shows an error
+instead of a traceback. Datasets only some sections read are loaded by those
+sections in `section_data()`, which shares the page's budget but replaces
+just its section with the error, so a page draws each section as soon as its
+datasets are in and the rest of the page still renders when one is missing.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+import streamlit as st
+
+from megadash import config
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request to a host whose breaker is open."""
+
+
+class Unavailable(Exception):
+    """A dataset could not be loaded in time and has no last-known-good copy."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = config.CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = None
+        self.trips = 0
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened >= self.reset_timeout:
+                self.state = 'half-open'
+                self._trial = False
+            if self.state == 'closed':
+                return
+            if self.state == 'half-open' and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f'circuit open for {self.name}')
+
+    def success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                self.trips += self.state != 'open'
+                self.state = 'open'
+                self.opened = time.monotonic()
+                self._trial = False
+
+    def as_dict(self):
+        with self._lock:
+            return {'state':self.state, 'failures':self.failures, 'trips':self.trips, 'rejected':self.rejected}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name:breaker.as_dict() for name, breaker in breakers.items()}
+
+
+_budget = threading.local()
+
+
+def remaining():
+    """Seconds left in the latency budget of the page running on this thread, or None outside a page."""
+    deadline = getattr(_budget, 'deadline', None)
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+@contextmanager
+def page_data(budget=None):
+    """Load a page's data within its latency budget, stopping the page with an error if a dataset is unavailable."""
+    deadline = time.monotonic() + (config.PAGE_LATENCY_BUDGET if budget is None else budget)
+    _budget.deadline = _budget.page_deadline = deadline
+    try:
+        yield
+    except Unavailable as e:
+        st.error(f'Data is temporarily unavailable ({e}). Please try again in a moment.')
+        st.stop()
+    finally:
+        _budget.deadline = None
+
+
+@contextmanager
+def section_data():
+    """Load and draw one section in what is left of the page's budget; an unavailable dataset only replaces it."""
+    _budget.deadline = getattr(_budget, 'page_deadline', None) or time.monotonic() + config.PAGE_LATENCY_BUDGET
+    try:
+        yield
+    except Unavailable as e:
+        st.error(f'This section is temporarily unavailable ({e}). Please try again in a moment.')
+    finally:
+        _budget.deadline = None
+
+
+def format_age(seconds):
+    if seconds < 60:
+        return 'less than a minute'
+    if seconds < 3600:
+        return f'{seconds / 60:.0f} min'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f} h'
+    return f'{seconds / 86400:.1f} days'
+
+
+def stale_badge(*loaders):
+    """Warn when any of the cached `loaders` is serving last-known-good data because its upstream is failing."""
+    lines = []
+    now = time.time()
+    for loader in loaders:
+        failure = loader.failure()
+        entry = loader.peek() if failure is not None else None
+        if entry is None:
+            continue
+        as_of = datetime.utcfromtimestamp(entry.created).strftime('%Y-%m-%d %H:%M UTC')
+        lines.append(f'- {loader.cache_name}: as of {as_of} ({format_age(now - entry.created)} old), '
+                     f'upstream failing for {format_age(now - failure.since)}: {failure.error}')
+    if lines:
+        st.warning('Showing last known good data:\n' + '\n'.join(lines), icon='⏳')
@@ -0,0 +1,217 @@
+"""NEAR JSON-RPC client with batching, endpoint failover, deadlines and an epoch cache.
+
+Calls go to the endpoints in `config.NEAR_RPC_URLS`, starting with the last one
+that answered. Connection errors, HTTP 429/5xx and NEAR `INTERNAL_ERROR`
+responses move the call on to the next endpoint; every call has a deadline
+that covers all of its attempts. Several calls can be sent as one JSON-RPC
+batch. Endpoints that reject batches are remembered and get the calls
+concurrently instead.
+
+Results that do not change within an epoch are cached by epoch ID, so the
+validator set is downloaded once per epoch and later refreshes only cost a
+`block` call to learn the current epoch. Validator sets of past epochs never
+change and are cached as well.
+"""
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from megadash import config
+from megadash.client import get_client
+from megadash.fetcher import RETRY_STATUS
+
+
+FAILOVER_ERRORS = {'INTERNAL_ERROR'}
+# Small, idempotent calls whose requests are hedged (see megadash.client).
+HEDGED_METHODS = {'block'}
+
+
+class RpcError(Exception):
+    """A JSON-RPC error object returned by a node."""
+
+    def __init__(self, error):
+        self.error = error
+        self.name = error.get('name')
+        self.cause = (error.get('cause') or {}).get('name')
+        super().__init__(f'{error.get("message", "RPC error")} ({self.cause or self.name or error.get("code")}): '
+                         f'{error.get("data")}')
+
+
+class EndpointError(Exception):
+    """No usable answer from an endpoint (or from any endpoint)."""
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class NearRpc:
+    def __init__(self, endpoints=None, deadline=None, max_workers=None, epoch_cache_entries=None, client=None):
+        self.endpoints = list(endpoints or config.NEAR_RPC_URLS)
+        self.deadline = config.NEAR_RPC_DEADLINE if deadline is None else deadline
+        self.max_workers = max_workers or config.NEAR_RPC_MAX_WORKERS
+        self.epoch_cache_entries = epoch_cache_entries or config.NEAR_RPC_EPOCH_CACHE_ENTRIES
+        self.client = client or get_client()
+        self._ids = itertools.count(1)
+        self._no_batch = set()
+        self._preferred = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _endpoint_order(self):
+        with self._lock:
+            start = self._preferred
+        return self.endpoints[start:] + self.endpoints[:start]
+
+    def _post(self, url, payload, expires):
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'NEAR RPC deadline exceeded before {url}')
+        try:
+            hedge = isinstance(payload, dict) and payload.get('method') in HEDGED_METHODS
+            response = self.client.post(url, json=payload, hedge=hedge,
+                                        timeout=(min(config.HTTP_CONNECT_TIMEOUT, remaining),
+                                                 min(config.HTTP_READ_TIMEOUT, remaining)))
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if time.monotonic() >= expires:
+                raise DeadlineExceeded(f'NEAR RPC deadline exceeded at {url}') from e
+            raise EndpointError(f'{type(e).__name__}: {e}') from e
+        if response.status_code in RETRY_STATUS:
+            raise EndpointError(f'HTTP {response.status_code} from {url}')
+        try:
+            return response.json()
+        except ValueError:
+            raise EndpointError(f'HTTP {response.status_code} from {url}: not JSON')
+
+    def _send_each(self, url, requests_, expires):
+        if len(requests_) == 1:
+            return {requests_[0]['id']:self._post(url, requests_[0], expires)}
+        responses, errors = {}, []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(requests_)))) as pool:
+            futures = {request['id']:pool.submit(self._post, url, request, expires) for request in requests_}
+            for request_id, future in futures.items():
+                try:
+                    responses[request_id] = future.result()
+                except EndpointError as e:
+                    errors.append(e)
+        if not responses and errors:
+            raise errors[0]
+        return responses
+
+    def _send(self, url, requests_, expires):
+        """{request id: response object} for the requests an endpoint answered."""
+        if len(requests_) == 1 or url in self._no_batch:
+            return self._send_each(url, requests_, expires)
+        answer = self._post(url, requests_, expires)
+        if not isinstance(answer, list):
+            with self._lock:
+                self._no_batch.add(url)
+            return self._send_each(url, requests_, expires)
+        return {message.get('id'):message for message in answer if isinstance(message, dict)}
+
+    def batch(self, calls, deadline=None):
+        """Run [(method, params), ...] and return their results in order.
+
+        Calls the node answered with an error come back as RpcError instances
+        in place of their result. Raises EndpointError if some call got no
+        usable answer from any endpoint, or DeadlineExceeded.
+        """
+        expires = time.monotonic() + (self.deadline if deadline is None else deadline)
+        pending = {i:{'jsonrpc':'2.0', 'id':next(self._ids), 'method':method, 'params':params}
+                   for i, (method, params) in enumerate(calls)}
+        results = [None] * len(calls)
+        errors = []
+        for url in self._endpoint_order():
+            if not pending:
+                break
+            try:
+                responses = self._send(url, list(pending.values()), expires)
+            except EndpointError as e:
+                errors.append(f'{url}: {e}')
+                continue
+            for i, request in list(pending.items()):
+                message = responses.get(request['id'])
+                if message is None:
+                    continue
+                if 'error' in message:
+                    error = RpcError(message['error'])
+                    if error.name in FAILOVER_ERRORS:
+                        errors.append(f'{url}: {error}')
+                        continue
+                    results[i] = error
+                else:
+                    results[i] = message['result']
+                del pending[i]
+            if not pending:
+                with self._lock:
+                    self._preferred = self.endpoints.index(url)
+        if pending:
+            raise EndpointError('no NEAR RPC endpoint answered: ' + '; '.join(errors or ['no endpoints configured']))
+        return results
+
+    def call(self, method, params=None, deadline=None):
+        result = self.batch([(method, params)], deadline)[0]
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    def _cached(self, key, load):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = load()
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > self.epoch_cache_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def epoch_id(self, deadline=None):
+        return self.call('block', {'finality':'final'}, deadline)['header']['epoch_id']
+
+    def epoch_call(self, method, params=None, deadline=None):
+        """`call`, answered from the cache until the epoch changes."""
+        key = (self.epoch_id(deadline), method, json.dumps(params, sort_keys=True))
+        return self._cached(key, lambda: self.call(method, params, deadline))
+
+    def validators(self, block_id=None, deadline=None):
+        """Validator sets (current, next, proposals, kickouts) of the current epoch.
+
+        With `block_id`, the sets of that block's epoch, which must have ended:
+        they are cached for good.
+        """
+        if block_id is None:
+            return self.epoch_call('validators', [None], deadline)
+        return self._cached(('validators', block_id), lambda: self.call('validators', [block_id], deadline))
+
+    def validator_history(self, epochs, deadline=None):
+        """Validator sets of the current and up to `epochs - 1` previous epochs, newest first.
+
+        Stops early when a node no longer has an epoch (non-archival nodes
+        keep only the last few).
+        """
+        history = [self.validators(deadline=deadline)]
+        while len(history) < epochs:
+            try:
+                history.append(self.validators(history[-1]['epoch_start_height'] - 1, deadline))
+            except RpcError:
+                break
+        return history
+
+
+_rpc = None
+_rpc_lock = threading.Lock()
+
+
+def get_rpc():
+    global _rpc
+    with _rpc_lock:
+        if _rpc is None:
+            _rpc = NearRpc()
+        return _rpc
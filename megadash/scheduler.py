@@ -0,0 +1,167 @@
+"""Background refresh scheduler that keeps every dataset warm.
+
+Each dataset is refreshed on its own cadence by a daemon thread started once
+per process, so page renders only ever read what is already in the cache.
+The clock is injectable and `run_pending` can run jobs inline, which lets the
+scheduling logic be driven deterministically with fake sources and time.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from megadash import config
+from megadash.boot import ensure_booted
+from megadash.datasets import DATASETS, age
+from megadash.snapshots import get_snapshots
+
+
+class JobStats:
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_started = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class Job:
+    def __init__(self, name, fn, interval, next_run):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.next_run = next_run
+        self.running = False
+        self.stats = JobStats()
+
+
+class Scheduler:
+    def __init__(self, clock=time.time, max_workers=None, retry_interval=None):
+        self.clock = clock
+        self.max_workers = max_workers or config.SCHEDULER_MAX_WORKERS
+        self.retry_interval = config.SCHEDULER_RETRY_INTERVAL if retry_interval is None else retry_interval
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def add(self, name, fn, interval, delay=0):
+        with self._lock:
+            self.jobs[name] = Job(name, fn, interval, self.clock() + delay)
+        self._wake.set()
+
+    def run_job(self, job):
+        job.stats.last_started = started = self.clock()
+        try:
+            job.fn()
+        except Exception as e:
+            finished = self.clock()
+            with self._lock:
+                job.stats.failures += 1
+                job.stats.consecutive_failures += 1
+                job.stats.last_error = f'{type(e).__name__}: {e}'
+                retry = self.retry_interval * 2 ** (job.stats.consecutive_failures - 1)
+                job.next_run = finished + min(job.interval, retry)
+        else:
+            finished = self.clock()
+            with self._lock:
+                job.stats.consecutive_failures = 0
+                job.stats.last_success = finished
+                job.next_run = finished + job.interval
+        finally:
+            with self._lock:
+                job.stats.runs += 1
+                job.stats.last_duration = finished - started
+                job.running = False
+
+    def due(self):
+        now = self.clock()
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if not job.running and job.next_run <= now]
+            for job in jobs:
+                job.running = True
+        return jobs
+
+    def run_pending(self, executor=None):
+        """Start every due job, inline unless an executor is given. Returns the jobs started."""
+        jobs = self.due()
+        for job in jobs:
+            if executor is None:
+                self.run_job(job)
+            else:
+                executor.submit(self.run_job, job)
+        return jobs
+
+    def seconds_until_next(self):
+        with self._lock:
+            pending = [job.next_run for job in self.jobs.values() if not job.running]
+        return max(0.0, min(pending) - self.clock()) if pending else None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='megadash-refresh')
+            self._thread = threading.Thread(target=self._loop, name='megadash-scheduler', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self.run_pending(self._executor)
+            wait = self.seconds_until_next()
+            self._wake.wait(timeout=1.0 if wait is None else min(max(wait, 0.5), 30.0))
+            self._wake.clear()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {name:dict(job.stats.as_dict(), interval=job.interval, next_run=job.next_run)
+                    for name, job in self.jobs.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def refresh_job(dataset):
+    def run():
+        value = dataset.loader.refresh()
+        if config.PUBLISH_SNAPSHOTS:
+            get_snapshots().publish({dataset.name:(value, time.time())})
+        if dataset.derived is not None:
+            dataset.derived()
+    return run
+
+
+def ensure_started():
+    """Create the process-wide scheduler for every registered dataset and start it once.
+
+    It is not started when the app serves snapshots, unless this process is
+    the one publishing them. The first call also starts the boot warm-up (see
+    megadash.boot); scheduled refreshes of datasets it is loading wait for
+    that load instead of fetching again.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            for dataset in DATASETS:
+                dataset_age = age(dataset)
+                delay = 0 if dataset_age is None else max(0, dataset.interval - dataset_age)
+                _scheduler.add(dataset.name, refresh_job(dataset), dataset.interval, delay=delay)
+            if config.SCHEDULER_ENABLED and (config.PUBLISH_SNAPSHOTS or not config.READ_SNAPSHOTS):
+                _scheduler.start()
+            ensure_booted()
+        return _scheduler
@@ -0,0 +1,123 @@
+"""Datetime-indexed chart series with range slicing and cached resampling.
+
+A `SeriesIndex` wraps a chart frame once per dataset version: the rows are
+sorted on a DatetimeIndex, so a date range is two binary searches instead of a
+scan of the frame. Each granularity is resampled once, on first use, and the
+finished views (range x granularity x columns, downsampled for the chart) are
+kept in a small LRU, so moving the range widgets back and forth costs a dict
+lookup after the first time.
+
+`range_controls` draws the date range and granularity widgets of a page.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from megadash import config
+from megadash.cache import memoized
+from megadash.downsample import downsample
+from megadash.tracing import span
+
+
+GRANULARITIES = {'Daily':'D', 'Weekly':'W-MON', 'Monthly':'MS'}
+DAILY = 'Daily'
+
+
+class SeriesIndex:
+    """Chart series of `frame` keyed by its `x` column.
+
+    `how` is the resampling aggregation ('sum', 'mean', 'max', 'last', ...)
+    for all columns or a {column: aggregation} dict.
+    """
+
+    def __init__(self, frame, x, how='sum', view_entries=None):
+        self.x = x
+        self.frame = frame.set_index(x).sort_index()
+        self.how = how if isinstance(how, dict) else {column:how for column in self.frame.columns}
+        self.view_entries = view_entries or config.SERIES_VIEW_CACHE_ENTRIES
+        self._resampled = {}
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return list(self.frame.columns)
+
+    @property
+    def nbytes(self):
+        """Memory held by the series, its resampled frames and cached views."""
+        with self._lock:
+            frames = [self.frame, *self._resampled.values(), *self._views.values()]
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+    @property
+    def first(self):
+        return self.frame.index[0] if len(self.frame) else None
+
+    @property
+    def last(self):
+        return self.frame.index[-1] if len(self.frame) else None
+
+    def resampled(self, granularity=DAILY):
+        """The whole series aggregated per `granularity` period, labelled by the period start."""
+        with self._lock:
+            frame = self._resampled.get(granularity)
+        if frame is None:
+            with span('transform.resample'):
+                periods = self.frame.resample(GRANULARITIES[granularity], label='left', closed='left')
+                frame = periods.agg(self.how)
+                frame = frame.loc[periods.size() > 0]
+            with self._lock:
+                self._resampled[granularity] = frame
+        return frame
+
+    def view(self, start=None, end=None, granularity=DAILY, columns=None, method='minmax', stacked=False):
+        """Chart frame of the periods starting from `start` through the day `end`, downsampled for drawing."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end).normalize()
+        key = (start, end, granularity, None if columns is None else tuple(columns), method, stacked)
+        with self._lock:
+            if key in self._views:
+                self._views.move_to_end(key)
+                return self._views[key]
+        frame = self.resampled(granularity)
+        first = 0 if start is None else frame.index.searchsorted(start)
+        last = len(frame) if end is None else frame.index.searchsorted(end + pd.Timedelta(days=1))
+        frame = frame.iloc[first:last]
+        if columns is not None:
+            frame = frame[list(columns)]
+        with span('transform.downsample'):
+            view = downsample(frame.reset_index(), self.x, method=method, stacked=stacked)
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > self.view_entries:
+                self._views.popitem(last=False)
+        return view
+
+
+def series_index(loader, x, how='sum'):
+    """SeriesIndex of the cached `loader`'s frame, built once per dataset version."""
+    entry = loader.entry()
+    return memoized(f'{loader.cache_name}.series', entry.created, lambda: SeriesIndex(entry.value, x, how))
+
+
+def range_controls(key, first, last):
+    """Date range and granularity widgets for data spanning `first`..`last`; returns (start, end, granularity)."""
+    if first is None:
+        return None, None, DAILY
+    first, last = pd.Timestamp(first).date(), pd.Timestamp(last).date()
+    col1, col2, col3 = st.columns([1,3,3])
+    with col2:
+        dates = st.date_input('Date range', value=(first, last), min_value=first, max_value=last,
+                              key=f'{key}.range')
+    with col3:
+        granularity = st.radio('Granularity', list(GRANULARITIES), horizontal=True, key=f'{key}.granularity')
+    dates = dates if isinstance(dates, (tuple, list)) else (dates,)
+    start = dates[0] if len(dates) > 0 else first
+    end = dates[1] if len(dates) > 1 else last
+    return pd.Timestamp(start), pd.Timestamp(end), granularity
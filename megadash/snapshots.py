@@ -0,0 +1,285 @@
+"""Versioned on-disk snapshots of every dataset, shared by all app processes.
+
+A snapshot is a directory of files named after its version, plus the
+`manifest.json` at the snapshot root that points at the current version:
+
+    <SNAPSHOT_DIR>/manifest.json
+    <SNAPSHOT_DIR>/20240101T000000.000Z-1234/activity.barchart.arrow
+    ...
+
+Frames are stored as uncompressed Arrow IPC files (Parquet with
+SNAPSHOT_FORMAT=parquet, pickles without pyarrow). Readers memory-map Arrow
+files, so numeric and datetime columns are views of the page cache rather
+than private copies and every process on the host shares one copy of them;
+string columns are still materialized per process. Token matrices are stored
+as one flat values column and one dates column with a record batch per
+protocol, which map straight back into TokenMatrix arrays. Small records
+(scorecards, per-protocol errors) live inline in the manifest.
+
+The manifest is replaced atomically and readers re-check it (one stat) on
+every access, so a new version is picked up by the next access of each
+process and a reader sees either the old or the new version of a dataset,
+never a mix. A dataset that failed to refresh keeps pointing at its file from
+an earlier version. Publishing is serialized across processes with a file
+lock.
+
+With `config.READ_SNAPSHOTS`, cached data functions answer from the current
+snapshot instead of fetching upstream (see megadash.cache.cached). Snapshots
+are published by the offline pipeline, or by the scheduler of a process
+started with PUBLISH_SNAPSHOTS.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from megadash import config
+from megadash.tokens import TokenMatrix
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+MANIFEST = 'manifest.json'
+
+
+def new_version(now=None):
+    now = time.time() if now is None else now
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f'.{int(now * 1000) % 1000:03d}Z-{os.getpid()}'
+
+
+def _scalar(value):
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def write_arrow(batches, schema, path):
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in batches:
+            writer.write(batch)
+
+
+def map_arrow(path):
+    """Record batches of an Arrow IPC file, backed by a memory map of it."""
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    return [reader.get_batch(i) for i in range(reader.num_record_batches)], reader.schema
+
+
+def write_frame(frame, root, path, format):
+    if format == 'parquet':
+        path += '.parquet'
+        frame.to_parquet(os.path.join(root, path))
+    else:
+        path += '.arrow'
+        table = pa.Table.from_pandas(frame)
+        write_arrow(table.to_batches(), table.schema, os.path.join(root, path))
+    return path
+
+
+def read_frame(root, path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(os.path.join(root, path))
+    batches, schema = map_arrow(os.path.join(root, path))
+    return pa.Table.from_batches(batches, schema).to_pandas(split_blocks=True)
+
+
+def _is_record(value):
+    return isinstance(value, dict) and not (value and all(isinstance(v, TokenMatrix) for v in value.values()))
+
+
+def encode(value, root, version, name, format='arrow'):
+    """Write `value` under `root/version` and return the manifest description to decode it."""
+    if format == 'pickle' and isinstance(value, (pd.DataFrame, dict)) and not _is_record(value):
+        path = os.path.join(version, f'{name}.pickle')
+        pd.to_pickle(value, os.path.join(root, path))
+        return {'kind':'pickle', 'file':path}
+    if isinstance(value, pd.DataFrame):
+        return {'kind':'frame', 'file':write_frame(value, root, os.path.join(version, name), format), 'rows':len(value)}
+    if isinstance(value, tuple):
+        return {'kind':'tuple', 'items':[encode(item, root, version, f'{name}.{i}', format)
+                                         for i, item in enumerate(value)]}
+    if isinstance(value, dict) and not _is_record(value):
+        path = os.path.join(version, f'{name}.matrices')
+        write_arrow([pa.record_batch([pa.array(m.values.ravel())], names=['values']) for m in value.values()],
+                    pa.schema([('values', pa.float64())]), os.path.join(root, path + '.values.arrow'))
+        write_arrow([pa.record_batch([pa.array(m.dates)], names=['dates']) for m in value.values()],
+                    pa.schema([('dates', pa.timestamp('ns'))]), os.path.join(root, path + '.dates.arrow'))
+        return {'kind':'matrices', 'file':path, 'keys':list(value), 'symbols':[list(m.symbols) for m in value.values()]}
+    if isinstance(value, dict):
+        return {'kind':'record', 'value':{str(k):_scalar(v) for k, v in value.items()}}
+    raise TypeError(f'cannot snapshot {type(value).__name__} for {name}')
+
+
+def decode(meta, root):
+    kind = meta['kind']
+    if kind == 'frame':
+        return read_frame(root, meta['file'])
+    if kind == 'tuple':
+        return tuple(decode(item, root) for item in meta['items'])
+    if kind == 'matrices':
+        values, _ = map_arrow(os.path.join(root, meta['file'] + '.values.arrow'))
+        dates, _ = map_arrow(os.path.join(root, meta['file'] + '.dates.arrow'))
+        matrices = {}
+        for key, symbols, v, d in zip(meta['keys'], meta['symbols'], values, dates):
+            d = d.column(0).to_numpy()
+            matrices[key] = TokenMatrix(d, np.array(symbols, dtype=object),
+                                        v.column(0).to_numpy().reshape(len(d), len(symbols)))
+        return matrices
+    if kind == 'record':
+        return dict(meta['value'])
+    if kind == 'pickle':
+        return pd.read_pickle(os.path.join(root, meta['file']))
+    raise ValueError(f'unknown snapshot kind {kind!r}')
+
+
+def files(meta):
+    if meta['kind'] == 'matrices':
+        return [meta['file'] + '.values.arrow', meta['file'] + '.dates.arrow']
+    if 'file' in meta:
+        return [meta['file']]
+    return [path for item in meta.get('items', []) for path in files(item)]
+
+
+class SnapshotStore:
+    def __init__(self, root=None, format=None):
+        self.root = root or config.SNAPSHOT_DIR
+        self.format = format or (config.SNAPSHOT_FORMAT if pa is not None else 'pickle')
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._stamp = None
+        self._manifest = None
+        self._values = {}
+
+    def manifest(self, reload=False):
+        """The current manifest, re-read only when the file was replaced, or None if there is none."""
+        try:
+            stat = os.stat(os.path.join(self.root, MANIFEST))
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if stamp == self._stamp and not reload:
+                return self._manifest
+        with open(os.path.join(self.root, MANIFEST)) as f:
+            manifest = json.load(f)
+        with self._lock:
+            self._stamp, self._manifest = stamp, manifest
+        return manifest
+
+    def entry(self, name):
+        """(value, created) of dataset `name` in the current snapshot, or None if it has none."""
+        manifest = self.manifest()
+        for attempt in range(2):
+            meta = None if manifest is None else manifest['datasets'].get(name)
+            if meta is None:
+                return None
+            with self._lock:
+                cached = self._values.get(name)
+            if cached is not None and cached[0] == meta['created']:
+                return cached[1], cached[0]
+            try:
+                value = decode(meta, self.root)
+            except FileNotFoundError:
+                if attempt:
+                    raise
+                # pruned by a publisher after this process last read the manifest
+                manifest = self.manifest(reload=True)
+                continue
+            with self._lock:
+                self._values[name] = (meta['created'], value)
+            return value, meta['created']
+
+    def held(self, name):
+        """(value, created) of dataset `name` as already decoded by this process, or None; decodes nothing."""
+        with self._lock:
+            cached = self._values.get(name)
+        return None if cached is None else (cached[1], cached[0])
+
+    @contextmanager
+    def _locked(self):
+        with self._publish_lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _new_version_dir(self, now):
+        version = new_version(now)
+        for i in range(1, 1000):
+            try:
+                os.makedirs(os.path.join(self.root, version))
+                return version
+            except FileExistsError:
+                version = f'{new_version(now)}-{i}'
+        raise RuntimeError(f'cannot create a snapshot version under {self.root}')
+
+    def publish(self, values, errors=None, keep=None, now=None):
+        """Write a new version from {name: (value, created)} and make it current.
+
+        Datasets missing from `values` keep their entry from the current
+        manifest. Returns the new manifest.
+        """
+        now = time.time() if now is None else now
+        with self._locked():
+            version = self._new_version_dir(now)
+            previous = self.manifest(reload=True) or {'datasets':{}, 'errors':{}}
+            datasets = dict(previous['datasets'])
+            for name, (value, created) in values.items():
+                datasets[name] = dict(encode(value, self.root, version, name, self.format), created=created)
+            errors = dict({k:v for k, v in previous.get('errors', {}).items() if k not in values}, **(errors or {}))
+            manifest = {'version':version, 'created':now, 'datasets':datasets, 'errors':errors}
+            path = os.path.join(self.root, MANIFEST)
+            with open(f'{path}.tmp-{os.getpid()}', 'w') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(f'{path}.tmp-{os.getpid()}', path)
+            self.prune(manifest, config.SNAPSHOT_KEEP if keep is None else keep)
+        return manifest
+
+    def versions(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)) and not name.startswith('.'))
+
+    def prune(self, manifest, keep):
+        """Remove all but the newest `keep` versions, sparing files the manifest still uses.
+
+        Processes that mapped a removed file keep their mapping until they
+        move on to the new version.
+        """
+        used = {path.split(os.sep)[0] for meta in manifest['datasets'].values() for path in files(meta)}
+        for version in self.versions()[:-keep or None]:
+            if version not in used and version != manifest['version']:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshots():
+    global _snapshots
+    with _snapshots_lock:
+        if _snapshots is None:
+            _snapshots = SnapshotStore()
+        return _snapshots
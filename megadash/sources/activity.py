@@ -0,0 +1,45 @@
+"""On-Chain Activity page datasets (Flipside)."""
+from megadash import config
+from megadash.cache import cached
+from megadash.flipside import load_query, read_query, sync_query
+
+
+SCORECARD_QUERY = 'b39ba359-ab65-4914-a205-59d26c27b449'
+SCORECARD_SCHEMA = {
+    'METRIC':'category',
+    'TIME_PERIOD':'category',
+    'CURRENT_VALUE':'int64',
+    'DELTA':'float64',
+}
+
+BARCHART_QUERY = '4ccaed65-867e-436c-a0ce-c0ee53176fe7'
+BARCHART_SCHEMA = {
+    'UTC_DATE':'datetime',
+    'TRANSACTIONS':'int64',
+    'ACTIVE_ACCOUNTS':'int64',
+    'ACTIVE_CONTRACTS':'int64',
+}
+
+
+@cached('activity.scorecard', source='flipside')
+def get_scorecard_data():
+    """Current values and deltas keyed like the Performance scorecard, e.g. 'Transactions__PAST_24H'."""
+    scorecard = load_query(SCORECARD_QUERY, SCORECARD_SCHEMA)
+    values = {}
+    for metric, period, value, delta in zip(scorecard['METRIC'], scorecard['TIME_PERIOD'],
+                                            scorecard['CURRENT_VALUE'], scorecard['DELTA']):
+        period = period[1:] if period.startswith('P') else period
+        values[f'{metric}__PAST_{period}'] = value
+        values[f'{metric}__DELTA_{period}'] = delta
+    return values
+
+
+@cached('activity.barchart', source='flipside')
+def get_barchart_data():
+    sync_query(BARCHART_QUERY, BARCHART_SCHEMA, 'activity.barchart', date_column='UTC_DATE', key='UTC_DATE')
+    barchart_data = read_query('activity.barchart', BARCHART_SCHEMA, days=config.HISTORY_WINDOW_DAYS)
+    barchart_data = barchart_data.rename(columns={'UTC_DATE':'Date',
+                                                  'TRANSACTIONS':'Transactions',
+                                                  'ACTIVE_ACCOUNTS':'Active Accounts',
+                                                  'ACTIVE_CONTRACTS':'Active Contracts'})
+    return barchart_data
@@ -0,0 +1,48 @@
+"""DeFi page datasets (DefiLlama)."""
+from megadash import config
+from megadash.cache import cached
+from megadash.client import get_client
+from megadash.config import defillama_url
+from megadash.defillama import get_sync
+from megadash.fetcher import fetch_all, iter_fetch
+
+
+DEFILLAMA_MAX_WORKERS = config.DEFILLAMA_MAX_WORKERS
+DEFILLAMA_TIMEOUT = 15
+DEFILLAMA_RETRIES = 2
+
+
+def get_near_protocols():
+    url = defillama_url('protocols')
+    protocols = get_client().get_json(url)
+    near_protocols = [x for x in protocols if 'Near' in x['chains'] and x['category'] != 'CEX']
+    return near_protocols
+
+
+@cached('defi.defi', source='defillama')
+def get_defi_data():
+    protocols_list = get_near_protocols()
+    protocols_by_slug = {p['slug']:p for p in protocols_list}
+    urls = {slug:defillama_url(f'protocol/{slug}') for slug in protocols_by_slug}
+    sync = get_sync()
+    if config.DEFILLAMA_STREAMING:
+        failed = {}
+
+        def texts():
+            for slug, chunks, error in iter_fetch(urls, max_workers=DEFILLAMA_MAX_WORKERS, timeout=DEFILLAMA_TIMEOUT,
+                                                  retries=DEFILLAMA_RETRIES):
+                if error is not None:
+                    failed[protocols_by_slug[slug]['name']] = error
+                    continue
+                yield slug, chunks
+
+        unreadable = sync.sync_stream(protocols_list, texts())
+    else:
+        fetched = fetch_all(urls, max_workers=DEFILLAMA_MAX_WORKERS, timeout=DEFILLAMA_TIMEOUT,
+                            retries=DEFILLAMA_RETRIES)
+        failed = {protocols_by_slug[slug]['name']:error for slug, error in fetched.failures.items()}
+        unreadable = sync.sync(protocols_list, fetched.results)
+    failed.update({protocols_by_slug[slug]['name']:error for slug, error in unreadable.items()})
+
+    tvl_df_compiled, token_tvls = sync.window(protocols_list)
+    return tvl_df_compiled, token_tvls, failed
@@ -0,0 +1,27 @@
+"""Performance page datasets (Flipside)."""
+from megadash import config
+from megadash.cache import cached
+from megadash.flipside import fetch_rows, read_query, sync_query
+
+
+SCORECARD_QUERY = '3b9a57ee-b1a9-4a59-b3f9-8583e186669c'
+
+BARCHART_QUERY = '4922bf59-2feb-4b45-be10-fc316d11520e'
+BARCHART_SCHEMA = {
+    'UTC_DATE':'datetime',
+    'BLOCKS_PRODUCED':'int64',
+    'BLOCK_TIME_SECONDS':'float32',
+    'MAX_TPS':'float32',
+    'SUCCESS_RATE':'float32',
+}
+
+
+@cached('performance.scorecard', source='flipside')
+def get_scorecard_data():
+    return fetch_rows(SCORECARD_QUERY)[0]
+
+
+@cached('performance.barchart', source='flipside')
+def get_barchart_data():
+    sync_query(BARCHART_QUERY, BARCHART_SCHEMA, 'performance.barchart', date_column='UTC_DATE', key='UTC_DATE')
+    return read_query('performance.barchart', BARCHART_SCHEMA, days=config.HISTORY_WINDOW_DAYS)
@@ -0,0 +1,59 @@
+"""Staking page datasets (Flipside and NEAR RPC)."""
+import pandas as pd
+
+from megadash import config
+from megadash.cache import cached
+from megadash.flipside import read_query, sync_query
+from megadash.rpc import get_rpc
+from megadash.stakehistory import get_history
+from megadash.tsstore import get_store
+from megadash.validators import summary, validator_table
+
+
+STAKING_QUERY = '0c642aa3-528d-43ee-8eed-fbd6adc3ff96'
+STAKING_SCHEMA = {
+    'EPOCH_NUM':'int64',
+    'START_TIME':'datetime',
+    'TOTAL_NEAR_STAKED':'float64',
+    'TOTAL_NEAR_SUPPLY':'float64',
+}
+VALIDATOR_HISTORY = 'staking.validator_history'
+VALIDATOR_HISTORY_COLUMNS = ['EPOCH_NUM', 'RECORDED_AT', 'VALIDATORS', 'BLOCK_PRODUCERS', 'CHUNK_ONLY_PRODUCERS',
+                             'SEAT_PRICE']
+
+
+@cached('staking.staking', source='flipside')
+def get_staking_data():
+    sync_query(STAKING_QUERY, STAKING_SCHEMA, 'staking.staking', date_column='START_TIME', key='EPOCH_NUM')
+    return read_query('staking.staking', STAKING_SCHEMA, days=config.HISTORY_WINDOW_DAYS)
+
+
+@cached('staking.validators', source='near_rpc')
+def get_validators_data():
+    validators = get_rpc().validators()
+    table = validator_table(validators['current_validators'])
+    if 'epoch_height' in validators:
+        record_validators(validators['epoch_height'], table)
+    return table
+
+
+@cached('staking.concentration', source='near_rpc')
+def get_concentration_data():
+    history = get_history()
+    history.sync()
+    return history.metrics()
+
+
+def record_validators(epoch, table):
+    """Add the validator count and seat price of `epoch` to the validator history; the newest record wins."""
+    row = dict(summary(table), EPOCH_NUM=epoch, RECORDED_AT=pd.Timestamp.now('UTC').tz_localize(None))
+    get_store().merge(VALIDATOR_HISTORY, pd.DataFrame([row], columns=VALIDATOR_HISTORY_COLUMNS),
+                      date_column='RECORDED_AT', key='EPOCH_NUM')
+
+
+def read_validator_history():
+    """Validator count and seat price per epoch seen so far, oldest first."""
+    frame = get_store().read_window(VALIDATOR_HISTORY, days=config.HISTORY_WINDOW_DAYS)
+    if frame is None:
+        return pd.DataFrame(columns=VALIDATOR_HISTORY_COLUMNS)
+    return frame.drop_duplicates(subset='EPOCH_NUM', keep='last').sort_values(by='EPOCH_NUM', ignore_index=True)
@@ -0,0 +1,293 @@
+"""Per-epoch validator stake snapshots and stake concentration metrics.
+
+A `StakeHistory` keeps the validator set of every recorded epoch as columns:
+EPOCH_NUM, VALIDATOR (an int32 code into the account dictionary) and
+STAKE_MICRO (int64 microNEAR, see megadash.validators). Account IDs are
+stored once, in the dictionary, so a row costs 16 bytes on disk and 12 in
+memory however long the account name is. Epochs are saved in segments of
+SEGMENT_EPOCHS epochs under `<cache dir>/stake_history`; adding an epoch only
+rewrites its own segment.
+
+Concentration metrics are computed once per epoch, when the epoch is added,
+and kept in a small per-epoch table that the charts read directly:
+
+    VALIDATORS   number of validators
+    TOTAL_STAKE  total stake (NEAR)
+    GINI         Gini coefficient of the stakes
+    NAKAMOTO     fewest validators holding more than a third of the stake
+    TOP10_SHARE  share of the stake held by the ten largest validators
+    JOINED       validators in the set that were not in the epoch before
+    LEFT         validators of the epoch before that are no longer in the set
+    CHURN        (JOINED + LEFT) / validators of the epoch before
+
+Churn needs the epoch before, so adding an epoch also updates the churn of
+the epoch after it when that one is already held (backfills arrive newest
+first).
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from megadash import config
+from megadash.rpc import DeadlineExceeded, EndpointError, RpcError, get_rpc
+from megadash.tsstore import FORMAT, read_frame, write_frame
+from megadash.validators import MICRO, yocto_to_micro
+
+
+SEGMENT_EPOCHS = 100
+TOP_N = 10
+NAKAMOTO_THRESHOLD = 1 / 3
+METRIC_COLUMNS = ['EPOCH_NUM', 'START_HEIGHT', 'VALIDATORS', 'TOTAL_STAKE', 'GINI', 'NAKAMOTO', f'TOP{TOP_N}_SHARE',
+                  'JOINED', 'LEFT', 'CHURN']
+
+
+def concentration(stakes, top=TOP_N):
+    """Validator count, total stake (NEAR), Gini, Nakamoto coefficient and top-`top` share of one epoch's stakes."""
+    values = np.sort(np.asarray(stakes, dtype='float64'))
+    count, total = len(values), values.sum()
+    if not count or total <= 0:
+        return {'VALIDATORS':count, 'TOTAL_STAKE':total / MICRO, 'GINI':np.nan, 'NAKAMOTO':np.nan,
+                f'TOP{top}_SHARE':np.nan}
+    gini = 2 * np.dot(np.arange(1, count + 1), values) / (count * total) - (count + 1) / count
+    largest = np.cumsum(values[::-1])
+    nakamoto = int(np.searchsorted(largest, total * NAKAMOTO_THRESHOLD, side='right')) + 1
+    return {'VALIDATORS':count, 'TOTAL_STAKE':total / MICRO, 'GINI':gini, 'NAKAMOTO':nakamoto,
+            f'TOP{top}_SHARE':largest[min(top, count) - 1] / total}
+
+
+def churn(previous, current):
+    """Validators joined and left between two sorted code arrays, and their sum over the previous set size."""
+    if previous is None:
+        return {'JOINED':np.nan, 'LEFT':np.nan, 'CHURN':np.nan}
+    joined = len(current) - np.isin(current, previous, assume_unique=True).sum()
+    left = len(previous) - np.isin(previous, current, assume_unique=True).sum()
+    return {'JOINED':joined, 'LEFT':left, 'CHURN':(joined + left) / len(previous) if len(previous) else np.nan}
+
+
+class StakeHistory:
+    def __init__(self, root=None, epochs=None):
+        self.root = root or os.path.join(config.CACHE_DIR, 'stake_history')
+        self.limit = epochs or config.STAKE_HISTORY_EPOCHS
+        self.accounts = []
+        self.codes = {}
+        self.epochs = {}
+        self._metrics = {}
+        self._frame = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self):
+        return len(self.epochs)
+
+    @property
+    def rows(self):
+        return sum(len(codes) for codes, _ in self.epochs.values())
+
+    @property
+    def nbytes(self):
+        return sum(codes.nbytes + stakes.nbytes for codes, stakes in self.epochs.values())
+
+    @property
+    def latest_epoch(self):
+        return max(self.epochs) if self.epochs else None
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _segment(self, epoch):
+        return self._path(f'{epoch // SEGMENT_EPOCHS * SEGMENT_EPOCHS:012d}.{FORMAT}')
+
+    def _load(self):
+        if not os.path.exists(self._path('accounts.json')):
+            return
+        with open(self._path('accounts.json')) as f:
+            self.accounts = json.load(f)
+        self.codes = {account:code for code, account in enumerate(self.accounts)}
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(f'.{FORMAT}') or name.startswith('metrics'):
+                continue
+            frame = read_frame(self._path(name))
+            epochs = frame['EPOCH_NUM'].to_numpy()
+            bounds = np.flatnonzero(np.diff(epochs)) + 1
+            starts = np.concatenate([[0], bounds])
+            codes = np.split(frame['VALIDATOR'].to_numpy(), bounds)
+            stakes = np.split(frame['STAKE_MICRO'].to_numpy(), bounds)
+            for start, epoch_codes, epoch_stakes in zip(starts, codes, stakes):
+                self.epochs[int(epochs[start])] = (epoch_codes, epoch_stakes)
+        if os.path.exists(self._path(f'metrics.{FORMAT}')):
+            for row in read_frame(self._path(f'metrics.{FORMAT}')).to_dict('records'):
+                if int(row['EPOCH_NUM']) in self.epochs:
+                    self._metrics[int(row['EPOCH_NUM'])] = row
+
+    def _encode(self, account_ids):
+        codes = np.empty(len(account_ids), dtype='int32')
+        for i, account in enumerate(account_ids):
+            code = self.codes.get(account)
+            if code is None:
+                code = self.codes[account] = len(self.accounts)
+                self.accounts.append(account)
+            codes[i] = code
+        return codes
+
+    def _save_accounts(self):
+        tmp = self._path(f'accounts.json.tmp-{os.getpid()}-{threading.get_ident()}')
+        with open(tmp, 'w') as f:
+            json.dump(self.accounts, f)
+        os.replace(tmp, self._path('accounts.json'))
+
+    def _save_segment(self, epoch):
+        first = epoch // SEGMENT_EPOCHS * SEGMENT_EPOCHS
+        held = [e for e in sorted(self.epochs) if first <= e < first + SEGMENT_EPOCHS]
+        if not held:
+            if os.path.exists(self._segment(epoch)):
+                os.remove(self._segment(epoch))
+            return
+        write_frame(pd.DataFrame({
+            'EPOCH_NUM':np.repeat(np.array(held, dtype='int64'), [len(self.epochs[e][0]) for e in held]),
+            'VALIDATOR':np.concatenate([self.epochs[e][0] for e in held]),
+            'STAKE_MICRO':np.concatenate([self.epochs[e][1] for e in held]),
+        }), self._segment(epoch))
+
+    def _save_metrics(self):
+        write_frame(self.metrics(), self._path(f'metrics.{FORMAT}'))
+
+    def add(self, result, save=True):
+        """Record the `current_validators` of a `validators` RPC result; returns its epoch."""
+        entries = result['current_validators']
+        epoch = int(result['epoch_height'])
+        with self._lock:
+            accounts = len(self.accounts)
+            codes = self._encode([e['account_id'] for e in entries])
+            stakes = yocto_to_micro([e['stake'] for e in entries])
+            order = np.argsort(codes, kind='stable')
+            codes, stakes = codes[order], stakes[order]
+            self.epochs[epoch] = (codes, stakes)
+            previous = self.epochs.get(epoch - 1)
+            self._metrics[epoch] = dict(EPOCH_NUM=epoch, START_HEIGHT=result.get('epoch_start_height'),
+                                        **concentration(stakes), **churn(None if previous is None else previous[0], codes))
+            if epoch + 1 in self.epochs:
+                self._metrics[epoch + 1].update(churn(codes, self.epochs[epoch + 1][0]))
+            self._frame = None
+            if save:
+                os.makedirs(self.root, exist_ok=True)
+                if len(self.accounts) > accounts:
+                    self._save_accounts()
+                self._save_segment(epoch)
+                self._save_metrics()
+        return epoch
+
+    def trim(self, limit=None):
+        """Drop the oldest epochs beyond the newest `limit`."""
+        limit = limit or self.limit
+        with self._lock:
+            dropped = sorted(self.epochs)[:-limit] if len(self.epochs) > limit else []
+            for epoch in dropped:
+                del self.epochs[epoch]
+                self._metrics.pop(epoch, None)
+            if dropped:
+                self._frame = None
+                for segment in {epoch // SEGMENT_EPOCHS * SEGMENT_EPOCHS for epoch in dropped}:
+                    self._save_segment(segment)
+                self._save_metrics()
+        return len(dropped)
+
+    def save(self, epochs):
+        """Write the account dictionary, the segments holding `epochs` and the metrics."""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            self._save_accounts()
+            for segment in {epoch // SEGMENT_EPOCHS * SEGMENT_EPOCHS for epoch in epochs}:
+                self._save_segment(segment)
+            self._save_metrics()
+
+    def sync(self, rpc=None, backfill=None):
+        """Add the epochs the RPC node has and this history lacks; returns how many were added.
+
+        Walks back from the current epoch to the newest one held, then
+        backfills up to `backfill` epochs older than the oldest one held, while
+        the history is under its limit and the node still has them. An empty
+        history gets the newest `backfill` epochs. The RPC calls run without
+        the lock, which is only taken to record each epoch, and the new epochs
+        are saved once at the end. A failing call ends the walk, keeping the
+        epochs added so far.
+        """
+        rpc = rpc or get_rpc()
+        backfill = config.STAKE_HISTORY_BACKFILL if backfill is None else backfill
+        added = []
+        empty = not self.epochs
+        try:
+            result = rpc.validators()
+            while result is not None and int(result['epoch_height']) not in self.epochs:
+                added.append(self.add(result, save=False))
+                if len(added) >= (backfill if empty else self.limit):
+                    break
+                result = self._previous(rpc, result)
+            for _ in range(0 if empty else backfill):
+                with self._lock:
+                    if len(self.epochs) >= self.limit:
+                        break
+                    oldest = self._metrics[min(self.epochs)]
+                result = self._previous(rpc, {'epoch_start_height':oldest.get('START_HEIGHT')})
+                if result is None or int(result['epoch_height']) in self.epochs:
+                    break
+                added.append(self.add(result, save=False))
+        finally:
+            if added:
+                self.save(added)
+                self.trim()
+        return len(added)
+
+    @staticmethod
+    def _previous(rpc, result):
+        """`validators` of the epoch before `result`'s, or None when the node lacks it or cannot be reached."""
+        start_height = result.get('epoch_start_height')
+        if start_height is None or pd.isna(start_height):
+            return None
+        try:
+            return rpc.validators(int(start_height) - 1)
+        except (RpcError, EndpointError, DeadlineExceeded):
+            return None
+
+    def metrics(self):
+        """Concentration metrics per epoch, oldest first."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame([self._metrics[e] for e in sorted(self._metrics)], columns=METRIC_COLUMNS)
+            return self._frame
+
+    def snapshot(self, epoch):
+        """Validators of `epoch` with their stake (NEAR), largest first."""
+        with self._lock:
+            codes, stakes = self.epochs[epoch]
+        order = np.argsort(-stakes, kind='stable')
+        return pd.DataFrame({'account_id':np.array(self.accounts, dtype=object)[codes[order]],
+                             'stake':stakes[order] / MICRO})
+
+    def validator_stakes(self, account_id):
+        """Stake (NEAR) of one validator in every held epoch it was in, oldest first."""
+        with self._lock:
+            code = self.codes.get(account_id)
+            epochs = sorted(self.epochs)
+            held = [self.epochs[e] for e in epochs]
+        rows = []
+        if code is not None:
+            for epoch, (codes, stakes) in zip(epochs, held):
+                i = np.searchsorted(codes, code)
+                if i < len(codes) and codes[i] == code:
+                    rows.append((epoch, stakes[i] / MICRO))
+        return pd.DataFrame(rows, columns=['EPOCH_NUM', 'stake'])
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = StakeHistory()
+        return _history
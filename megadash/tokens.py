@@ -0,0 +1,145 @@
+"""Columnar store for DEX token liquidity histories.
+
+A `TokenMatrix` holds one DEX's token liquidity as a dense (date x symbol)
+float64 array with NaN where a token had no entry, plus a symbol -> column
+index and a sorted day axis. It is built straight from DefiLlama's
+`tokensInUsd` entries without an intermediate long frame, and its size is
+bounded by days x listed tokens, with days capped by the DeFi window.
+
+The latest value of every token is a single reduction over the array (the
+last non-NaN row of each column) instead of sorting and grouping a melted
+frame.
+"""
+import numpy as np
+import pandas as pd
+
+
+DAY = 86400
+
+
+def _days(seconds):
+    return (seconds // DAY * DAY).astype('datetime64[s]').astype('datetime64[ns]')
+
+
+class TokenMatrix:
+    def __init__(self, dates, symbols, values):
+        self.dates = dates
+        self.symbols = symbols
+        self.values = values
+        self.index = {symbol:i for i, symbol in enumerate(symbols)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getstate__(self):
+        return {'dates':self.dates, 'symbols':self.symbols, 'values':self.values}
+
+    def __setstate__(self, state):
+        self.__init__(state['dates'], state['symbols'], state['values'])
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.values.nbytes
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype='datetime64[ns]'), np.array([], dtype=object), np.empty((0, 0)))
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from chronological `tokensInUsd` entries; later entries win within a UTC day."""
+        if not entries:
+            return cls.empty()
+        counts = np.fromiter((len(e['tokens']) for e in entries), dtype='int64', count=len(entries))
+        total = int(counts.sum())
+        columns = {}
+        codes = np.fromiter((columns.setdefault(symbol, len(columns)) for e in entries for symbol in e['tokens']),
+                            dtype='int64', count=total)
+        values = np.fromiter((v for e in entries for v in e['tokens'].values()), dtype='float64', count=total)
+        days = _days(np.fromiter((e['date'] for e in entries), dtype='int64', count=len(entries)))
+        dates, rows = np.unique(days, return_inverse=True)
+        rows = np.repeat(rows, counts)
+        if len(dates) < len(entries):
+            flat = (rows * len(columns) + codes)[::-1]
+            _, last = np.unique(flat, return_index=True)
+            keep = total - 1 - last
+            rows, codes, values = rows[keep], codes[keep], values[keep]
+        matrix = np.full((len(dates), len(columns)), np.nan)
+        matrix[rows, codes] = values
+        return cls(dates, np.array(list(columns), dtype=object), matrix)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build from a long (date, symbol, tvl_usd) frame with one row per date and symbol."""
+        if frame is None or frame.empty:
+            return cls.empty()
+        rows, dates = pd.factorize(frame['date'], sort=True)
+        codes, symbols = pd.factorize(frame['symbol'])
+        matrix = np.full((len(dates), len(symbols)), np.nan)
+        matrix[rows, codes] = frame['tvl_usd'].to_numpy(dtype='float64')
+        return cls(np.asarray(dates, dtype='datetime64[ns]'), np.asarray(symbols, dtype=object), matrix)
+
+    def to_frame(self):
+        """Long (date, symbol, tvl_usd) frame of the non-missing cells."""
+        rows, cols = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame({'date':self.dates[rows], 'symbol':self.symbols[cols], 'tvl_usd':self.values[rows, cols]})
+
+    def combine(self, newer):
+        """This history with every day from `newer`'s first day onward replaced by `newer`."""
+        if not len(newer):
+            return self
+        kept = int(np.searchsorted(self.dates, newer.dates[0]))
+        extra = [symbol for symbol in newer.symbols if symbol not in self.index]
+        symbols = np.concatenate([self.symbols, np.array(extra, dtype=object)])
+        matrix = np.full((kept + len(newer), len(symbols)), np.nan)
+        matrix[:kept, :len(self.symbols)] = self.values[:kept]
+        columns = np.fromiter((self.index.get(symbol, -1) for symbol in newer.symbols), dtype='int64',
+                              count=len(newer.symbols))
+        columns[columns == -1] = np.arange(len(self.symbols), len(symbols))
+        matrix[kept:, columns] = newer.values
+        return TokenMatrix(np.concatenate([self.dates[:kept], newer.dates]), symbols, matrix)
+
+    def trim(self, start):
+        """Drop days before `start` and tokens left without any value."""
+        first = int(np.searchsorted(self.dates, np.datetime64(start, 'ns')))
+        if first == 0:
+            return self
+        values = self.values[first:]
+        listed = ~np.isnan(values).all(axis=0)
+        return TokenMatrix(self.dates[first:], self.symbols[listed], values[:, listed])
+
+    def listed(self):
+        """Symbols with at least one value."""
+        return self.symbols[~np.isnan(self.values).all(axis=0)]
+
+    def value(self, symbol, date):
+        """Liquidity of `symbol` on `date`, or NaN if it had none."""
+        col = self.index.get(symbol)
+        day = np.datetime64(pd.Timestamp(date).normalize(), 'ns')
+        row = int(np.searchsorted(self.dates, day))
+        if col is None or row == len(self.dates) or self.dates[row] != day:
+            return np.nan
+        return self.values[row, col]
+
+    def latest(self):
+        """Latest (symbol, date, tvl_usd) of every listed token."""
+        valid = ~np.isnan(self.values)
+        cols = np.flatnonzero(valid.any(axis=0))
+        rows = len(self.dates) - 1 - valid[::-1, cols].argmax(axis=0)
+        return pd.DataFrame({'symbol':self.symbols[cols], 'date':self.dates[rows], 'tvl_usd':self.values[rows, cols]})
+
+
+def latest_by_symbol(matrices, symbols=None):
+    """Liquidity of each token summed over the DEXes that report it on its latest day.
+
+    `matrices` maps protocol names to TokenMatrix objects; `symbols` restricts
+    the result to those tokens.
+    """
+    latest = [m.latest() for m in matrices.values() if len(m)]
+    if not latest:
+        return pd.DataFrame({'symbol':pd.Series(dtype=object), 'tvl_usd':pd.Series(dtype='float64')})
+    latest = pd.concat(latest, ignore_index=True)
+    if symbols is not None:
+        latest = latest.loc[latest['symbol'].isin(symbols)]
+    latest = latest.loc[latest['date'] == latest.groupby('symbol')['date'].transform('max')]
+    return latest.groupby('symbol', as_index=False)['tvl_usd'].sum()
@@ -0,0 +1,267 @@
+"""Lightweight timing spans, counters and payload sizes for diagnostics.
+
+Enabled with MEGADASH_TRACING=1. Spans are named `<stage>.<what>`, where the
+stage is one of
+
+    http        request/response time per upstream host
+    decode      JSON decoding of upstream payloads
+    load        a whole data function (fetch, decode and transform)
+    transform   pandas/numpy work building chart frames and tables
+    render      a section of a page script, widgets included
+
+Durations are kept in a bounded window per span name for percentiles. With
+tracing off, `traced` returns functions unchanged, `span` returns a shared
+no-op context manager and `page_timer` a no-op timer, so instrumented code
+pays one function call at most.
+
+Exports, all optional: the Prometheus text format written to
+TRACE_PROMETHEUS_FILE (e.g. for node_exporter's textfile collector) or PUT to
+a Pushgateway at TRACE_PROMETHEUS_PUSH_URL every TRACE_EXPORT_INTERVAL
+seconds, and OpenTelemetry spans through the opentelemetry API when it is
+installed (the deployment configures the tracer provider and exporter).
+"""
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+from megadash import config
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+NOOP = contextlib.nullcontext()
+
+
+class Recorder:
+    def __init__(self, samples=None):
+        self.samples = samples or config.TRACE_SAMPLES
+        self._durations = defaultdict(lambda: deque(maxlen=self.samples))
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(int)
+        self._sizes = defaultdict(lambda: deque(maxlen=self.samples))
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._durations[name].append(seconds)
+            total = self._totals[name]
+            total[0] += 1
+            total[1] += seconds
+
+    def count(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def size(self, name, size):
+        with self._lock:
+            self._sizes[name].append(size)
+
+    def spans(self):
+        """{name: {'count', 'total', 'p50', 'p95', 'max'}} in seconds, percentiles over the recent window."""
+        with self._lock:
+            durations = {name:np.array(values) for name, values in self._durations.items()}
+            totals = {name:tuple(total) for name, total in self._totals.items()}
+        return {name:{'count':totals[name][0], 'total':totals[name][1],
+                      'p50':float(np.percentile(values, 50)), 'p95':float(np.percentile(values, 95)),
+                      'max':float(values.max())}
+                for name, values in sorted(durations.items())}
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def sizes(self):
+        """{name: {'count', 'last', 'p50', 'max'}} in bytes over the recent window."""
+        with self._lock:
+            sizes = {name:np.array(values) for name, values in self._sizes.items()}
+        return {name:{'count':len(values), 'last':int(values[-1]), 'p50':float(np.percentile(values, 50)),
+                      'max':int(values.max())}
+                for name, values in sorted(sizes.items())}
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+            self._counters.clear()
+            self._sizes.clear()
+
+
+_recorder = Recorder() if config.TRACING else None
+_tracer = otel_trace.get_tracer('megadash') if config.TRACING and otel_trace is not None else None
+
+
+def get_recorder():
+    return _recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+class Span:
+    __slots__ = ('name', 'start', 'otel')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.otel = _tracer.start_as_current_span(self.name) if _tracer is not None else None
+        if self.otel is not None:
+            self.otel.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _recorder.record(self.name, time.perf_counter() - self.start)
+        if self.otel is not None:
+            self.otel.__exit__(*exc)
+        _ensure_exporter()
+
+
+def span(name):
+    """Context manager timing its block under `name`."""
+    return NOOP if _recorder is None else Span(name)
+
+
+def traced(name):
+    """Decorator timing every call under `name`; a no-op when tracing is off."""
+    def decorator(fn):
+        if _recorder is None:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    """Record a duration measured elsewhere."""
+    if _recorder is not None:
+        _recorder.record(name, seconds)
+
+
+def count(name, **labels):
+    """Add one to the counter `name` for `labels`."""
+    if _recorder is not None:
+        _recorder.count(name, tuple(sorted(labels.items())))
+
+
+def nbytes(value):
+    """Approximate memory held by a dataset value."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(pd.Series(value.memory_usage(deep=True)).sum())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def record_size(name, size):
+    if _recorder is not None:
+        _recorder.size(name, size)
+
+
+class PageTimer:
+    """Times consecutive sections of a page script: each `lap` records the time since the previous one."""
+
+    def __init__(self, page):
+        self.page = page
+        self.last = time.perf_counter()
+
+    def lap(self, section):
+        now = time.perf_counter()
+        _recorder.record(f'render.{self.page}.{section}', now - self.last)
+        self.last = now
+
+
+class NoopTimer:
+    def lap(self, section):
+        pass
+
+
+NOOP_TIMER = NoopTimer()
+
+
+def page_timer(page):
+    return NOOP_TIMER if _recorder is None else PageTimer(page)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus_text(recorder=None):
+    """All spans, counters and payload sizes in the Prometheus text exposition format."""
+    recorder = recorder or _recorder
+    lines = ['# TYPE megadash_span_seconds summary']
+    for name, stats in recorder.spans().items():
+        label = f'span="{_label(name)}"'
+        lines.append(f'megadash_span_seconds{{{label},quantile="0.5"}} {stats["p50"]:.6f}')
+        lines.append(f'megadash_span_seconds{{{label},quantile="0.95"}} {stats["p95"]:.6f}')
+        lines.append(f'megadash_span_seconds_sum{{{label}}} {stats["total"]:.6f}')
+        lines.append(f'megadash_span_seconds_count{{{label}}} {stats["count"]}')
+    counters = defaultdict(list)
+    for (name, labels), value in recorder.counters().items():
+        counters[name].append((labels, value))
+    for name, values in sorted(counters.items()):
+        lines.append(f'# TYPE megadash_{name}_total counter')
+        for labels, value in sorted(values):
+            label = ','.join(f'{key}="{_label(v)}"' for key, v in labels)
+            lines.append(f'megadash_{name}_total{{{label}}} {value}')
+    lines.append('# TYPE megadash_payload_bytes gauge')
+    for name, stats in recorder.sizes().items():
+        lines.append(f'megadash_payload_bytes{{payload="{_label(name)}"}} {stats["last"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def export():
+    """Write and/or push the Prometheus text once."""
+    text = prometheus_text()
+    if config.TRACE_PROMETHEUS_FILE:
+        tmp = f'{config.TRACE_PROMETHEUS_FILE}.tmp-{os.getpid()}'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, config.TRACE_PROMETHEUS_FILE)
+    if config.TRACE_PROMETHEUS_PUSH_URL:
+        from megadash.client import get_client
+        get_client().request('PUT', config.TRACE_PROMETHEUS_PUSH_URL, data=text.encode(),
+                             headers={'Content-Type':'text/plain; version=0.0.4'})
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _export_loop():
+    while True:
+        time.sleep(config.TRACE_EXPORT_INTERVAL)
+        try:
+            export()
+        except Exception:
+            pass
+
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is not None or not (config.TRACE_PROMETHEUS_FILE or config.TRACE_PROMETHEUS_PUSH_URL):
+        return
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=_export_loop, name='megadash-trace-export', daemon=True)
+            _exporter.start()
@@ -0,0 +1,181 @@
+"""Append-only local store for daily and per-epoch chart histories.
+
+Each dataset lives in its own directory, partitioned by calendar month of its
+date column. New upstream rows are merged into the partitions they fall in,
+de-duplicated on the dataset key (`UTC_DATE`, `EPOCH_NUM`, ...) with the newest
+row winning, so a refresh only rewrites the partitions that received data.
+Readers load only the partitions overlapping the window they display.
+
+Partitions are Parquet files when pyarrow is installed and pickles otherwise.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pandas as pd
+
+from megadash import config
+
+try:
+    import pyarrow  # noqa: F401
+    FORMAT = 'parquet'
+except ImportError:
+    FORMAT = 'pickle'
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def write_frame(frame, path):
+    tmp = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    if FORMAT == 'parquet':
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def read_frame(path, columns=None):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    frame = pd.read_pickle(path)
+    return frame if columns is None else frame[columns]
+
+
+class TimeSeriesStore:
+    def __init__(self, root=None):
+        self.root = root or os.path.join(config.CACHE_DIR, 'timeseries')
+        self._lock = threading.Lock()
+
+    def dataset_dir(self, dataset):
+        return os.path.join(self.root, dataset)
+
+    def partitions(self, dataset):
+        directory = self.dataset_dir(dataset)
+        if not os.path.isdir(directory):
+            return {}
+        return {name.split('.')[0]:os.path.join(directory, name)
+                for name in sorted(os.listdir(directory))
+                if name.endswith(('.parquet', '.pickle')) and not name.startswith('_')}
+
+    def meta(self, dataset):
+        path = os.path.join(self.dataset_dir(dataset), '_meta.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self, dataset, meta):
+        path = os.path.join(self.dataset_dir(dataset), '_meta.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(f'{path}.tmp', path)
+
+    def high_water_mark(self, dataset):
+        """Largest key merged so far (largest date for composite keys), or None for an empty dataset."""
+        meta = self.meta(dataset)
+        value = meta.get('high_water_mark')
+        if value is not None and meta.get('key_is_datetime'):
+            return pd.Timestamp(value)
+        return value
+
+    @contextmanager
+    def _locked(self, dataset):
+        with self._lock:
+            os.makedirs(self.dataset_dir(dataset), exist_ok=True)
+            with open(os.path.join(self.dataset_dir(dataset), '_lock'), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def merge(self, dataset, frame, date_column, key):
+        """Merge new rows into `dataset` and return how many partitions were rewritten."""
+        if frame.empty:
+            return 0
+        with self._locked(dataset):
+            existing = self.partitions(dataset)
+            periods = frame[date_column].dt.strftime('%Y-%m')
+            for period, rows in frame.groupby(periods, sort=False):
+                if period in existing:
+                    rows = pd.concat([read_frame(existing[period]), rows], ignore_index=True)
+                    rows = rows.drop_duplicates(subset=key, keep='last')
+                rows = rows.sort_values(by=key).reset_index(drop=True)
+                path = os.path.join(self.dataset_dir(dataset), f'{period}.{FORMAT}')
+                write_frame(rows, path)
+                if period in existing and existing[period] != path:
+                    os.remove(existing[period])
+
+            meta = self.meta(dataset)
+            high = frame[key if isinstance(key, str) else date_column].max()
+            previous = self.high_water_mark(dataset)
+            if previous is not None and previous > high:
+                high = previous
+            max_date = frame[date_column].max()
+            if meta.get('max_date') is not None:
+                max_date = max(max_date, pd.Timestamp(meta['max_date']))
+            is_datetime = isinstance(high, pd.Timestamp)
+            self._write_meta(dataset, {
+                'key':key,
+                'date_column':date_column,
+                'key_is_datetime':is_datetime,
+                'high_water_mark':high.isoformat() if is_datetime else high.item() if hasattr(high, 'item') else high,
+                'max_date':max_date.isoformat(),
+            })
+            return periods.nunique()
+
+    def read(self, dataset, start=None, end=None, columns=None):
+        """Read the rows of `dataset` whose date column falls in [start, end]."""
+        meta = self.meta(dataset)
+        partitions = self.partitions(dataset)
+        if start is not None:
+            start = pd.Timestamp(start)
+            partitions = {p:path for p, path in partitions.items() if p >= start.strftime('%Y-%m')}
+        if end is not None:
+            end = pd.Timestamp(end)
+            partitions = {p:path for p, path in partitions.items() if p <= end.strftime('%Y-%m')}
+        if not partitions:
+            return None
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + [meta['date_column']]))
+        frame = pd.concat([read_frame(path, read_columns) for path in partitions.values()], ignore_index=True)
+        dates = frame[meta['date_column']]
+        if start is not None:
+            frame = frame.loc[dates >= start]
+        if end is not None:
+            frame = frame.loc[dates <= end]
+        frame = frame.reset_index(drop=True)
+        return frame if columns is None else frame[list(columns)]
+
+    def read_window(self, dataset, days=None, columns=None):
+        """Read the last `days` days of `dataset` up to its newest row, or everything if `days` is None."""
+        meta = self.meta(dataset)
+        if days is None or meta.get('max_date') is None:
+            return self.read(dataset, columns=columns)
+        return self.read(dataset, start=pd.Timestamp(meta['max_date']) - timedelta(days=days), columns=columns)
+
+    def clear(self, dataset):
+        with self._locked(dataset):
+            for path in self.partitions(dataset).values():
+                os.remove(path)
+            meta = os.path.join(self.dataset_dir(dataset), '_meta.json')
+            if os.path.exists(meta):
+                os.remove(meta)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TimeSeriesStore()
+        return _store
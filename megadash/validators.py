@@ -0,0 +1,75 @@
+"""Compact validator table built from NEAR RPC validator sets.
+
+Stakes arrive as yoctoNEAR (10^-24) decimal strings, too large for float64 to
+hold exactly. They are cut down to microNEAR by dropping the last 18 digits of
+the string and stored as int64 (`stake_micro`), which is exact to 10^-6 NEAR
+and fits every realistic stake; `stake` is the float NEAR value for charts.
+
+Rows are sorted by stake and carry their rank, validator type (categorical)
+and chart label, all computed in one vectorized pass.
+"""
+import numpy as np
+import pandas as pd
+
+from megadash.tracing import traced
+
+
+MICRO = 10**6
+YOCTO_DIGITS_BELOW_MICRO = 18
+
+VALIDATOR_TYPES = pd.CategoricalDtype(['Block Producer', 'Chunk-Only Producer'])
+
+COUNT_COLUMNS = ['num_expected_blocks', 'num_produced_blocks', 'num_expected_chunks', 'num_produced_chunks']
+
+
+def yocto_to_micro(stakes):
+    """Exact int64 microNEAR from yoctoNEAR decimal strings (truncated below 10^-6 NEAR)."""
+    return np.fromiter((int(s[:-YOCTO_DIGITS_BELOW_MICRO] or 0) for s in stakes), dtype='int64', count=len(stakes))
+
+
+@traced('transform.validator_table')
+def validator_table(entries):
+    """Validators of an RPC validator set (current_validators, next_validators, current_proposals), richest first.
+
+    Columns: account_id, stake_micro, stake, validator_type, rank, label and
+    any of COUNT_COLUMNS the set carries. validator_type is missing for sets
+    without expected block counts (next validators, proposals).
+    """
+    count = len(entries)
+    stake_micro = yocto_to_micro([e['stake'] for e in entries])
+    order = np.argsort(-stake_micro, kind='stable')
+    account_ids = np.array([e['account_id'] for e in entries], dtype=object)[order]
+    rank = np.arange(1, count + 1)
+
+    table = {
+        'account_id':account_ids,
+        'stake_micro':stake_micro[order],
+        'stake':stake_micro[order] / MICRO,
+    }
+    for column in COUNT_COLUMNS:
+        if count and column in entries[0]:
+            table[column] = np.fromiter((e.get(column, 0) for e in entries), dtype='int64', count=count)[order]
+    if 'num_expected_blocks' in table:
+        codes = np.where(table['num_expected_blocks'] > 0, 0, 1)
+    else:
+        codes = np.full(count, -1)
+    table['validator_type'] = pd.Categorical.from_codes(codes, dtype=VALIDATOR_TYPES)
+    table['rank'] = rank
+    table['label'] = np.array([f'{r:>4}. {a}' for r, a in zip(rank, account_ids)], dtype=object)
+    return pd.DataFrame(table, copy=False)
+
+
+def type_counts(table):
+    """Number of validators per type, including types with none."""
+    return table['validator_type'].value_counts(sort=False).to_dict()
+
+
+def summary(table):
+    """Validator counts and seat price (smallest stake, in NEAR) of a validator table."""
+    counts = type_counts(table)
+    return {
+        'VALIDATORS':len(table),
+        'BLOCK_PRODUCERS':counts.get('Block Producer', 0),
+        'CHUNK_ONLY_PRODUCERS':counts.get('Chunk-Only Producer', 0),
+        'SEAT_PRICE':float(table['stake'].min()) if len(table) else float('nan'),
+    }
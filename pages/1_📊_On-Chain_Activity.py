@@ -1,55 +1,39 @@
 import streamlit as st
-import pandas as pd
-import requests
+
+from megadash.scheduler import ensure_started
+from megadash.metrics import MetricSpec, metric_cards, periods, render_metrics
+from megadash.render import chart
+from megadash.series import range_controls, series_index
+from megadash.sources.activity import get_scorecard_data, get_barchart_data
+from megadash.resilience import page_data, section_data, stale_badge
+from megadash.tracing import page_timer
+
 
 st.set_page_config(
     page_title='On-Chain Activity - NEAR Mega Dashboard', 
     page_icon='📊',
     layout='wide'
 )
+ensure_started()
+timer = page_timer('activity')
 
-def render_safe(value, format):
-    try:
-        x = format.format(value)
-    except:
-        x = None
-    return x
-
-
-@st.cache
-def get_scorecard_data():
-    url = 'https://node-api.flipsidecrypto.com/api/v2/queries/b39ba359-ab65-4914-a205-59d26c27b449/data/latest'
-    response = requests.get(url)
-    raw_data = response.json()
-    current_values = {
-        m:{x['TIME_PERIOD']:x['CURRENT_VALUE'] for x in raw_data if x['METRIC']==m}
-        for m in list(set([x['METRIC'] for x in raw_data]))
-    }
-    deltas = {
-        m:{x['TIME_PERIOD']:x['DELTA'] for x in raw_data if x['METRIC']==m}
-        for m in list(set([x['METRIC'] for x in raw_data]))
-    }
-    return current_values, deltas
+SCORECARD_METRICS = [
+    MetricSpec('Transactions', periods(), '{:,}'),
+    MetricSpec('Active Accounts', periods(), '{:,}'),
+    MetricSpec('Active Contracts', periods(), '{:,}'),
+]
 
-@st.cache
-def get_barchart_data():
-    url = 'https://node-api.flipsidecrypto.com/api/v2/queries/4ccaed65-867e-436c-a0ce-c0ee53176fe7/data/latest'
-    response = requests.get(url)
-    raw_data = response.json()
-    barchart_data = pd.DataFrame(raw_data)
-    barchart_data['UTC_DATE'] = pd.to_datetime(barchart_data['UTC_DATE'])
-    barchart_data = barchart_data.rename(columns={'UTC_DATE':'Date',
-                                                  'TRANSACTIONS':'Transactions',
-                                                  'ACTIVE_ACCOUNTS':'Active Accounts',
-                                                  'ACTIVE_CONTRACTS':'Active Contracts'})
-    return barchart_data
 
-
-scorecard_data, scorecard_deltas = get_scorecard_data()
-barchart_data = get_barchart_data()
+with page_data():
+    barchart_series = series_index(get_barchart_data, 'Date',
+                                   {'Transactions':'sum', 'Active Accounts':'mean', 'Active Contracts':'mean'})
+timer.lap('data')
 
 
 st.title('📊 On-Chain Activity')
+stale_badge(get_scorecard_data, get_barchart_data)
+start, end, granularity = range_controls('activity', barchart_series.first, barchart_series.last)
+timer.lap('controls')
 
 
 st.write('')
@@ -57,35 +41,14 @@ with st.container():
     st.subheader('Transactions')
     
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours', 
-                      value=render_safe(scorecard_data['Transactions']['P24H'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Transactions']['P24H'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days', 
-                      value=render_safe(scorecard_data['Transactions']['P7D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Transactions']['P7D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days', 
-                      value=render_safe(scorecard_data['Transactions']['P30D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Transactions']['P30D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['Transactions'])
             
     st.write('')
-    st.area_chart(data=barchart_data, x='Date', y='Transactions',
-                  use_container_width=True, height=500)
+    chart('area', 'activity.transactions', [get_barchart_data],
+          lambda: barchart_series.view(start, end, granularity, ['Transactions']),
+          x='Date', y='Transactions', params=(start, end, granularity))
+    timer.lap('transactions')
 
 
 st.write('')
@@ -93,35 +56,14 @@ with st.container():
     st.subheader('Active Accounts')
     
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours', 
-                      value=render_safe(scorecard_data['Active Accounts']['P24H'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Accounts']['P24H'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days', 
-                      value=render_safe(scorecard_data['Active Accounts']['P7D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Accounts']['P7D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days', 
-                      value=render_safe(scorecard_data['Active Accounts']['P30D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Accounts']['P30D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['Active Accounts'])
             
     st.write('')
-    st.area_chart(data=barchart_data, x='Date', y='Active Accounts',
-                  use_container_width=True, height=500)
+    chart('area', 'activity.active_accounts', [get_barchart_data],
+          lambda: barchart_series.view(start, end, granularity, ['Active Accounts']),
+          x='Date', y='Active Accounts', params=(start, end, granularity))
+    timer.lap('active_accounts')
 
 
 st.write('')
@@ -129,32 +71,11 @@ with st.container():
     st.subheader('Active Contracts')
     
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours', 
-                      value=render_safe(scorecard_data['Active Contracts']['P24H'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Contracts']['P24H'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days', 
-                      value=render_safe(scorecard_data['Active Contracts']['P7D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Contracts']['P7D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days', 
-                      value=render_safe(scorecard_data['Active Contracts']['P30D'], '{:,}'),
-                      delta=render_safe(scorecard_deltas['Active Contracts']['P30D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['Active Contracts'])
             
     st.write('')
-    st.area_chart(data=barchart_data, x='Date', y='Active Contracts',
-                  use_container_width=True, height=500)
+    chart('area', 'activity.active_contracts', [get_barchart_data],
+          lambda: barchart_series.view(start, end, granularity, ['Active Contracts']),
+          x='Date', y='Active Contracts', params=(start, end, granularity))
+    timer.lap('active_contracts')
@@ -1,79 +1,55 @@
 import streamlit as st
-import pandas as pd
-import requests
+
+from megadash.scheduler import ensure_started
+from megadash.metrics import MetricSpec, metric_cards, periods, render_metrics
+from megadash.render import chart
+from megadash.series import range_controls, series_index
+from megadash.sources.performance import get_scorecard_data, get_barchart_data
+from megadash.resilience import page_data, section_data, stale_badge
+from megadash.tracing import page_timer
+
 
 st.set_page_config(
     page_title='Performance - NEAR Mega Dashboard', 
     page_icon='📈',
     layout='wide'
 )
+ensure_started()
+timer = page_timer('performance')
 
-def render_safe(value, format):
-    try:
-        x = format.format(value)
-    except:
-        x = None
-    return x
-
-@st.cache
-def get_scorecard_data():
-    url = 'https://node-api.flipsidecrypto.com/api/v2/queries/3b9a57ee-b1a9-4a59-b3f9-8583e186669c/data/latest'
-    response = requests.get(url)
-    data = response.json()
-    return data[0]
+SCORECARD_METRICS = [
+    MetricSpec('BLOCKS_PRODUCED', periods(), '{:,}'),
+    MetricSpec('BLOCK_TIME_SECONDS', periods(' (Avg)'), '{:.2}s', delta_color='inverse'),
+    MetricSpec('MAX_TPS', periods(' (Max)'), '{:,.0f}', delta_format=None),
+    MetricSpec('SUCCESS_RATE', periods(), '{:.1%}'),
+]
 
-@st.cache
-def get_barchart_data():
-    url = 'https://node-api.flipsidecrypto.com/api/v2/queries/4922bf59-2feb-4b45-be10-fc316d11520e/data/latest'
-    response = requests.get(url)
-    raw_data = response.json()
-    barchart_data = pd.DataFrame(raw_data)
-    barchart_data['UTC_DATE'] = pd.to_datetime(barchart_data['UTC_DATE'])
-    return barchart_data
 
-
-scorecard_data = get_scorecard_data()
-barchart_data = get_barchart_data()
+with page_data():
+    barchart_series = series_index(get_barchart_data, 'UTC_DATE',
+                                   {'BLOCKS_PRODUCED':'sum', 'BLOCK_TIME_SECONDS':'mean', 'MAX_TPS':'max', 'SUCCESS_RATE':'mean'})
+timer.lap('data')
 
 
 st.title('📈 Blockchain Performance')
+stale_badge(get_scorecard_data, get_barchart_data)
+start, end, granularity = range_controls('performance', barchart_series.first, barchart_series.last)
+timer.lap('controls')
 
 st.write('')
 with st.container():
     st.subheader('Blocks Produced')
     
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours', 
-                      value=render_safe(scorecard_data['BLOCKS_PRODUCED__PAST_24H'],  '{:,}'),
-                      delta=render_safe(scorecard_data['BLOCKS_PRODUCED__DELTA_24H'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days', 
-                      value=render_safe(scorecard_data['BLOCKS_PRODUCED__PAST_7D'],  '{:,}'),
-                      delta=render_safe(scorecard_data['BLOCKS_PRODUCED__DELTA_7D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days', 
-                      value=render_safe(scorecard_data['BLOCKS_PRODUCED__PAST_30D'],  '{:,}'),
-                      delta=render_safe(scorecard_data['BLOCKS_PRODUCED__DELTA_30D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-    chart_data = barchart_data[['UTC_DATE','BLOCKS_PRODUCED']]
-    chart_data = chart_data.rename(columns={'UTC_DATE':'Date', 'BLOCKS_PRODUCED':'Blocks'})
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['BLOCKS_PRODUCED'])
+
     st.write()
-    st.area_chart(data=chart_data, x='Date', y='Blocks',
-                  use_container_width=True, height=500)
+    chart('area', 'performance.blocks_produced', [get_barchart_data],
+          lambda: barchart_series.view(start, end, granularity, ['BLOCKS_PRODUCED'])
+                                 .rename(columns={'UTC_DATE':'Date', 'BLOCKS_PRODUCED':'Blocks'}),
+          x='Date', y='Blocks', params=(start, end, granularity))
+    timer.lap('blocks_produced')
 
 
 st.write('')
@@ -81,37 +57,15 @@ with st.container():
     st.subheader('Block Time')
 
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours (Avg)', 
-                      value=render_safe(scorecard_data['BLOCK_TIME_SECONDS__PAST_24H'],  '{:.2}s'),
-                      delta=render_safe(scorecard_data['BLOCK_TIME_SECONDS__DELTA_24H'], '{:.1%}'),
-                      delta_color="inverse", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days (Avg)', 
-                      value=render_safe(scorecard_data['BLOCK_TIME_SECONDS__PAST_7D'],  '{:.2}s'),
-                      delta=render_safe(scorecard_data['BLOCK_TIME_SECONDS__DELTA_7D'], '{:.1%}'),
-                      delta_color="inverse", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days (Avg)', 
-                      value=render_safe(scorecard_data['BLOCK_TIME_SECONDS__PAST_30D'],  '{:.2}s'),
-                      delta=render_safe(scorecard_data['BLOCK_TIME_SECONDS__DELTA_30D'], '{:.1%}'),
-                      delta_color="inverse", 
-                      help=None, 
-                      label_visibility="visible")
-
-    chart_data = barchart_data[['UTC_DATE','BLOCK_TIME_SECONDS']]
-    chart_data = chart_data.rename(columns={'UTC_DATE':'Date', 'BLOCK_TIME_SECONDS':'Seconds'})
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['BLOCK_TIME_SECONDS'])
+
     st.write()
-    st.area_chart(data=chart_data, x='Date', y='Seconds',
-                 use_container_width=True, height=500)
+    chart('area', 'performance.block_time', [get_barchart_data],
+          lambda: barchart_series.view(start, end, granularity, ['BLOCK_TIME_SECONDS'])
+                                 .rename(columns={'UTC_DATE':'Date', 'BLOCK_TIME_SECONDS':'Seconds'}),
+          x='Date', y='Seconds', params=(start, end, granularity))
+    timer.lap('block_time')
 
     
 st.write('')
@@ -119,37 +73,15 @@ with st.container():
     st.subheader('Transactions per Second (TPS)')
     
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours (Max)', 
-                      value=render_safe(scorecard_data['MAX_TPS__PAST_24H'], '{:,.0f}'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days (Max)', 
-                      value=render_safe(scorecard_data['MAX_TPS__PAST_7D'], '{:,.0f}'), 
-                      delta=None, 
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days (Max)', 
-                      value=render_safe(scorecard_data['MAX_TPS__PAST_30D'], '{:,.0f}'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        chart_data = barchart_data[['UTC_DATE','MAX_TPS']]
-        chart_data = chart_data.rename(columns={'UTC_DATE':'Date', 'MAX_TPS':'TPS'})
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['MAX_TPS'])
+
         st.write('')
-        st.line_chart(data=chart_data, x='Date', y='TPS',
-                     use_container_width=True, height=500)
+        chart('line', 'performance.max_tps', [get_barchart_data],
+              lambda: barchart_series.view(start, end, granularity, ['MAX_TPS'])
+                                     .rename(columns={'UTC_DATE':'Date', 'MAX_TPS':'TPS'}),
+              x='Date', y='TPS', params=(start, end, granularity))
+    timer.lap('max_tps')
         
         
 st.write('')
@@ -157,35 +89,16 @@ with st.container():
     st.subheader('Transaction Success Rate')
 
     with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-
-        with col2:
-            st.metric(label='Past 24 Hours', 
-                      value=render_safe(scorecard_data['SUCCESS_RATE__PAST_24H'],  '{:.1%}'),
-                      delta=render_safe(scorecard_data['SUCCESS_RATE__DELTA_24H'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col3:
-            st.metric(label='Past 7 Days', 
-                      value=render_safe(scorecard_data['SUCCESS_RATE__PAST_7D'],  '{:.1%}'),
-                      delta=render_safe(scorecard_data['SUCCESS_RATE__DELTA_7D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Past 30 Days', 
-                      value=render_safe(scorecard_data['SUCCESS_RATE__PAST_30D'],  '{:.1%}'),
-                      delta=render_safe(scorecard_data['SUCCESS_RATE__DELTA_30D'], '{:.1%}'),
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-    chart_data = barchart_data[['UTC_DATE','SUCCESS_RATE']]
-    chart_data['SUCCESS_RATE'] = chart_data['SUCCESS_RATE']*100
-    chart_data = chart_data.rename(columns={'UTC_DATE':'Date', 'SUCCESS_RATE':'Success Rate (%)'})
+        with section_data():
+            render_metrics(metric_cards(get_scorecard_data, SCORECARD_METRICS)['SUCCESS_RATE'])
+
+    def success_rate_data():
+        chart_data = barchart_series.view(start, end, granularity, ['SUCCESS_RATE'])
+        chart_data = chart_data.rename(columns={'UTC_DATE':'Date', 'SUCCESS_RATE':'Success Rate (%)'})
+        chart_data['Success Rate (%)'] = chart_data['Success Rate (%)']*100
+        return chart_data
+
     st.write('')
-    st.area_chart(data=chart_data, x='Date', y='Success Rate (%)',
-                  use_container_width=True, height=500)
+    chart('area', 'performance.success_rate', [get_barchart_data], success_rate_data,
+          x='Date', y='Success Rate (%)', params=(start, end, granularity))
+    timer.lap('success_rate')
@@ -1,6 +1,16 @@
 import streamlit as st
-import pandas as pd
-import requests
+
+from megadash.downsample import downsample
+from megadash.epochs import get_epoch_table
+from megadash.metrics import MetricCard, format_value, render_metrics
+from megadash.render import chart, rendered
+from megadash.scheduler import ensure_started
+from megadash.series import range_controls, series_index
+from megadash.sources.staking import get_concentration_data, get_staking_data, get_validators_data
+from megadash.stakehistory import TOP_N, get_history
+from megadash.validators import type_counts
+from megadash.resilience import page_data, section_data, stale_badge
+from megadash.tracing import page_timer
 
 
 st.set_page_config(
@@ -8,115 +18,108 @@ st.set_page_config(
     page_icon='🪙',
     layout='wide'
 )
+ensure_started()
+timer = page_timer('staking')
+
+CONCENTRATION_COLUMNS = {'NAKAMOTO':'Nakamoto Coefficient', 'GINI':'Gini', f'TOP{TOP_N}_SHARE':f'Top {TOP_N} Share',
+                         'CHURN':'Churn'}
+
+
+def supply_cards():
+    latest_epoch = get_epoch_table().latest
+    if latest_epoch is None:
+        latest_epoch = {}
+    supply, staked = latest_epoch.get('TOTAL_NEAR_SUPPLY'), latest_epoch.get('TOTAL_NEAR_STAKED')
+    return [
+        MetricCard('Total Supply (NEAR)', format_value(None if supply is None else supply/1e6, '{:,.1f}M'), None, 'normal'),
+        MetricCard('Total Staked (NEAR)', format_value(None if staked is None else staked/1e6, '{:,.1f}M'), None, 'normal'),
+        MetricCard('Staking Ratio', format_value(latest_epoch.get('STAKING_RATIO'), '{:.1%}'),
+                   format_value(latest_epoch.get('STAKING_RATIO_CHANGE'), '{:+.2%}'), 'normal'),
+    ]
+
+
+def validator_cards():
+    validator_counts = type_counts(validators_df)
+    return [
+        MetricCard('Block Producers', format_value(validator_counts['Block Producer'], '{:,}'), None, 'normal'),
+        MetricCard('Chunk-Only Producers', format_value(validator_counts['Chunk-Only Producer'], '{:,}'), None, 'normal'),
+        MetricCard('Seat Price (NEAR)', format_value(round(validators_df['stake'].min(), 2), '{:,.2f}'), None, 'normal'),
+    ]
 
-def render_safe(value, format):
-    try:
-        x = format.format(value)
-    except:
-        x = None
-    return x
-
-@st.cache
-def get_staking_data():
-    url = 'https://node-api.flipsidecrypto.com/api/v2/queries/0c642aa3-528d-43ee-8eed-fbd6adc3ff96/data/latest'
-    response = requests.get(url)
-    data = response.json()
-    return pd.DataFrame(data)
-
-@st.cache
-def get_validators_data():
-    url = 'https://rpc.mainnet.near.org/'
-    payload = {"method":"validators","params":[None],"id":123,"jsonrpc":"2.0"}
-    response = requests.post(url, json=payload)
-    data = response.json()
-    validators_df = pd.DataFrame(data['result']['current_validators'])
-    validators_df['stake'] = validators_df['stake'].astype('float')/1e24
-    validators_df = validators_df.sort_values(by='stake', ascending=False)
-    validators_df = validators_df.reset_index().drop('index', axis=1)
-    validators_df = validators_df.assign(validator_type = lambda x: x['num_expected_blocks'].apply(lambda y: 'Block Producer' if y > 0 else 'Chunk-Only Producer'))
-    validators_df['rank'] = validators_df.index+1
-    return validators_df
-
-
-staking_df = get_staking_data().copy()
-current_near_supply = staking_df.sort_values(by='EPOCH_NUM', ascending=False).iloc[0].loc['TOTAL_NEAR_SUPPLY']
-current_near_staked = staking_df.sort_values(by='EPOCH_NUM', ascending=False).iloc[0].loc['TOTAL_NEAR_STAKED']
-
-validators_df = get_validators_data().copy()
-block_producers_count = validators_df.query("validator_type=='Block Producer'").shape[0]
-chunk_only_producers_count = validators_df.query("validator_type=='Chunk-Only Producer'").shape[0]
-current_seat_price = round(validators_df['stake'].min(), 2)
+
+def concentration_cards():
+    latest = concentration_df.iloc[-1] if len(concentration_df) else {}
+    return [
+        MetricCard('Nakamoto Coefficient', format_value(latest.get('NAKAMOTO'), '{:,.0f}'), None, 'normal',
+                   'Fewest validators holding more than a third of the stake'),
+        MetricCard('Gini Coefficient', format_value(latest.get('GINI'), '{:.3f}'), None, 'normal'),
+        MetricCard(f'Top {TOP_N} Share', format_value(latest.get(f'TOP{TOP_N}_SHARE'), '{:.1%}'), None, 'normal'),
+        MetricCard('Validator Churn', format_value(latest.get('CHURN'), '{:.1%}'), None, 'normal',
+                   'Validators joined and left since the epoch before, over its validator count'),
+    ]
+
+
+with page_data():
+    staking_series = series_index(get_staking_data, 'START_TIME', {'TOTAL_NEAR_STAKED':'last', 'TOTAL_NEAR_SUPPLY':'last'})
+timer.lap('data')
 
 
 st.title('🪙 Staking')
+stale_badge(get_staking_data, get_validators_data, get_concentration_data)
+start, end, granularity = range_controls('staking', staking_series.first, staking_series.last)
+timer.lap('controls')
 
 st.write('')
 with st.container():
     st.subheader('Total and Staked Supply')
     
-    with st.container():
-        col1, col2, col3 = st.columns([2,3,3])
-        
-        with col2:
-            st.metric(label='Total Supply (NEAR)', 
-                      value=render_safe(current_near_supply/1e6,  '{:,.1f}M'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
+    with st.container(), section_data():
+        render_metrics(rendered('staking.supply_cards', [get_staking_data, get_validators_data], supply_cards))
             
-        with col3:
-            st.metric(label='Total Staked (NEAR)', 
-                      value=render_safe(current_near_staked/1e6,  '{:,.1f}M'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-            
-    chart_data = staking_df[['START_TIME','TOTAL_NEAR_STAKED','TOTAL_NEAR_SUPPLY']]
-    chart_data['START_TIME'] = pd.to_datetime(chart_data['START_TIME'])
-    chart_data = chart_data.rename(columns={'START_TIME':'Time', 'TOTAL_NEAR_STAKED':'Total Staked', 'TOTAL_NEAR_SUPPLY':'Total Supply'})
     st.write()
-    st.line_chart(data=chart_data, x='Time', y=['Total Supply', 'Total Staked'],
-                  use_container_width=True, height=500)
+    chart('line', 'staking.supply', [get_staking_data],
+          lambda: staking_series.view(start, end, granularity, method='lttb')
+                                .rename(columns={'START_TIME':'Time', 'TOTAL_NEAR_STAKED':'Total Staked', 'TOTAL_NEAR_SUPPLY':'Total Supply'}),
+          x='Time', y=['Total Supply', 'Total Staked'], params=(start, end, granularity))
+    timer.lap('supply')
 
 
             
             
 with st.container():
     st.subheader('Validators')
-    
-    with st.container():
-        col1, col2, col3, col4 = st.columns([1,3,3,3])
-        
-        with col2:
-            st.metric(label='Block Producers', 
-                      value=render_safe(block_producers_count,  '{:,}'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-        
-        with col3:
-            st.metric(label='Chunk-Only Producers', 
-                      value=render_safe(chunk_only_producers_count,  '{:,}'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-
-        with col4:
-            st.metric(label='Seat Price (NEAR)', 
-                      value=render_safe(current_seat_price,  '{:,.2f}'),
-                      delta=None,
-                      delta_color="normal", 
-                      help=None, 
-                      label_visibility="visible")
-            
-    chart_data = validators_df[['account_id','stake','rank']].copy()
-    chart_data['xlabel'] = chart_data['rank'].astype('str').str.rjust(4, ' ') + '. ' + chart_data['account_id']
-    chart_data = chart_data.rename(columns={'xlabel':'Validator', 'stake':'Stake'})
-    st.write()
-    st.bar_chart(data=chart_data, x='Validator', y='Stake',
-                 use_container_width=True, height=500)
-    
+
+    with section_data():
+        validators_df = get_validators_data()
+        with st.container():
+            render_metrics(rendered('staking.validator_cards', [get_validators_data], validator_cards))
+
+        st.write()
+        chart('bar', 'staking.validators', [get_validators_data],
+              lambda: validators_df[['label','stake']].rename(columns={'label':'Validator', 'stake':'Stake'}),
+              x='Validator', y='Stake')
+    timer.lap('validators')
+
+
+with st.container():
+    st.subheader('Stake Concentration')
+
+    with section_data():
+        concentration_df = get_concentration_data()
+
+        with st.container():
+            render_metrics(rendered('staking.concentration_cards', [get_concentration_data], concentration_cards),
+                           widths=(1, 3, 3, 3, 3))
+
+        if len(concentration_df) > 1:
+            metric = st.radio('Metric', list(CONCENTRATION_COLUMNS.values()), horizontal=True, key='staking.concentration')
+            chart('line', 'staking.concentration', [get_concentration_data],
+                  lambda: downsample(concentration_df[['EPOCH_NUM'] + list(CONCENTRATION_COLUMNS)], 'EPOCH_NUM', method='lttb')
+                                    .rename(columns=dict(CONCENTRATION_COLUMNS, EPOCH_NUM='Epoch')),
+                  x='Epoch', y=metric, height=400)
+
+            validator = st.selectbox('Validator stake history', get_validators_data()['account_id'], key='staking.validator')
+            chart('line', 'staking.validator_stakes', [get_concentration_data],
+                  lambda: get_history().validator_stakes(validator).rename(columns={'EPOCH_NUM':'Epoch', 'stake':'Stake'}),
+                  x='Epoch', y='Stake', params=(validator,), height=400)
+    timer.lap('concentration')
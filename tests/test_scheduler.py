@@ -0,0 +1,70 @@
+from megadash import config
+from megadash.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubJob:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError('upstream down')
+
+
+def run_at(scheduler, clock, now):
+    clock.now = now
+    return [job.name for job in scheduler.run_pending()]
+
+
+def test_job_runs_when_due_and_is_skipped_when_not():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    job = StubJob()
+    scheduler.add('activity', job, interval=300, delay=10)
+
+    assert run_at(scheduler, clock, 9) == []
+    assert run_at(scheduler, clock, 10) == ['activity']
+    assert run_at(scheduler, clock, 309) == []
+    assert run_at(scheduler, clock, 310) == ['activity']
+    assert job.calls == 2
+    assert scheduler.stats()['activity']['last_success'] == 310
+
+
+def test_failed_job_is_retried_after_the_retry_interval_with_backoff():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    retry = config.SCHEDULER_RETRY_INTERVAL
+    job = StubJob(failures=2)
+    scheduler.add('staking', job, interval=100 * retry)
+
+    assert run_at(scheduler, clock, 0) == ['staking']
+    assert scheduler.stats()['staking']['consecutive_failures'] == 1
+    assert run_at(scheduler, clock, retry - 1) == []
+    assert run_at(scheduler, clock, retry) == ['staking']
+    assert run_at(scheduler, clock, 3 * retry - 1) == []
+    assert run_at(scheduler, clock, 3 * retry) == ['staking']
+
+    stats = scheduler.stats()['staking']
+    assert job.calls == 3
+    assert (stats['failures'], stats['consecutive_failures'], stats['last_success']) == (2, 0, 3 * retry)
+    assert stats['next_run'] == 3 * retry + 100 * retry
+
+
+def test_retry_never_waits_longer_than_the_interval():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock, retry_interval=60)
+    scheduler.add('defi', StubJob(failures=10), interval=90)
+
+    assert run_at(scheduler, clock, 0) == ['defi']
+    assert run_at(scheduler, clock, 60) == ['defi']
+    assert scheduler.stats()['defi']['next_run'] == 150